@@ -0,0 +1,88 @@
+import logging
+import time
+import uuid
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.memcached import PyMemcacheCache
+from pymemcache.exceptions import MemcacheServerError
+
+logger = logging.getLogger('website')
+
+
+class NamespacedMemcacheCache(PyMemcacheCache):
+    """
+    Memcached backend shared by every gunicorn worker. Keys are prefixed with
+    a namespace stored under the site's KEY_PREFIX, so clear() swaps the
+    namespace instead of flushing the server, and only drops this site's keys.
+    Entries left under an old namespace expire or are evicted by memcached.
+    Values larger than memcached's item size (its -I option) are logged and
+    left out of the cache, as a cache that is full would.
+    """
+
+    def __init__(self, server, params):
+        super().__init__(server, params)
+        self._namespace_timeout = params.get('NAMESPACE_TIMEOUT', 5)
+
+    def _namespace_key(self):
+        return super().make_key('namespace')
+
+    def get_namespace(self):
+        # The namespace is looked up at most every NAMESPACE_TIMEOUT seconds,
+        # and again after close(), which Django calls for every cache when a
+        # request finishes. Background threads never close their cache, so
+        # the timeout is what lets them see another process clear() it.
+        namespace, expires = getattr(self, '_namespace', None) or (None, 0)
+        if namespace is None or expires < time.monotonic():
+            key = self._namespace_key()
+            namespace = self._cache.get(key)
+            if namespace is None:
+                namespace = uuid.uuid4().hex
+                if not self._cache.add(key, namespace, 0):
+                    namespace = self._cache.get(key) or namespace
+            if isinstance(namespace, bytes):
+                namespace = namespace.decode()
+            self._remember_namespace(namespace)
+        return namespace
+
+    def _remember_namespace(self, namespace):
+        self._namespace = (namespace, time.monotonic() + self._namespace_timeout)
+
+    def make_key(self, key, version=None):
+        return super().make_key('{0}:{1}'.format(self.get_namespace(), key), version=version)
+
+    def clear(self):
+        namespace = uuid.uuid4().hex
+        self._cache.set(self._namespace_key(), namespace, 0)
+        self._remember_namespace(namespace)
+
+    def close(self, **kwargs):
+        self._namespace = None
+        super().close(**kwargs)
+
+    def _too_large(self, key, version, error):
+        logger.warning('Could not cache %s: %s', key, error)
+        # a value stored before must not outlive the one that replaced it
+        try:
+            self.delete(key, version=version)
+        except:
+            pass
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        try:
+            return super().add(key, value, timeout, version)
+        except MemcacheServerError as e:
+            self._too_large(key, version, e)
+            return False
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        try:
+            super().set(key, value, timeout, version)
+        except MemcacheServerError as e:
+            self._too_large(key, version, e)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        try:
+            return super().set_many(data, timeout, version)
+        except MemcacheServerError:
+            for key, value in data.items():
+                self.set(key, value, timeout, version)
+            return []
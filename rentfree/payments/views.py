@@ -19,7 +19,7 @@ from django.views.decorators.http import require_POST
 from djstripe.models import Product, Customer, Subscription, Price, PaymentMethod
 from users.tokens import subscribe_token, cardchange_token, premium_token
 from website.models.pages import PodcastContentPage, ArticleContentPage 
-from website.models.rules import TierEqualOrGreater, TierEqual
+from website.tiers import resolve_tiers
 from website.wagtail_hooks import DownloadAdmin
 
 UserModel = get_user_model()
@@ -382,43 +382,7 @@ def subscribe_new(request):
 @login_required
 def subscribe_update(request):
 
-    try: 
-        tier_gte_objects = TierEqualOrGreater.objects.all()
-    except:
-        tier_gte_objects = None
-
-    try:
-        tier_eq_objects = TierEqual.objects.all()
-    except:
-        tier_eq_objects = None
-
-    if tier_gte_objects:
-        user_gte_tiers = []
-        for obj in tier_gte_objects:
-            if obj.test_user(request):
-                user_gte_tiers += [obj.segment_id]
-
-    if tier_eq_objects:
-        user_eq_tiers = []
-        for obj in tier_eq_objects:
-            if obj.test_user(request):
-                user_eq_tiers += [obj.segment_id]
-
-    private_queryset_pages = PodcastContentPage.objects.none()
-
-    if tier_gte_objects and tier_eq_objects:
-        for tier in user_gte_tiers:
-            private_queryset_pages |= TierEqualOrGreater.segment.get_queryset().get(id=tier).get_used_pages().values_list('variant_id')
-        for tier in user_eq_tiers:
-            private_queryset_pages |= TierEqual.segment.get_queryset().get(id=tier).get_used_pages().values_list('variant_id')
-    elif tier_gte_objects and not tier_eq_objects:
-        for tier in user_gte_tiers:
-            private_queryset_pages |= TierEqualOrGreater.segment.get_queryset().get(id=tier).get_used_pages().values_list('variant_id')
-    elif tier_eq_objects and not tier_gte_objects:
-        for tier in user_eq_tiers:
-            private_queryset_pages |= TierEqual.segment.get_queryset().get(id=tier).get_used_pages().values_list('variant_id')
-    else:
-        private_queryset_pages = None
+    private_queryset_pages = resolve_tiers(request.user)['variant_ids']
 
     if settings.DEBUG and settings.DATABASES['default']['ENGINE'] =='django.db.backends.sqlite3':
         try:
@@ -1,6 +1,7 @@
-from django.urls import re_path
-from search.views import search
+from django.urls import path, re_path
+from search.views import autocomplete, search
 
 urlpatterns = [
+    path('autocomplete/', autocomplete, name='website_search_autocomplete'),
     re_path(r'', search, name='website_search'),
 ]
\ No newline at end of file
@@ -1,15 +1,75 @@
-from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
+from django.core.paginator import EmptyPage, InvalidPage, PageNotAnInteger, Paginator
 from django.contrib.contenttypes.models import ContentType
-from django.db.models import F
+from django.http import JsonResponse
 from django.shortcuts import render
 from wagtail.core.models import Site
-from wagtail.search.backends import db, get_search_backend
-from wagtail.search.models import Query
-from wagtail_personalisation.models import PersonalisablePageMetadata
+from website import search_cache
 from website.forms import SearchForm
-from website.models.pages import get_page_models, BasePage
+from website.models.pages import exclude_variants, get_page_models, BasePage
 from website.models.settings import GeneralSettings
 
+
+def get_results(search_query, search_model, page, per_page):
+    """
+    Runs a search and returns what the results page needs, by page id, so
+    it can be cached: the filterable page types with their result counts,
+    and the ids, total count and number of the requested page of results.
+    """
+    pagetypes = []
+    results = None
+    results_paginated = None
+
+    # Every page type is searched in one ranked query against the search
+    # backend's index, which weighs each page's fields by their boost.
+    # Results stay lazy, so the paginator only fetches the current page.
+    pages = exclude_variants(BasePage.objects.live())
+    results = pages.search(search_query)
+
+    # get filterable models, with how many results each has
+    pagemodels = sorted(get_page_models(), key=lambda k: k.search_name)
+    filterable = [model for model in pagemodels if model.search_filterable]
+    if filterable:
+        counts = results.facet('content_type_id')
+        for model in filterable:
+            content_type = ContentType.objects.get_for_model(model)
+            if counts.get(content_type.pk):
+                pagetypes.append({
+                    'content_type': content_type,
+                    'search_name_plural': model.search_name_plural,
+                    'search_count': counts[content_type.pk],
+                })
+
+    # if search_model is provided, only search on that model
+    if search_model:
+        content_type = None
+        for model in pagemodels:
+            if search_model == ContentType.objects.get_for_model(model).model:
+                content_type = ContentType.objects.get_for_model(model)
+        if content_type:
+            results = pages.filter(content_type=content_type).search(search_query)
+        else:
+            results = None
+
+    # paginate results
+    if results is not None:
+        paginator = Paginator(results, per_page)
+        try:
+            results_paginated = paginator.page(page)
+        except PageNotAnInteger:
+            results_paginated = paginator.page(1)
+        except EmptyPage:
+            results_paginated = paginator.page(1)
+        except InvalidPage:
+            results_paginated = paginator.page(1)
+
+    return {
+        'pagetypes': pagetypes,
+        'ids': [result.pk for result in results_paginated] if results_paginated is not None else None,
+        'count': paginator.count if results_paginated is not None else 0,
+        'number': results_paginated.number if results_paginated is not None else 1,
+    }
+
+
 def search(request):
     """
     Searches pages across the entire site.
@@ -19,68 +79,30 @@ def search(request):
     results = None
     results_paginated = None
     site = Site.find_for_request(request)
-    excluded_variant_pages = PersonalisablePageMetadata.objects.exclude(canonical_page_id=F('variant_id')).values_list('variant_id')
 
     if search_form.is_valid():
         search_query = search_form.cleaned_data['s']
         search_model = search_form.cleaned_data['t']
+        page = request.GET.get('p', 1)
+        per_page = GeneralSettings.for_request(request).search_num_results
 
-        # get all website models
-        pagemodels = sorted(get_page_models(), key=lambda k: k.search_name)
-        # get filterable models
-        for model in pagemodels:
-            if model.search_filterable:
-                pagetypes.append(model)
-
-        # get backend
-        backend = get_search_backend()
-
-        # DB search. Since this backend can't handle inheritance or scoring,
-        # search specified page types in the desired order and chain the results together.
-        # This provides better search results than simply searching limited fields on WebsitePage.
-        db_models = []
-        if backend.__class__ == db.SearchBackend:
-            for model in get_page_models():
-                if model.search_db_include:
-                    db_models.append(model)
-            db_models = sorted(db_models, reverse=True, key=lambda k: k.search_db_boost)
-
-        if backend.__class__ == db.SearchBackend and db_models:
-            for model in db_models:
-                # if search_model is provided, only search on that model
-                if not search_model or search_model == ContentType.objects.get_for_model(model).model:  # noqa
-                    curr_results = model.objects.live().exclude(pk__in=excluded_variant_pages).search(search_query)
-                    if results:
-                        results = list(chain(results, curr_results))
-                    else:
-                        results = curr_results
-
-        # Fallback for any other search backend
-        else:
-            if search_model:
-                try:
-                    model = ContentType.objects.get(model=search_model).model_class()
-                    results = model.objects.live().exclude(pk__in=excluded_variant_pages).search(search_query)
-                except search_model.DoesNotExist:
-                    results = None
-            else:
-                results = BasePage.objects.live().exclude(pk__in=excluded_variant_pages).order_by('-last_published_at').search(search_query)  # noqa
-
-        # paginate results
-        if results:
-            paginator = Paginator(results, GeneralSettings.for_request(request).search_num_results)
-            page = request.GET.get('p', 1)
-            try:
-                results_paginated = paginator.page(page)
-            except PageNotAnInteger:
-                results_paginated = paginator.page(1)
-            except EmptyPage:
-                results_paginated = paginator.page(1)
-            except InvalidPage:
-                results_paginated = paginator.page(1)
+        # Popular searches are served from ids cached until a page is published.
+        key = search_cache.search_cache_key('results', search_query, search_model, page, per_page)
+        cached = search_cache.get_results(key)
+        if cached is None:
+            cached = get_results(search_query, search_model, page, per_page)
+            search_cache.set_results(key, cached)
+        pagetypes = cached['pagetypes']
+
+        if cached['ids'] is not None:
+            pages = exclude_variants(BasePage.objects.live()).in_bulk(cached['ids'])
+            results = [pages[pk] for pk in cached['ids'] if pk in pages]
+            paginator = Paginator(range(cached['count']), per_page)
+            results_paginated = paginator.page(cached['number'])
+            results_paginated.object_list = results
 
         # Log the query so Wagtail can suggest promoted results
-        Query.get(search_query).add_hit()
+        search_cache.log_hit(search_query)
 
     # Render template
     return render(request, 'search/search.html', {
@@ -90,3 +112,27 @@ def search(request):
         'results': results,
         'results_paginated': results_paginated
     })
+
+
+def autocomplete(request):
+    """
+    Suggests pages whose title or tags start with the words typed so far,
+    using the search index's autocomplete column rather than a full search.
+    """
+    search_query = request.GET.get('s', '')[:255]
+    suggestions = []
+
+    if len(search_query.strip()) >= 2:
+        key = search_cache.search_cache_key('autocomplete', search_query, request.get_host())
+        suggestions = search_cache.get_results(key)
+        if suggestions is None:
+            pages = exclude_variants(BasePage.objects.live())
+            try:
+                results = list(pages.autocomplete(search_query)[:10])
+            except:
+                # backends without autocomplete, such as sqlite's in wagtail 2.15
+                results = pages.filter(title__istartswith=search_query.strip())[:10]
+            suggestions = [{'title': result.title, 'url': result.get_url(request)} for result in results]
+            search_cache.set_results(key, suggestions)
+
+    return JsonResponse({'results': suggestions})
@@ -0,0 +1,160 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from io import BytesIO
+from PIL import Image
+from wagtail.users.models import UserProfile
+
+logger = logging.getLogger('website')
+
+
+# Avatars are processed when a new one is uploaded, in a pool of threads once
+# the profile is saved, so the upload's request never waits on the resize.
+# The upload is cropped square and replaced by an AVATAR_SIZE copy in its own
+# format, next to a WebP copy at each of AVATAR_SIZES, all from one decode.
+# JPEGs are decoded at a reduced scale, which caps the memory a huge upload
+# takes. The WebP copies made are remembered in the cache for avatar_url, and
+# found in storage again by their names when the cache forgets them.
+def _size():
+    return getattr(settings, 'AVATAR_SIZE', 100)
+
+
+def _sizes():
+    return getattr(settings, 'AVATAR_SIZES', [50, 100, 200])
+
+
+def crop_center(img, crop_width, crop_height):
+    width, height = img.size
+    return img.crop(((width - crop_width) // 2,
+                     (height - crop_height) // 2,
+                     (width + crop_width) // 2,
+                     (height + crop_height) // 2))
+
+
+def crop_max_square(img):
+    return crop_center(img, min(img.size), min(img.size))
+
+
+def get_variant_name(name, size):
+    return '{0}.{1}.webp'.format(os.path.splitext(name)[0], size)
+
+
+def _variants_key(name):
+    return 'avatar_{0}'.format(name)
+
+
+def get_variants(avatar):
+    """
+    Returns the names of avatar's WebP copies by size, from the cache, or
+    from storage after a cache clear or eviction.
+    """
+    key = _variants_key(avatar.name)
+    variants = cache.get(key)
+    if variants is None:
+        variants = {}
+        for size in _sizes():
+            variant_name = get_variant_name(avatar.name, size)
+            if avatar.storage.exists(variant_name):
+                variants[size] = variant_name
+        # an avatar that is still being processed is looked for again shortly
+        cache.set(key, variants, None if variants else 300)
+    return variants
+
+
+def get_variant_url(avatar, size):
+    """
+    Returns the url of the smallest WebP copy of avatar that is at least twice
+    size, for high density screens, or the largest one, if it has been made.
+    """
+    variants = get_variants(avatar)
+    if not variants:
+        return None
+    fitting = [variant for variant in sorted(variants) if variant >= size * 2]
+    return avatar.storage.url(variants[fitting[0] if fitting else max(variants)])
+
+
+def delete_variants(storage, name):
+    variants = cache.get(_variants_key(name)) or {}
+    for variant_name in set(variants.values()) | set(get_variant_name(name, size) for size in _sizes()):
+        storage.delete(variant_name)
+    cache.delete(_variants_key(name))
+
+
+def _save(storage, name, img, img_format, **params):
+    memfile = BytesIO()
+    try:
+        img.save(memfile, img_format, **params)
+        return storage.save(name, ContentFile(memfile.getvalue()))
+    finally:
+        memfile.close()
+
+
+def process(profile_id, name):
+    """
+    Replaces a profile's avatar with its square AVATAR_SIZE copy and makes
+    its WebP copies, unless the avatar has changed again since.
+    """
+    try:
+        profile = UserProfile.objects.filter(pk=profile_id).only('avatar').first()
+        if profile is None or profile.avatar.name != name:
+            return
+        storage = profile.avatar.storage
+        largest = max(_sizes() + [_size()])
+
+        with storage.open(name) as avatar_file:
+            img = Image.open(avatar_file)
+            img_format = img.format
+            img.draft(None, (largest, largest))
+            square = crop_max_square(img)
+            square.load()
+            img.close()
+        if square.mode not in ['RGB', 'RGBA', 'L']:
+            square = square.convert('RGBA' if 'transparency' in square.info else 'RGB')
+
+        if square.size != (_size(), _size()):
+            resized = square.resize((_size(), _size()), Image.LANCZOS, reducing_gap=3.0)
+            saved = _save(storage, name, resized.convert('RGB') if img_format == 'JPEG' else resized, img_format)
+            if saved != name:
+                # storages that don't overwrite keep the upload under its name
+                UserProfile.objects.filter(pk=profile_id, avatar=name).update(avatar=saved)
+                storage.delete(name)
+                name = saved
+
+        # WebP copies are never larger than the upload. One smaller than
+        # every size gets a single copy at its own size, named for the
+        # smallest, so get_variants() can find it by name. A copy left by an
+        # earlier run is replaced, not saved next to under another name.
+        variants = {}
+        for size in [size for size in _sizes() if size <= square.width] or [min(_sizes())]:
+            width = min(size, square.width)
+            resized = square.resize((width, width), Image.LANCZOS, reducing_gap=3.0)
+            storage.delete(get_variant_name(name, size))
+            variants[size] = _save(storage, get_variant_name(name, size), resized, 'WEBP', quality=80)
+        square.close()
+        cache.set(_variants_key(name), variants, None)
+    except:
+        logger.exception('Could not process the avatar of profile %s.', profile_id)
+    finally:
+        connection.close()
+
+
+_executor = None
+
+
+def process_later(profile):
+    """
+    Processes profile's avatar in the background once the current
+    transaction commits.
+    """
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'AVATAR_WORKERS', 2), thread_name_prefix='avatars'
+        )
+    profile_id = profile.pk
+    name = profile.avatar.name
+    transaction.on_commit(lambda: _executor.submit(process, profile_id, name))
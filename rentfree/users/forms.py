@@ -11,6 +11,7 @@ from django.utils.translation import ugettext_lazy as _
 from wagtail.admin.localization import get_available_admin_time_zones
 from wagtail.contrib.forms.models import AbstractFormField
 from wagtail.users.models import UserProfile
+from users import avatars
 from users.models import CustomUserProfile
 from phonenumber_field.widgets import PhoneNumberInternationalFallbackWidget
 from allauth.account.adapter import get_adapter
@@ -169,6 +170,7 @@ class InitialWagtailProfileForm(forms.ModelForm):
             # will clear the now-updated field on self.instance too
             try:
                 self._original_avatar.storage.delete(self._original_avatar.name)
+                avatars.delete_variants(self._original_avatar.storage, self._original_avatar.name)
             except IOError:
                 # failure to delete the old avatar shouldn't prevent us from continuing
                 warnings.warn("Failed to delete old avatar file: %s" % self._original_avatar.name)
@@ -281,6 +283,7 @@ class SubsequentWagtailProfileForm(forms.ModelForm):
             # will clear the now-updated field on self.instance too
             try:
                 self._original_avatar.storage.delete(self._original_avatar.name)
+                avatars.delete_variants(self._original_avatar.storage, self._original_avatar.name)
             except IOError:
                 # failure to delete the old avatar shouldn't prevent us from continuing
                 warnings.warn("Failed to delete old avatar file: %s" % self._original_avatar.name)
@@ -1,13 +1,10 @@
-import pathlib
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, pre_save
 from django.dispatch import receiver
 from allauth.account.signals import user_signed_up
 from django.contrib.auth.models import Group
-from io import BytesIO
 from wagtail.users.models import UserProfile
-from custom_storages import s3_media_storage
+from users import avatars
 from users.models import CustomUserProfile, CustomUser
-from PIL import Image
 
 
 @receiver(user_signed_up)
@@ -70,37 +67,16 @@ def default_groups(sender, instance, **kwargs):
 		pass
 
 
-def crop_center(img, crop_width, crop_height):
-	width, height = img.size
-	return img.crop(((width - crop_width) // 2,
-					(height - crop_height) // 2,
-					(width + crop_width) // 2,
-					(height + crop_height) // 2))
-
-
-def crop_max_square(img):
-    return crop_center(img, min(img.size), min(img.size))
-
+@receiver(pre_save, sender=UserProfile)
+def flag_new_avatar(sender, instance, **kwargs):
+	""" note a newly uploaded avatar, before saving
+	the profile stores it. """
+	instance._avatar_uploaded = bool(instance.avatar) and not instance.avatar._committed
 
 
 @receiver(post_save, sender=UserProfile)
 def resize_avatar(sender, instance, **kwargs):
-	if instance.avatar:
-		memfile = BytesIO()
-		try:
-			img = Image.open(instance.avatar.file)
-		except:
-			img = None
-
-		if img:
-			width, height = img.size
-			newsize = 100, 100
-			try:
-				imgformat = img.format
-			except:
-				imgformat = pathlib.Path(instance.avatar.file.name).suffix.split('.')[1].upper()
-			img = crop_max_square(img).resize((newsize), Image.LANCZOS)
-			img.save(memfile, imgformat)
-			s3_media_storage.save(instance.avatar.name, memfile)
-			img.close()
-			memfile.close()
+	""" crop and resize a newly uploaded avatar in the
+	background, see users/avatars.py. """
+	if getattr(instance, '_avatar_uploaded', False):
+		avatars.process_later(instance)
@@ -1,3 +1,75 @@
-from django.test import TestCase
+import io
+import shutil
+import tempfile
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.images import ImageFile
+from django.test import TestCase, override_settings
+from PIL import Image
+from users import avatars
+from wagtail.users.models import UserProfile
 
-# Create your tests here.
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(
+    MEDIA_ROOT=MEDIA_ROOT,
+    DEFAULT_FILE_STORAGE='django.core.files.storage.FileSystemStorage',
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'avatar-tests'}},
+    AVATAR_SIZE=100,
+    AVATAR_SIZES=[50, 100, 200],
+)
+class AvatarVariantsTest(TestCase):
+    """
+    Avatars get WebP copies at AVATAR_SIZES, which avatar_url still finds
+    after the cache that remembers them is cleared.
+    """
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        # process() closes the connection its thread used, which is the test's here
+        patcher = mock.patch.object(avatars, 'connection')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(cache.clear)
+        user = get_user_model().objects.create(email='avatar@example.com', user_name='avatar')
+        self.profile = UserProfile.get_for_user(user)
+
+    def upload(self, width, height):
+        image_file = io.BytesIO()
+        Image.new('RGB', (width, height)).save(image_file, 'PNG')
+        self.profile.avatar = ImageFile(image_file, name='avatar.png')
+        self.profile.save()
+        avatars.process(self.profile.pk, self.profile.avatar.name)
+        self.profile.refresh_from_db()
+        return self.profile.avatar
+
+    def test_variants(self):
+        avatar = self.upload(300, 200)
+        variants = avatars.get_variants(avatar)
+        self.assertEqual(sorted(variants), [50, 100, 200])
+        self.assertTrue(avatars.get_variant_url(avatar, 50).endswith('.100.webp'))
+        self.assertTrue(avatars.get_variant_url(avatar, 200).endswith('.200.webp'))
+
+        cache.clear()
+        self.assertEqual(avatars.get_variants(avatar), variants)
+        self.assertTrue(avatars.get_variant_url(avatar, 50).endswith('.100.webp'))
+
+    def test_small_upload(self):
+        avatar = self.upload(30, 30)
+        cache.clear()
+        variants = avatars.get_variants(avatar)
+        self.assertEqual(list(variants), [50])
+        with avatar.storage.open(variants[50]) as variant:
+            self.assertEqual(Image.open(variant).size, (30, 30))
+
+    def test_deleted_variants(self):
+        avatar = self.upload(300, 200)
+        avatars.delete_variants(avatar.storage, avatar.name)
+        self.assertEqual(avatars.get_variants(avatar), {})
+        self.assertIsNone(avatars.get_variant_url(avatar, 50))
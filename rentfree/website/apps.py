@@ -1,4 +1,7 @@
 from django.apps import AppConfig
 
 class WebsiteConfig(AppConfig):
-    name = 'website'
\ No newline at end of file
+    name = 'website'
+
+    def ready(self):
+        import website.signals
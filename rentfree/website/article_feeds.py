@@ -1,27 +1,13 @@
-import bleach
-import lxml
 import re
-from bs4 import BeautifulSoup
 from django.conf import settings
 from django.contrib.syndication.views import Feed
 from django.utils.feedgenerator import Rss201rev2Feed, rfc2822_date
 from django.utils.text import slugify
+from website import utils
+from website.feeds import StreamingFeedGeneratorMixin, StreamingFeedMixin, get_rendition_url
 from xml.sax.saxutils import XMLGenerator
 
 
-def disallow_anchors(description):
-    soup = BeautifulSoup(description, 'lxml')
-    for link in soup.find_all('a'):
-        if 'href' in link.attrs:
-            if re.match(r'^<a\shref="\#.*?">.*?</a>$', str(link), re.IGNORECASE):
-                link.replace_with_children()
-            else:
-                pass
-        else:
-            pass
-    return soup.body.decode_contents()
-
-
 class SimplerXMLGenerator(XMLGenerator):
     def addQuickElement(self, name, contents=None, attrs=None):
         "Convenience method for adding an element with no children"
@@ -54,7 +40,8 @@ class SimplerXMLGenerator(XMLGenerator):
         sorted_attrs = dict(sorted(attrs.items())) if attrs else attrs
         super().startElement(name, sorted_attrs)
 
-class ArticleFeedGenerator(Rss201rev2Feed):
+class ArticleFeedGenerator(StreamingFeedGeneratorMixin, Rss201rev2Feed):
+    handler_class = SimplerXMLGenerator
 
     def rss_attributes(self):
         return {
@@ -96,9 +83,7 @@ class ArticleFeedGenerator(Rss201rev2Feed):
         handler.addQuickElement("title", item['title'])
         handler.addQuickElement("link", item['link'])
         if item['description'] is not None:
-            description = (bleach.clean(item['description'].replace('</p>', '</p><br />'), strip=True, tags=['p', 'ul', 'li', 'a', 'br'])).lstrip()
-            description_stripped = disallow_anchors(description)
-            handler.addQuickElement("description", '<![CDATA[' + description_stripped + ']]>')
+            handler.addQuickElement("description", '<![CDATA[' + item['description'] + ']]>')
         # Author information.
         if item['item_authors'] is not None:
             for author in item['item_authors']:
@@ -157,7 +142,7 @@ class ArticleFeedGenerator(Rss201rev2Feed):
         handler.endElement("rss")
 
 
-class ArticleFeed(Feed):
+class ArticleFeed(StreamingFeedMixin, Feed):
     """
     Serves an RSS feed for a public podcast index page in Wagtail with a routable url that calls this feed.
     Note required data being passed to __init__: first = first post in the feed, use .specific() to get the 
@@ -235,17 +220,29 @@ class ArticleFeed(Feed):
 
     def item_link(self, item):
         if item.personalisation_metadata.is_canonical:
-            return item.full_url
+            return item.get_full_url(self.request)
         else:
-            return item.personalisation_metadata.canonical_page.full_url
+            return item.personalisation_metadata.canonical_page.get_full_url(self.request)
 
     def items(self):
-        if self.all_public and self.all_private:
-            return self.all_public | self.all_private
-        elif self.all_public and not self.all_private:
-            return self.all_public
-        elif self.all_private and not self.all_public:
-            return self.all_private
+        if self.all_public is not None and self.all_private is not None:
+            queryset = self.all_public | self.all_private
+        elif self.all_public is not None:
+            queryset = self.all_public
+        elif self.all_private is not None:
+            queryset = self.all_private
+        else:
+            return None
+        # Fetch everything the item methods below touch up front, so the number
+        # of queries doesn't grow with the number of articles.
+        return queryset.select_related(
+            '_personalisable_page_metadata__canonical_page',
+            'uploaded_media',
+        ).prefetch_related(
+            'author__author',
+            'contributor__contributor',
+            'tagged_items__tag',
+        )
 
     def item_title(self, item):
         if item.personalisation_metadata.is_canonical:
@@ -254,12 +251,10 @@ class ArticleFeed(Feed):
             return item.personalisation_metadata.canonical_page.title
 
     def item_description(self, item):
-        item_bodytext = item.body.render_as_block()
-        soup = BeautifulSoup(item_bodytext, 'lxml')
-        soup_body = str(soup.select_one('.block-body_text'))
-        item.bodytext = bleach.clean(soup_body, strip=True, tags=['p', 'ul', 'li', 'a', 'br']).lstrip()
-
-        return '<p>' + item.caption + '</p>' + item.bodytext
+        if item.feed_description:
+            return item.feed_description
+        else:
+            return utils.render_feed_description(item)
 
     def item_enclosure_url(self, item):
         if item.personalisation_metadata.is_canonical:
@@ -290,7 +285,7 @@ class ArticleFeed(Feed):
             else:
                 return None
         elif item.uploaded_media:
-            return item.uploaded_media.file.size
+            return item.uploaded_media.get_file_size()
         else:
             return None
 
@@ -301,7 +296,7 @@ class ArticleFeed(Feed):
             else:
                 return None
         elif item.uploaded_media:
-            return item.uploaded_media_type
+            return item.uploaded_media_type or item.uploaded_media.mime_type
         else:
             return None
 
@@ -315,27 +310,29 @@ class ArticleFeed(Feed):
         return item.first_published_at
 
     def item_categories(self, item):
-        if item.tags and self.index_page.rss_categories:
-            return item.tags.names()
+        if self.index_page.rss_categories:
+            return [tag.name for tag in item.tags.all()]
         else:
             return None
 
     def item_comments(self, item):
         if item.personalisation_metadata.is_canonical:
-            return item.full_url + '#comments'
+            return item.get_full_url(self.request) + '#comments'
         else:
-            return item.personalisation_metadata.canonical_page.full_url + '#comments'
+            return item.personalisation_metadata.canonical_page.get_full_url(self.request) + '#comments'
 
 
     def feed_extra_kwargs(self, obj):
         return {
-            'rss_image_url': self.index_page.rss_image.get_rendition('fill-1440x1440|format-jpeg|jpegquality-80').url if self.index_page.rss_image else None,
+            'rss_image_url': get_rendition_url(self.index_page.rss_image, 'fill-1440x1440|format-jpeg|jpegquality-80') if self.index_page.rss_image else None,
             'rss_categories': self.tags if (self.tags and self.index_page.rss_categories) else None,
             'rss_editor_email': self.index_page.rss_editor.email if self.index_page.rss_editor else None,
         }
 
     def item_extra_kwargs(self, item):
+        authors = list(item.author.all())
+        contributors = list(item.contributor.all())
         return {
-            'item_authors': item.author.all() if item.author.first() else None,
-            'item_contributors': item.contributor.all() if item.contributor.first() else None
+            'item_authors': authors if authors else None,
+            'item_contributors': contributors if contributors else None
         }
@@ -0,0 +1,66 @@
+import logging
+from django.db.models import DateField, F, Max, Sum, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from website.models.media import Download, DownloadEvent
+
+logger = logging.getLogger('website')
+
+
+# Premium downloads are written as DownloadEvents, a single insert that never
+# waits on another download, so a release's burst of downloads doesn't queue
+# on the subscribers' Download records. The rollup_downloads command adds the
+# events to those records, which lag behind the event log until it runs.
+
+
+def log_download(profile_id, media_id, tier=0):
+    """
+    Logs one download, logging rather than raising a failure, so the
+    download is never refused because it could not be counted.
+    """
+    try:
+        DownloadEvent.objects.create(user_id=profile_id, media_id=media_id, tier=tier)
+    except:
+        logger.exception('Could not log a premium media download.')
+
+
+def record_downloads(downloads):
+    """
+    Adds downloads, a mapping of (profile id, media id, tier) to download
+    counts, to the download event log. A key may carry the time of its
+    downloads as a fourth item, for downloads counted after the fact, or
+    they are dated now.
+    """
+    now = timezone.now()
+    DownloadEvent.objects.bulk_create([
+        DownloadEvent(
+            user_id=key[0], media_id=key[1], tier=key[2], count=count,
+            created_at=key[3] if len(key) > 3 else now, recorded_at=now,
+        )
+        for key, count in downloads.items()
+    ])
+
+
+def update_download_records(events):
+    """
+    Adds events, a DownloadEvent queryset, to the subscribers' download
+    records, creating the missing ones. Run in a transaction.
+    """
+    counts = {}
+    for row in events.filter(user__isnull=False).values('user_id', 'media_id').annotate(
+        downloads=Sum('count'), latest=Max('created_at')
+    ).order_by():
+        counts[(row['user_id'], row['media_id'])] = (row['downloads'], timezone.localdate(row['latest']))
+
+    # records are unique per subscriber and media, so two rollups at
+    # once can't create two for the same download
+    Download.objects.bulk_create([
+        Download(user_id=profile_id, media_id=media_id, download_count=0, last=last)
+        for (profile_id, media_id), (count, last) in counts.items()
+    ], ignore_conflicts=True)
+    # in key order, so concurrent updates lock records in the same order
+    for (profile_id, media_id), (count, last) in sorted(counts.items()):
+        Download.objects.filter(user_id=profile_id, media_id=media_id).update(
+            download_count=F('download_count') + count,
+            last=Greatest('last', Value(last, output_field=DateField())),
+        )
@@ -54,6 +54,16 @@ class DownloadPermissionHelper(PermissionHelper):
     def user_can_delete_obj(self, user, obj):
         return False
 
+class DownloadReportPermissionHelper(PermissionHelper):
+    def user_can_list(self, user):
+        return True
+    def user_can_create(self, user):
+        return False
+    def user_can_edit_obj(self, user, obj):
+        return False
+    def user_can_delete_obj(self, user, obj):
+        return False
+
 
 class ReadOnlyPanel(EditHandler):
     def __init__(self, attr, *args, **kwargs):
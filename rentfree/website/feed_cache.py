@@ -0,0 +1,160 @@
+import hashlib
+import uuid
+from calendar import timegm
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from website import signed_media
+
+
+# Premium feeds only differ between subscribers on the same tiers by the
+# uidb64 and token in their urls, so the feed body is rendered once with
+# these placeholders and the subscriber's values are swapped in when served.
+PREMIUM_FEED_UIDB64 = 'rfpremiumuidb64'
+PREMIUM_FEED_TOKEN = 'rfpremiumtoken'
+
+
+def _generation_key(index_page_id):
+    return 'premiumfeed_generation_{0}'.format(index_page_id)
+
+
+def get_generation(index_page_id):
+    """
+    Returns the current generation of an index page's premium feeds.
+    Bumping the generation invalidates every tier's cached feed at once.
+    """
+    generation = cache.get(_generation_key(index_page_id))
+    if generation is None:
+        generation = uuid.uuid4().hex
+        cache.set(_generation_key(index_page_id), generation, None)
+    return generation
+
+
+def invalidate_premium_feeds(index_page_id):
+    cache.set(_generation_key(index_page_id), uuid.uuid4().hex, None)
+
+
+def premium_feed_cache_key(index_page, host, segment_ids):
+    segments = ','.join(str(segment_id) for segment_id in sorted(set(segment_ids)))
+    digest = hashlib.md5('{0}|{1}'.format(host, segments).encode()).hexdigest()
+    return 'premiumfeed_{0}_{1}_{2}'.format(index_page.id, get_generation(index_page.id), digest)
+
+
+def placeholder_link(link, uidb64, token):
+    return link.replace(uidb64, PREMIUM_FEED_UIDB64).replace(token, PREMIUM_FEED_TOKEN)
+
+
+def _replace(content, uidb64, token, tier=0):
+    content = content.replace(
+        PREMIUM_FEED_UIDB64.encode(), uidb64.encode()
+    ).replace(
+        PREMIUM_FEED_TOKEN.encode(), token.encode()
+    )
+    if signed_media.enabled():
+        content = signed_media.sign_enclosures(content, uidb64, tier)
+    return content
+
+
+def _personalise(cached, uidb64, token, tier=0):
+    response = HttpResponse(_replace(cached['content'], uidb64, token, tier), content_type=cached['content_type'])
+    if cached['last_modified']:
+        response['Last-Modified'] = cached['last_modified']
+    return response
+
+
+def get_premium_feed(key, uidb64, token, tier=0):
+    cached = cache.get(key)
+    if cached is None:
+        return None
+    return _personalise(cached, uidb64, token, tier)
+
+
+def _stream_and_store(key, response, uidb64, token, tier=0):
+    """
+    Hands a streamed feed to the subscriber while it is rendered,
+    storing the complete body once the last chunk has been written.
+    The body is only kept up to PREMIUM_FEED_CACHE_MAX_SIZE, past which
+    the feed is streamed without being stored.
+    """
+    max_size = getattr(settings, 'PREMIUM_FEED_CACHE_MAX_SIZE', 8388608)
+    chunks = []
+    size = 0
+    for chunk in response.streaming_content:
+        if chunks is not None:
+            size += len(chunk)
+            if size > max_size:
+                chunks = None
+            else:
+                chunks.append(chunk)
+        yield _replace(chunk, uidb64, token, tier)
+    if chunks is None:
+        return
+    cache.set(key, {
+        'content': b''.join(chunks),
+        'content_type': response['Content-Type'],
+        'last_modified': response.get('Last-Modified'),
+    })
+
+
+def set_premium_feed(key, response, uidb64, token, tier=0):
+    if response.streaming:
+        streamed = StreamingHttpResponse(
+            _stream_and_store(key, response, uidb64, token, tier),
+            content_type=response['Content-Type']
+        )
+        if response.get('Last-Modified'):
+            streamed['Last-Modified'] = response['Last-Modified']
+        return streamed
+    cached = {
+        'content': response.content,
+        'content_type': response['Content-Type'],
+        'last_modified': response.get('Last-Modified'),
+    }
+    cache.set(key, cached)
+    return _personalise(cached, uidb64, token, tier)
+
+
+def get_feed_validators(index_page, querymodel, host, segment_ids=None):
+    """
+    Returns an (etag, last_modified) pair for a feed under index_page, from
+    one aggregate over its live children plus the subscriber's tier segments,
+    so podcatcher polls can be answered without building the feed.
+    """
+    children = querymodel.objects.child_of(index_page).live().aggregate(
+        latest=Max('last_published_at'),
+        count=Count('id')
+    )
+    dates = [date for date in [children['latest'], index_page.last_published_at] if date]
+    parts = [index_page.id, index_page.last_published_at, children['latest'], children['count'], host]
+    if segment_ids is not None:
+        parts.append(','.join(str(segment_id) for segment_id in sorted(set(segment_ids))))
+        # signed enclosure links change with every window
+        if signed_media.enabled():
+            dates.append(signed_media.window_start())
+            parts.append(signed_media.current_window())
+    last_modified = max(dates) if dates else None
+    etag = '"{0}"'.format(hashlib.md5('|'.join(str(part) for part in parts).encode()).hexdigest())
+    return etag, last_modified
+
+
+def get_not_modified(request, etag, last_modified):
+    """
+    Returns a 304 response if the client's copy of the feed is current, else None.
+    """
+    response = get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=timegm(last_modified.utctimetuple()) if last_modified else None
+    )
+    # a 304 carries the validators it was answered with
+    return set_validators(response, etag, last_modified) if response is not None else None
+
+
+def set_validators(response, etag, last_modified):
+    response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(timegm(last_modified.utctimetuple()))
+    return response
@@ -0,0 +1,222 @@
+from calendar import timegm
+from django.conf import settings
+from django.contrib.sites.shortcuts import get_current_site
+from django.contrib.syndication.views import add_domain
+from django.db.models import Max
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.http import http_date
+from django.utils.timezone import get_default_timezone, is_naive, make_aware
+from django.utils.translation import get_language
+from wagtail.images.models import Filter
+from website import rendition_cache
+
+
+def get_rendition_url(image, spec):
+    """
+    Returns the url of an image rendition, taken from the image's prefetched
+    renditions when they include it, or from the rendition cache.
+    """
+    if 'renditions' in getattr(image, '_prefetched_objects_cache', {}):
+        focal_point_key = Filter(spec=spec).get_cache_key(image)
+        for rendition in image.renditions.all():
+            if rendition.filter_spec == spec and rendition.focal_point_key == focal_point_key:
+                return rendition.url
+    return rendition_cache.get_rendition_url(image, spec)
+
+
+class FeedStreamBuffer:
+    """
+    File-like object for the XML handler to write into, emptied after
+    every item so the feed can be handed out a chunk at a time.
+    """
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+class StreamingFeedGeneratorMixin:
+    """
+    Adds stream() to a feed generator, which writes exactly what write()
+    does, but yields after the channel header and after every <item>.
+    Set handler_class to the XML generator the feed's write() uses.
+    """
+    handler_class = None
+
+    def stream(self, outfile, encoding, items):
+        handler = self.handler_class(outfile, encoding)
+        handler.startDocument()
+        handler.startElement("rss", self.rss_attributes())
+        handler.startElement("channel", self.root_attributes())
+        self.add_root_elements(handler)
+        yield
+        for item in items:
+            handler.startElement('item', self.item_attributes(item))
+            self.add_item_elements(handler, item)
+            handler.endElement("item")
+            yield
+        self.endChannelElement(handler)
+        handler.endElement("rss")
+        yield
+
+
+class StreamingFeedMixin:
+    """
+    Streams feeds with more than settings.RSS_STREAM_THRESHOLD items,
+    fetching them from the database settings.RSS_STREAM_CHUNK_SIZE at a time
+    instead of building every item before writing the response.
+    Smaller feeds are rendered normally, so they can still be cached.
+    """
+    stream_pubdate_field = 'first_published_at'
+
+    def __call__(self, request, *args, **kwargs):
+        threshold = getattr(settings, 'RSS_STREAM_THRESHOLD', None)
+        if threshold:
+            obj = self.get_object(request, *args, **kwargs)
+            items = self._get_dynamic_attr('items', obj)
+            if items is not None:
+                items = self.order_items(items)
+                if items.order_by().values('pk')[threshold:threshold + 1].exists():
+                    return self.stream(request, obj, items)
+                return self.render(request, obj, items)
+        return super().__call__(request, *args, **kwargs)
+
+    def order_items(self, items):
+        """
+        Returns items in the feed's order, with ties broken by id, so that
+        rendered and streamed feeds list them the same way.
+        """
+        ordering = list(items.query.order_by or items.model._meta.ordering)
+        return items.order_by(*ordering, '-pk')
+
+    def render(self, request, obj, items):
+        """
+        Writes the feed of items, as Feed.__call__() does.
+        """
+        feedgen = self.get_feed_generator(obj, request)
+        for item in items:
+            feedgen.items.append(self.get_item(feedgen, item, request))
+        response = HttpResponse(content_type=feedgen.content_type)
+        if hasattr(self, 'item_pubdate') or hasattr(self, 'item_updateddate'):
+            response['Last-Modified'] = http_date(timegm(feedgen.latest_post_date().utctimetuple()))
+        feedgen.write(response, 'utf-8')
+        return response
+
+    def get_feed_generator(self, obj, request):
+        """
+        Returns the feed generator with the channel populated, but no items.
+        """
+        current_site = get_current_site(request)
+
+        link = self._get_dynamic_attr('link', obj)
+        link = add_domain(current_site.domain, link, request.is_secure())
+
+        return self.feed_type(
+            title=self._get_dynamic_attr('title', obj),
+            subtitle=self._get_dynamic_attr('subtitle', obj),
+            link=link,
+            description=self._get_dynamic_attr('description', obj),
+            language=self.language or get_language(),
+            feed_url=add_domain(
+                current_site.domain,
+                self._get_dynamic_attr('feed_url', obj) or request.path,
+                request.is_secure(),
+            ),
+            author_name=self._get_dynamic_attr('author_name', obj),
+            author_link=self._get_dynamic_attr('author_link', obj),
+            author_email=self._get_dynamic_attr('author_email', obj),
+            categories=self._get_dynamic_attr('categories', obj),
+            feed_copyright=self._get_dynamic_attr('feed_copyright', obj),
+            feed_guid=self._get_dynamic_attr('feed_guid', obj),
+            ttl=self._get_dynamic_attr('ttl', obj),
+            **self.feed_extra_kwargs(obj)
+        )
+
+    def get_item(self, feedgen, item, request):
+        """
+        Returns the dict the feed generator stores for a single item.
+        """
+        current_site = get_current_site(request)
+        link = add_domain(
+            current_site.domain,
+            self._get_dynamic_attr('item_link', item),
+            request.is_secure(),
+        )
+        author_name = self._get_dynamic_attr('item_author_name', item)
+        if author_name is not None:
+            author_email = self._get_dynamic_attr('item_author_email', item)
+            author_link = self._get_dynamic_attr('item_author_link', item)
+        else:
+            author_email = author_link = None
+
+        tz = get_default_timezone()
+
+        pubdate = self._get_dynamic_attr('item_pubdate', item)
+        if pubdate and is_naive(pubdate):
+            pubdate = make_aware(pubdate, tz)
+
+        updateddate = self._get_dynamic_attr('item_updateddate', item)
+        if updateddate and is_naive(updateddate):
+            updateddate = make_aware(updateddate, tz)
+
+        feedgen.add_item(
+            title=self._get_dynamic_attr('item_title', item),
+            link=link,
+            description=self._get_dynamic_attr('item_description', item),
+            unique_id=self._get_dynamic_attr('item_guid', item, link),
+            unique_id_is_permalink=self._get_dynamic_attr('item_guid_is_permalink', item),
+            enclosures=self._get_dynamic_attr('item_enclosures', item),
+            pubdate=pubdate,
+            updateddate=updateddate,
+            author_name=author_name,
+            author_email=author_email,
+            author_link=author_link,
+            comments=self._get_dynamic_attr('item_comments', item),
+            categories=self._get_dynamic_attr('item_categories', item),
+            item_copyright=self._get_dynamic_attr('item_copyright', item),
+            **self.item_extra_kwargs(item)
+        )
+        return feedgen.items.pop()
+
+    def iter_items(self, items):
+        # QuerySet.iterator() ignores prefetch_related() on Django 3.2, so
+        # chunks are sliced off the queryset to keep each one prefetched.
+        # order_items() gives every item a fixed place between slices.
+        chunk_size = getattr(settings, 'RSS_STREAM_CHUNK_SIZE', 100)
+        start = 0
+        while True:
+            chunk = list(items[start:start + chunk_size])
+            for item in chunk:
+                yield item
+            if len(chunk) < chunk_size:
+                break
+            start += chunk_size
+
+    def stream(self, request, obj, items):
+        feedgen = self.get_feed_generator(obj, request)
+
+        # lastBuildDate is written before any item, so the latest date the
+        # generator would find among its items is looked up up front.
+        latest = items.aggregate(latest=Max(self.stream_pubdate_field))['latest']
+        if latest is not None:
+            feedgen.latest_post_date = lambda: latest
+        latest_post_date = feedgen.latest_post_date()
+
+        def content():
+            outfile = FeedStreamBuffer()
+            feed_items = (self.get_item(feedgen, item, request) for item in self.iter_items(items))
+            for _ in feedgen.stream(outfile, 'utf-8', feed_items):
+                yield outfile.drain()
+
+        response = StreamingHttpResponse(content(), content_type=feedgen.content_type)
+        response['Last-Modified'] = http_date(timegm(latest_post_date.utctimetuple()))
+        return response
@@ -0,0 +1,62 @@
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+from django.template import Template
+from post_office import mail
+
+logger = logging.getLogger('website')
+
+
+# Form pages' summary and confirmation emails are rendered from templates
+# compiled once per process. They are keyed on their source, which is what
+# an edit to a confirmation email changes, so an edited email is compiled
+# again and an unchanged one never is. The rendered emails are queued in
+# post_office from a thread once the submission is stored, so a visitor
+# doesn't wait on them, and send_queued_mail delivers them as before.
+@functools.lru_cache(maxsize=512)
+def get_template(source):
+    return Template(source)
+
+
+def render(source, context):
+    return get_template(source).render(context)
+
+
+def queue(messages):
+    """
+    Queues messages, a list of post_office mail.send() arguments, in one
+    query, or one by one when an address doesn't validate.
+    """
+    try:
+        try:
+            mail.send_many(messages)
+        except ValidationError:
+            for message in messages:
+                try:
+                    mail.send(**message)
+                except ValidationError as e:
+                    logger.warning('Could not queue a form submission email to %s: %s', message['recipients'], e)
+    except:
+        logger.exception('Could not queue %s form submission emails.', len(messages))
+    finally:
+        connection.close()
+
+
+_executor = None
+
+
+def queue_later(messages):
+    """
+    Queues messages in the background once the current transaction commits.
+    """
+    global _executor
+    if not messages:
+        return
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'FORM_MAIL_WORKERS', 1), thread_name_prefix='form_mail'
+        )
+    transaction.on_commit(lambda: _executor.submit(queue, messages))
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from website import utils
+from website.models.pages import ArticleContentPage, PodcastContentPage
+
+
+class Command(BaseCommand):
+    help = 'Stores the RSS descriptions of articles and episodes saved before they were stored on the page.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Render every description again, not only the missing ones.')
+        parser.add_argument('--batch', type=int, default=200, help='Pages to update in each query.')
+
+    def handle(self, *args, **options):
+        for model in [ArticleContentPage, PodcastContentPage]:
+            pages = model.objects.all()
+            if not options['all']:
+                pages = pages.filter(feed_description='')
+
+            # descriptions are written without saving the page, so
+            # no revision is made and nothing else on it changes
+            updated = []
+            failed = 0
+            for page in pages.iterator():
+                try:
+                    page.feed_description = utils.render_feed_description(page)
+                except Exception as e:
+                    self.stderr.write('{0}: {1}'.format(page.url_path, e))
+                    failed += 1
+                    continue
+                updated.append(page)
+
+            model.objects.bulk_update(updated, ['feed_description'], batch_size=options['batch'])
+            self.stdout.write('{0}: {1} descriptions stored, {2} could not be rendered.'.format(
+                model._meta.verbose_name_plural, len(updated), failed
+            ))
@@ -0,0 +1,38 @@
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand
+from website.models.media import CustomMedia
+
+
+class Command(BaseCommand):
+    help = 'Stores the file size, MIME type and hash of uploaded media that were uploaded without them.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Read every media file again, not only those without a size.')
+        parser.add_argument('--workers', type=int, default=4, help='Media files to read at once.')
+        parser.add_argument('--batch', type=int, default=200, help='Media to update in each query.')
+
+    def read(self, media):
+        try:
+            media.set_file_metadata()
+            return media
+        except Exception as e:
+            self.stderr.write('{0}: {1}'.format(media.file.name, e))
+            return None
+
+    def handle(self, *args, **options):
+        media = CustomMedia.objects.exclude(file='')
+        if not options['all']:
+            media = media.filter(file_size__isnull=True)
+        media = media.only('file')
+
+        updated = []
+        failed = 0
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            for item in executor.map(self.read, media.iterator()):
+                if item is None:
+                    failed += 1
+                    continue
+                updated.append(item)
+
+        CustomMedia.objects.bulk_update(updated, ['file_size', 'mime_type', 'file_hash'], batch_size=options['batch'])
+        self.stdout.write('{0} media updated, {1} could not be read.'.format(len(updated), failed))
@@ -0,0 +1,56 @@
+import shutil
+import tempfile
+import time
+from django.core.cache import caches
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.management.base import BaseCommand
+from django.http import HttpResponse
+from wagtailcache.settings import wagtailcache_settings
+
+
+class Command(BaseCommand):
+    help = 'Compares cache hit latency and clear() cost of the file cache against the configured page cache, which is cleared afterwards.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--entries', type=int, default=2000, help='Cached pages to fill each cache with.')
+        parser.add_argument('--hits', type=int, default=5000, help='Cache hits to time.')
+        parser.add_argument('--size', type=int, default=40000, help='Size in bytes of each cached page.')
+
+    def fill(self, cache, entries, response):
+        for i in range(entries):
+            cache.set('benchmark_page_{0}'.format(i), response)
+
+    def time_hits(self, cache, entries, hits):
+        start = time.perf_counter()
+        for i in range(hits):
+            cache.get('benchmark_page_{0}'.format(i % entries))
+        return (time.perf_counter() - start) / hits * 1000000
+
+    def time_clear(self, cache):
+        start = time.perf_counter()
+        cache.clear()
+        return (time.perf_counter() - start) * 1000
+
+    def run(self, name, cache, options):
+        # A page response like the ones wagtailcache stores.
+        response = HttpResponse(b'x' * options['size'], content_type='text/html; charset=utf-8')
+        self.fill(cache, options['entries'], response)
+        hit = self.time_hits(cache, options['entries'], options['hits'])
+        clear = self.time_clear(cache)
+        self.stdout.write('{0}: {1:.1f} us per hit, {2:.1f} ms to clear {3} entries'.format(
+            name, hit, clear, options['entries']
+        ))
+
+    def handle(self, *args, **options):
+        location = tempfile.mkdtemp()
+        try:
+            filecache = FileBasedCache(location, {'KEY_PREFIX': 'benchmark', 'TIMEOUT': 3600, 'OPTIONS': {'MAX_ENTRIES': options['entries'] * 2}})
+            self.run('FileBasedCache', filecache, options)
+        finally:
+            shutil.rmtree(location, ignore_errors=True)
+
+        pages = caches[wagtailcache_settings.WAGTAIL_CACHE_BACKEND]
+        if isinstance(pages, FileBasedCache):
+            self.stdout.write('The page cache is file based, set DOCACHE_BACKEND=memcached to compare.')
+            return
+        self.run(pages.__class__.__name__, pages, options)
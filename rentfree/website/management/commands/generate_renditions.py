@@ -0,0 +1,27 @@
+from concurrent.futures import ThreadPoolExecutor, wait
+from django.core.management.base import BaseCommand
+from website import renditions
+from website.models.pages import get_page_models
+from website.models.settings import LayoutSettings, SeoSettings
+
+
+class Command(BaseCommand):
+    help = 'Renders every image rendition the live pages and site settings are shown with.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='Images to render at once.')
+
+    def handle(self, *args, **options):
+        wanted = set()
+        for model in get_page_models():
+            for page in model.objects.live().specific():
+                wanted |= renditions.get_page_renditions(page)
+        for model in [LayoutSettings, SeoSettings]:
+            for site_settings in model.objects.all():
+                wanted |= renditions.get_settings_renditions(site_settings)
+
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            wait(renditions.generate_all(wanted, executor))
+        self.stdout.write('{0} renditions of {1} images checked.'.format(
+            len(wanted), len(set(image_id for image_id, spec in wanted))
+        ))
@@ -0,0 +1,90 @@
+import collections
+import os
+from datetime import datetime
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils.http import urlsafe_base64_decode
+from website import downloads
+from website.models.media import DownloadLogImport
+
+
+class Command(BaseCommand):
+    help = "Counts the signed premium downloads in nginx's premium_downloads log."
+
+    def add_arguments(self, parser):
+        parser.add_argument('logfiles', nargs='+', help='premium_downloads logs, usually the one rotated last night.')
+
+    def read(self, logfile, hits):
+        """
+        Counts a download for every full response, or every range response
+        from the first byte, so a player's later range requests aren't counted.
+        Hits are keyed by the minute they were logged in and the tier signed
+        into the link, which is blank for links signed before it was added.
+        """
+        with open(logfile) as f:
+            for line in f:
+                fields = line.rstrip('\n').split(' ')
+                quoted = next((i for i, field in enumerate(fields) if field.startswith('"')), None)
+                if quoted == 6:
+                    logged, uidb64, tier, media_id, status, sent = fields[:6]
+                elif quoted == 5:
+                    # lines logged before the tier was added to the log format
+                    logged, uidb64, media_id, status, sent = fields[:5]
+                    tier = ''
+                else:
+                    continue
+                http_range = ' '.join(fields[quoted:]).strip('"')
+                try:
+                    logged = datetime.fromisoformat(logged).replace(second=0, microsecond=0)
+                    media_id = int(media_id)
+                except ValueError:
+                    continue
+                if status == '200' or (status == '206' and http_range.startswith('bytes=0-')):
+                    hits[(uidb64, int(tier) if tier.isdigit() else None, media_id, logged)] += 1
+
+    def handle(self, *args, **options):
+        hits = collections.Counter()
+        imports = []
+        for logfile in options['logfiles']:
+            try:
+                stat = os.stat(logfile)
+                if DownloadLogImport.objects.filter(inode=stat.st_ino, size=stat.st_size, mtime_ns=stat.st_mtime_ns).exists():
+                    self.stdout.write('{0} has already been imported.'.format(logfile))
+                    continue
+                file_hits = collections.Counter()
+                self.read(logfile, file_hits)
+            except OSError as e:
+                self.stderr.write('{0}: {1}'.format(logfile, e))
+                continue
+            hits.update(file_hits)
+            imports.append(DownloadLogImport(
+                name=logfile, inode=stat.st_ino, size=stat.st_size, mtime_ns=stat.st_mtime_ns,
+                downloads=sum(file_hits.values()),
+            ))
+
+        emails = {}
+        for uidb64 in set(key[0] for key in hits):
+            try:
+                emails[urlsafe_base64_decode(uidb64).decode()] = uidb64
+            except:
+                pass
+        profiles = dict(
+            (emails[email], (profile_id, tier)) for email, profile_id, tier in
+            get_user_model().objects.filter(email__in=emails, base_userprofile__isnull=False).values_list(
+                'email', 'base_userprofile__id', 'is_paysubscribed'
+            )
+        )
+
+        counted = collections.Counter()
+        for (uidb64, tier, media_id, logged), count in hits.items():
+            if uidb64 in profiles:
+                profile_id, current_tier = profiles[uidb64]
+                counted[(profile_id, media_id, current_tier if tier is None else tier, logged)] += count
+        # the logs are marked imported with their downloads, so a failed
+        # import can be run again and a finished one is never counted twice
+        with transaction.atomic():
+            DownloadLogImport.objects.bulk_create(imports)
+            if counted:
+                downloads.record_downloads(counted)
+        self.stdout.write('{0} downloads counted for {1} subscribers.'.format(sum(counted.values()), len(profiles)))
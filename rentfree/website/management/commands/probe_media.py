@@ -0,0 +1,55 @@
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand
+from website import feed_cache, media_probe, page_cache
+from website.models.pages import ArticleContentPage, PodcastContentPage
+
+
+class Command(BaseCommand):
+    help = 'Probes the remote media of articles and episodes for their size, type and duration.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Probe every remote media, not only those without a size.')
+        parser.add_argument('--workers', type=int, default=8, help='Remote media to probe at once.')
+        parser.add_argument('--batch', type=int, default=200, help='Pages to update in each query.')
+
+    def probe(self, page):
+        try:
+            return page, media_probe.probe(page.remote_media)
+        except Exception as e:
+            self.stderr.write('{0}: {1}'.format(page.remote_media, e))
+            return page, None
+
+    def handle(self, *args, **options):
+        index_page_ids = set()
+        for model in [ArticleContentPage, PodcastContentPage]:
+            pages = model.objects.filter(remote_media__isnull=False).exclude(remote_media='').exclude(
+                remote_media_type__in=media_probe.EMBED_TYPES
+            )
+            if not options['all']:
+                pages = pages.filter(remote_media_size__isnull=True)
+            pages = pages.only('parent_page', 'remote_media', 'remote_media_size', 'remote_media_type', 'remote_media_duration')
+
+            probed = []
+            failed = 0
+            with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+                for page, result in executor.map(self.probe, pages.iterator()):
+                    if result is None or result['size'] is None:
+                        failed += 1
+                        continue
+                    for field, value in media_probe.values(page, result).items():
+                        setattr(page, field, value)
+                    probed.append(page)
+                    index_page_ids.add(page.parent_page_id)
+
+            model.objects.bulk_update(
+                probed, ['remote_media_size', 'remote_media_type', 'remote_media_duration'], batch_size=options['batch']
+            )
+            self.stdout.write('{0}: {1} probed, {2} without a size.'.format(
+                model._meta.verbose_name_plural, len(probed), failed
+            ))
+
+        # feeds list the probed sizes, so drop their cached copies
+        if index_page_ids:
+            for index_page_id in index_page_ids:
+                feed_cache.invalidate_premium_feeds(index_page_id)
+            page_cache.purge([page_cache.EVERYTHING])
@@ -0,0 +1,17 @@
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand
+from users import avatars
+from wagtail.users.models import UserProfile
+
+
+class Command(BaseCommand):
+    help = 'Crops and resizes the avatars of every profile and makes their WebP copies.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='Avatars to process at once.')
+
+    def handle(self, *args, **options):
+        profiles = UserProfile.objects.exclude(avatar='').exclude(avatar__isnull=True).values_list('pk', 'avatar')
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            list(executor.map(lambda profile: avatars.process(*profile), profiles.iterator()))
+        self.stdout.write('{0} avatars processed.'.format(profiles.count()))
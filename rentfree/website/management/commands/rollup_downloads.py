@@ -0,0 +1,78 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F, Max, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from website import downloads
+from website.models.media import DailyMediaDownloads, DownloadEvent, DownloadRollup
+
+
+class Command(BaseCommand):
+    help = 'Adds the download events recorded since the last rollup to the daily media download totals and download records.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true', help='Recount the daily totals from the whole event log.')
+        parser.add_argument('--batch', type=int, default=50000, help='Events to add up in each transaction.')
+
+    def rollup(self, rollup, upto):
+        """
+        Adds the events after rollup's last event, up to and including upto,
+        to the daily totals, and those not counted yet to the download records.
+        """
+        if upto > rollup.counted_event_id:
+            downloads.update_download_records(
+                DownloadEvent.objects.filter(pk__gt=max(rollup.last_event_id, rollup.counted_event_id), pk__lte=upto)
+            )
+            rollup.counted_event_id = upto
+
+        totals = DownloadEvent.objects.filter(pk__gt=rollup.last_event_id, pk__lte=upto).annotate(
+            date=TruncDate('created_at')
+        ).values('date', 'media_id', 'tier').annotate(downloads=Sum('count')).order_by()
+        totals = dict(((row['date'], row['media_id'], row['tier']), row['downloads']) for row in totals)
+
+        existing = DailyMediaDownloads.objects.filter(
+            date__in=set(date for date, media_id, tier in totals),
+            media_id__in=set(media_id for date, media_id, tier in totals),
+        )
+        updated = []
+        for row in existing:
+            key = (row.date, row.media_id, row.tier)
+            if key in totals:
+                row.downloads = F('downloads') + totals.pop(key)
+                updated.append(row)
+        DailyMediaDownloads.objects.bulk_update(updated, ['downloads'])
+        DailyMediaDownloads.objects.bulk_create([
+            DailyMediaDownloads(date=date, media_id=media_id, tier=tier, downloads=downloads)
+            for (date, media_id, tier), downloads in totals.items()
+        ])
+
+        rollup.last_event_id = upto
+        rollup.rolled_up_at = timezone.now()
+        rollup.save()
+
+    def handle(self, *args, **options):
+        rollup_id = DownloadRollup.objects.get_or_create(pk=1)[0].pk
+        if options['rebuild']:
+            with transaction.atomic():
+                rollup = DownloadRollup.objects.select_for_update().get(pk=rollup_id)
+                DailyMediaDownloads.objects.all().delete()
+                rollup.last_event_id = 0
+                rollup.save()
+
+        # Events written in the last few minutes are left for the next run,
+        # so a batch still being written can't be skipped past.
+        events = DownloadEvent.objects.filter(recorded_at__lt=timezone.now() - timedelta(minutes=5)).order_by('pk')
+        rolled_up = 0
+        while True:
+            with transaction.atomic():
+                rollup = DownloadRollup.objects.select_for_update().get(pk=rollup_id)
+                pending = events.filter(pk__gt=rollup.last_event_id)
+                upto = pending.values_list('pk', flat=True)[options['batch'] - 1:options['batch']].first()
+                if upto is None:
+                    upto = pending.aggregate(upto=Max('pk'))['upto']
+                if upto is None:
+                    break
+                self.rollup(rollup, upto)
+                rolled_up += 1
+        self.stdout.write('{0} batches of download events rolled up.'.format(rolled_up))
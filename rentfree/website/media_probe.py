@@ -0,0 +1,136 @@
+import logging
+import re
+import requests
+import threading
+from django.conf import settings
+from django.db import connection, transaction
+from requests.adapters import HTTPAdapter
+from website import feed_cache, page_cache
+from website.models.choices import page_choices
+
+logger = logging.getLogger('website')
+
+
+# Remote episodes are probed for their size, type and duration after the
+# page is saved, in a thread, so publishing never waits on the remote host.
+# Probes share one pooled session and give up after MEDIA_PROBE_TIMEOUT.
+EMBED_TYPES = ['youtube', 'vimeo']
+MEDIA_TYPES = [choice[0] for choice in page_choices['MEDIA_CONTENT_TYPE_CHOICES'] if choice[0] not in EMBED_TYPES]
+
+_session = requests.Session()
+_session.headers['User-Agent'] = 'rentfree-media-probe'
+_session.mount('http://', HTTPAdapter(pool_connections=4, pool_maxsize=16))
+_session.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=16))
+
+
+def _timeout():
+    return getattr(settings, 'MEDIA_PROBE_TIMEOUT', 5)
+
+
+def _size(response):
+    """
+    Returns the total size from a HEAD or a ranged GET, if the host reports one.
+    """
+    content_range = re.match(r'bytes \d+-\d+/(\d+)$', response.headers.get('content-range', ''))
+    if content_range:
+        return int(content_range.group(1))
+    if response.status_code == 200 and response.headers.get('content-length', '').isdigit():
+        return int(response.headers['content-length'])
+    return None
+
+
+def probe(url):
+    """
+    Asks the host of url for the media's size in bytes, content type and
+    duration in seconds. A HEAD is tried first, then a GET for its first byte.
+    Returns a dict with None for whatever the host doesn't report.
+    """
+    result = {'size': None, 'type': None, 'duration': None}
+    response = _session.head(url, allow_redirects=True, timeout=_timeout())
+    if response.status_code >= 400 or _size(response) is None:
+        response = _session.get(url, headers={'Range': 'bytes=0-0'}, stream=True, timeout=_timeout())
+        response.close()
+    if response.status_code >= 400:
+        return result
+
+    result['size'] = _size(response)
+    content_type = response.headers.get('content-type', '').split(';')[0].strip().lower()
+    if content_type in ['audio/mp4', 'audio/m4a', 'audio/aac']:
+        content_type = 'audio/x-m4a'
+    elif content_type in ['audio/mp3', 'audio/mpeg3']:
+        content_type = 'audio/mpeg'
+    elif content_type in ['video/mp4', 'video/m4v']:
+        content_type = 'video/x-m4v'
+    if content_type in MEDIA_TYPES:
+        result['type'] = content_type
+    duration = response.headers.get('x-content-duration', '')
+    try:
+        result['duration'] = str(round(float(duration)))
+    except:
+        pass
+    return result
+
+
+def needs_probe(page, update_fields=None):
+    """
+    Called from a content page's save. Keeps the size probed for the page's
+    current remote media, as a revision may carry an older copy of the page,
+    and returns True if the media still has to be probed.
+    """
+    if update_fields is not None and 'remote_media' not in update_fields:
+        return False
+    if not page.remote_media or page.remote_media_type in EMBED_TYPES:
+        return False
+    if page.pk:
+        saved = type(page).objects.filter(pk=page.pk).values('remote_media', 'remote_media_size').first()
+        if saved and saved['remote_media'] == page.remote_media and saved['remote_media_size']:
+            page.remote_media_size = saved['remote_media_size']
+            return False
+    page.remote_media_size = None
+    return True
+
+
+def probe_page(model, page_id):
+    """
+    Probes a page's remote media and stores what was found, without saving
+    the page or a revision, then drops the cached copies of its feeds.
+    """
+    try:
+        page = model.objects.filter(pk=page_id).only(
+            'remote_media', 'remote_media_type', 'remote_media_duration', 'live', 'path', 'url_path'
+        ).first()
+        if page is None or not page.remote_media:
+            return
+        update = values(page, probe(page.remote_media))
+        model.objects.filter(pk=page_id, remote_media=page.remote_media).update(**update)
+        if page.live:
+            feed_cache.invalidate_premium_feeds(page.get_parent().id)
+            page_cache.purge(page_cache.get_page_patterns(page))
+    except:
+        logger.exception('Could not probe the remote media of page %s.', page_id)
+    finally:
+        connection.close()
+
+
+def values(page, result):
+    """
+    Returns the fields to update on page from a probe result. The editor's
+    type and duration are kept, and only filled in when they were left blank.
+    """
+    update = {'remote_media_size': result['size']}
+    if result['type'] and not page.remote_media_type:
+        update['remote_media_type'] = result['type']
+    if result['duration'] and not page.remote_media_duration:
+        update['remote_media_duration'] = result['duration']
+    return update
+
+
+def probe_later(page):
+    """
+    Probes page's remote media in a thread once the current transaction commits.
+    """
+    model = type(page)
+    page_id = page.pk
+    transaction.on_commit(
+        lambda: threading.Thread(target=probe_page, args=(model, page_id), daemon=True).start()
+    )
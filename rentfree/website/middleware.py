@@ -0,0 +1,152 @@
+import hashlib
+import time
+from django.conf import settings
+from django.http import SimpleCookie
+from django.template.response import SimpleTemplateResponse
+from django.utils.cache import get_conditional_response, get_max_age, patch_cache_control, patch_vary_headers
+from django.utils.http import parse_http_date_safe
+from urllib.parse import unquote
+from wagtailcache import cache as wagtailcache
+from wagtailcache.settings import wagtailcache_settings
+
+
+# When a cached page expires or is purged, the first request to miss takes a
+# lock and renders it. Requests arriving while it renders are handed the
+# previous copy, kept for WAGTAIL_CACHE_STALE_TIMEOUT after it expires, or
+# wait up to WAGTAIL_CACHE_LOCK_WAIT seconds for the new one.
+
+# Cached pages vary on this header. Whatever the client sent is discarded,
+# and the cache_subscriber_pages hook sets it from a subscriber's tiers.
+TIERS_HEADER = 'X-Rentfree-Tiers'
+TIERS_META = 'HTTP_X_RENTFREE_TIERS'
+
+
+def _request_key(request, prefix):
+    uri = unquote(wagtailcache._chop_querystring(request).build_absolute_uri())
+    digest = hashlib.md5('{0}|{1}|{2}'.format(request.method, uri, request.META.get(TIERS_META, '')).encode()).hexdigest()
+    return 'wagtailcache_{0}_{1}'.format(prefix, digest)
+
+
+def _not_modified(request, response):
+    """
+    Answers a conditional request for a cached feed from the validators it was
+    stored with, see feed_cache.set_validators(). Other pages have no ETag
+    and are returned as they are, so nothing is hashed to answer them.
+    """
+    if not response.has_header('ETag'):
+        return response
+    last_modified = response.get('Last-Modified')
+    return get_conditional_response(
+        request,
+        etag=response['ETag'],
+        last_modified=parse_http_date_safe(last_modified) if last_modified else None,
+        response=response,
+    )
+
+
+def _is_subscriber(request):
+    user = getattr(request, 'user', None)
+    return user is not None and user.is_authenticated
+
+
+class FetchFromCacheMiddleware(wagtailcache.FetchFromCacheMiddleware):
+    """
+    Lets one worker render a page missing from the cache while the others
+    serve its stale copy or wait for it. Cached feeds answer conditional
+    requests themselves, as the feed views do.
+    """
+
+    def fetch(self, request):
+        request.META[TIERS_META] = ''
+        response = super().process_request(request)
+        if response is not None or not getattr(request, '_wagtailcache_update', False):
+            return response
+
+        lock_key = _request_key(request, 'lock')
+        if self._wagcache.add(lock_key, 1, getattr(settings, 'WAGTAIL_CACHE_LOCK_TIMEOUT', 30)):
+            request._wagtailcache_lock = lock_key
+            return None
+
+        response = self._wagcache.get(_request_key(request, 'stale'))
+        if response is not None:
+            request._wagtailcache_update = False
+            return response
+
+        deadline = time.monotonic() + getattr(settings, 'WAGTAIL_CACHE_LOCK_WAIT', 2)
+        while time.monotonic() < deadline:
+            time.sleep(0.1)
+            response = super().process_request(request)
+            if response is not None:
+                return response
+        return None
+
+    def process_request(self, request):
+        response = self.fetch(request)
+        return _not_modified(request, response) if response is not None else None
+
+
+class UpdateCacheMiddleware(wagtailcache.UpdateCacheMiddleware):
+    """
+    Keeps a stale copy of every page it caches and releases the render lock
+    once the page has been stored.
+    """
+
+    def store_stale(self, request, response):
+        timeout = get_max_age(response)
+        if timeout is None:
+            timeout = self._wagcache.default_timeout
+        stale_timeout = timeout + getattr(settings, 'WAGTAIL_CACHE_STALE_TIMEOUT', 0)
+        self._wagcache.set(_request_key(request, 'stale'), response, stale_timeout)
+
+    def release(self, request):
+        lock_key = getattr(request, '_wagtailcache_lock', None)
+        if lock_key:
+            self._wagcache.delete(lock_key)
+            request._wagtailcache_lock = None
+
+    def share(self, request, response):
+        """
+        Prepares a page to be cached for every visitor on the same tiers, unless
+        it rendered a form or messages meant for this visitor alone. Returns the
+        cookies taken off the response, so they are not cached with it.
+        """
+        messages = getattr(request, '_messages', None)
+        if request.META.get('CSRF_COOKIE_USED') or (messages is not None and messages.used):
+            patch_cache_control(response, private=True)
+            return None
+        wagtailcache._delete_vary_cookie(response)
+        cookies = response.cookies
+        response.cookies = SimpleCookie()
+        return cookies
+
+    def process_response(self, request, response):
+        cookies = None
+        if TIERS_META in request.META and not getattr(request, '_wagtailcache_skip', False):
+            patch_vary_headers(response, [TIERS_HEADER])
+            if getattr(request, '_wagtailcache_update', False):
+                cookies = self.share(request, response)
+
+        response = super().process_response(request, response)
+
+        header = wagtailcache_settings.WAGTAIL_CACHE_HEADER
+        stored = header and response.get(header) == wagtailcache.Status.MISS.value
+        if not stored:
+            self.release(request)
+        else:
+            def stale_and_release(r):
+                if getattr(settings, 'WAGTAIL_CACHE_STALE_TIMEOUT', 0):
+                    self.store_stale(request, r)
+                self.release(request)
+
+            if isinstance(response, SimpleTemplateResponse):
+                response.add_post_render_callback(stale_and_release)
+            else:
+                stale_and_release(response)
+
+        if cookies is not None:
+            response.cookies = cookies
+        # Shared or not, a subscriber's copy must stay out of other caches.
+        if _is_subscriber(request):
+            patch_cache_control(response, private=True)
+            patch_vary_headers(response, ['Cookie'])
+        return response
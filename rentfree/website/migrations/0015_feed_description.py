@@ -0,0 +1,23 @@
+# Generated by Django 3.2.12 on 2026-10-18 16:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0014_analyticssettings_ga_tag_manager_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='articlecontentpage',
+            name='feed_description',
+            field=models.TextField(blank=True, editable=False, help_text='Sanitised RSS description, generated from the caption and body text when the page is saved.', verbose_name='Feed description'),
+        ),
+        migrations.AddField(
+            model_name='podcastcontentpage',
+            name='feed_description',
+            field=models.TextField(blank=True, editable=False, help_text='Sanitised RSS description, generated from the caption and body text when the page is saved.', verbose_name='Feed description'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 3.2.12 on 2026-10-18 16:39
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def flag_variants(apps, schema_editor):
+    BasePage = apps.get_model('website', 'BasePage')
+    PersonalisablePageMetadata = apps.get_model('wagtail_personalisation', 'PersonalisablePageMetadata')
+    variant_ids = PersonalisablePageMetadata.objects.exclude(canonical_page_id=F('variant_id')).values_list('variant_id', flat=True)
+    BasePage.objects.filter(pk__in=list(variant_ids)).update(is_variant=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wagtail_personalisation', '0025_auto_20190822_0627'),
+        ('website', '0015_feed_description'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='basepage',
+            name='is_variant',
+            field=models.BooleanField(db_index=True, default=False, editable=False, help_text='Whether this page is a segment variant of another page, kept in sync with its personalisation metadata.', verbose_name='Personalised variant'),
+        ),
+        migrations.RunPython(flag_variants, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 3.2.12 on 2026-10-18 17:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0016_basepage_is_variant'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='articlecontentpage',
+            index=models.Index(fields=['date_display', 'basepage_ptr'], name='website_article_date_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='podcastcontentpage',
+            index=models.Index(fields=['date_display', 'basepage_ptr'], name='website_podcast_date_id_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 3.2.12 on 2026-10-18 17:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0017_content_page_date_id_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='custommedia',
+            name='file_hash',
+            field=models.CharField(blank=True, editable=False, max_length=40, verbose_name='file hash'),
+        ),
+        migrations.AddField(
+            model_name='custommedia',
+            name='file_size',
+            field=models.PositiveBigIntegerField(editable=False, null=True, verbose_name='file size'),
+        ),
+        migrations.AddField(
+            model_name='custommedia',
+            name='mime_type',
+            field=models.CharField(blank=True, editable=False, max_length=100, verbose_name='MIME type'),
+        ),
+    ]
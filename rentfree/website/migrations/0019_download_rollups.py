@@ -0,0 +1,55 @@
+# Generated by Django 3.2.12 on 2026-10-18 18:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_auto_20220221_2116'),
+        ('website', '0018_custommedia_metadata'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='download',
+            name='download_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='DownloadEvent',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('tier', models.PositiveSmallIntegerField(default=0)),
+                ('count', models.PositiveIntegerField(default=1)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('media', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='website.custommedia')),
+                ('user', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='users.customuserprofile')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DailyMediaDownloads',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='date')),
+                ('tier', models.PositiveSmallIntegerField(default=0, verbose_name='tier')),
+                ('downloads', models.PositiveIntegerField(default=0, verbose_name='downloads')),
+                ('media', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='website.custommedia', verbose_name='media')),
+            ],
+            options={
+                'verbose_name': 'Daily media downloads',
+                'verbose_name_plural': 'Daily media downloads',
+                'unique_together': {('date', 'media', 'tier')},
+            },
+        ),
+        migrations.CreateModel(
+            name='DownloadRollup',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_event_id', models.BigIntegerField(default=0)),
+                ('rolled_up_at', models.DateTimeField(null=True)),
+            ],
+        ),
+    ]
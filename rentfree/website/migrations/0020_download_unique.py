@@ -0,0 +1,31 @@
+# Generated by Django 3.2.12 on 2026-10-19 09:10
+
+from django.db import migrations, models
+from django.db.models import Count, Max, Min, Sum
+
+
+def merge_duplicate_downloads(apps, schema_editor):
+    Download = apps.get_model('website', 'Download')
+    duplicates = Download.objects.values('user_id', 'media_id').annotate(
+        rows=Count('id'), keep=Min('id'), total=Sum('download_count'), latest=Max('last')
+    ).filter(rows__gt=1)
+    for duplicate in duplicates:
+        Download.objects.filter(pk=duplicate['keep']).update(download_count=duplicate['total'], last=duplicate['latest'])
+        Download.objects.filter(user_id=duplicate['user_id'], media_id=duplicate['media_id']).exclude(
+            pk=duplicate['keep']
+        ).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0019_download_rollups'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_downloads, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='download',
+            constraint=models.UniqueConstraint(fields=('user', 'media'), name='website_download_user_media'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 3.2.12 on 2026-10-19 10:05
+
+from django.db import migrations, models
+from django.db.models import F
+import django.utils.timezone
+
+
+def copy_created_at(apps, schema_editor):
+    DownloadEvent = apps.get_model('website', 'DownloadEvent')
+    DownloadEvent.objects.update(recorded_at=F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0020_download_unique'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='downloadevent',
+            name='recorded_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.RunPython(copy_created_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 3.2.12 on 2026-10-19 10:40
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0021_downloadevent_recorded_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DownloadLogImport',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255)),
+                ('inode', models.BigIntegerField()),
+                ('size', models.BigIntegerField()),
+                ('mtime_ns', models.BigIntegerField()),
+                ('downloads', models.PositiveIntegerField(default=0)),
+                ('imported_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'unique_together': {('inode', 'size', 'mtime_ns')},
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 3.2.12 on 2026-10-20 09:15
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def mark_events_counted(apps, schema_editor):
+    # events logged so far were added to the download records as they were written
+    DownloadEvent = apps.get_model('website', 'DownloadEvent')
+    DownloadRollup = apps.get_model('website', 'DownloadRollup')
+    counted = DownloadEvent.objects.aggregate(counted=Max('pk'))['counted'] or 0
+    DownloadRollup.objects.update_or_create(pk=1, defaults={'counted_event_id': counted})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0022_downloadlogimport'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='downloadrollup',
+            name='counted_event_id',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.RunPython(mark_events_counted, migrations.RunPython.noop),
+    ]
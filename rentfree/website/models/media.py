@@ -1,6 +1,9 @@
+import hashlib
+import mimetypes
 from custom_storages import s3_priv_storage
 from datetime import datetime
 from django.db import models
+from django.utils import timezone
 from django.utils.translation import ugettext_lazy as _
 from users.models import CustomUserProfile
 from wagtailmedia.models import AbstractMedia
@@ -20,6 +23,12 @@ class CustomMedia(AbstractMedia):
         help_text=_('Duration in seconds. Valid input formats: HH:MM:SS, MM:SS, or SS.'),
     )
 
+    # Read from the upload when the file is saved, so feeds never ask the
+    # storage backend for them. See the backfill_media_metadata command.
+    file_size = models.PositiveBigIntegerField(null=True, editable=False, verbose_name=_('file size'))
+    mime_type = models.CharField(blank=True, max_length=100, editable=False, verbose_name=_('MIME type'))
+    file_hash = models.CharField(blank=True, max_length=40, editable=False, verbose_name=_('file hash'))
+
     downloads = models.ManyToManyField(CustomUserProfile, related_name='media_download', through='Download')
 
     admin_form_fields = (
@@ -41,11 +50,116 @@ class CustomMedia(AbstractMedia):
 
         super().clean(*args, **kwargs)
 
+    def set_file_metadata(self):
+        """
+        Reads the file's size, MIME type and SHA1 hash. A new upload is read
+        in place, a stored file is downloaded once.
+        """
+        file_hash = hashlib.sha1()
+        file_size = 0
+        stored = self.file._committed
+        if stored:
+            self.file.open('rb')
+        try:
+            for chunk in self.file.chunks():
+                file_hash.update(chunk)
+                file_size += len(chunk)
+        finally:
+            if stored:
+                self.file.close()
+        self.file_size = file_size
+        self.file_hash = file_hash.hexdigest()
+        self.mime_type = mimetypes.guess_type(self.filename)[0] or 'application/octet-stream'
+
+    def get_file_size(self):
+        """
+        Returns the stored file size, asking the storage backend only once for
+        media uploaded before it was stored.
+        """
+        if self.file_size is None:
+            try:
+                self.file_size = self.file.size
+            except:
+                return None
+            CustomMedia.objects.filter(pk=self.pk).update(file_size=self.file_size)
+        return self.file_size
+
+    def save(self, *args, **kwargs):
+        if self.file and not self.file._committed:
+            self.set_file_metadata()
+        super().save(*args, **kwargs)
+
 
 class Download(models.Model):
 
     user = models.ForeignKey(CustomUserProfile, on_delete=models.CASCADE)
     media = models.ForeignKey(CustomMedia, on_delete=models.CASCADE)
-    download_count = models.SmallIntegerField(blank=False, default=0)
+    download_count = models.PositiveIntegerField(blank=False, default=0)
     last = models.DateField(blank=False, default=datetime.now)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'media'], name='website_download_user_media'),
+        ]
+
+
+class DownloadEvent(models.Model):
+    """
+    Premium downloads as they are recorded, one row per download logged by
+    website/downloads.py, or per subscriber, media and tier in an import of
+    nginx's log. Never updated, only rolled up into DailyMediaDownloads and
+    the Download records by the rollup_downloads command.
+    created_at is when the downloads happened, recorded_at when they were
+    written, which is later for downloads imported from nginx's log.
+    """
+    id = models.BigAutoField(primary_key=True)
+    user = models.ForeignKey(CustomUserProfile, null=True, on_delete=models.SET_NULL)
+    media = models.ForeignKey(CustomMedia, on_delete=models.CASCADE)
+    tier = models.PositiveSmallIntegerField(default=0)
+    count = models.PositiveIntegerField(default=1)
+    created_at = models.DateTimeField(default=timezone.now)
+    recorded_at = models.DateTimeField(default=timezone.now, editable=False)
+
+
+class DailyMediaDownloads(models.Model):
+    """
+    Downloads of one media on one day by subscribers on one tier.
+    """
+    date = models.DateField(verbose_name=_('date'))
+    media = models.ForeignKey(CustomMedia, on_delete=models.CASCADE, verbose_name=_('media'))
+    tier = models.PositiveSmallIntegerField(default=0, verbose_name=_('tier'))
+    downloads = models.PositiveIntegerField(default=0, verbose_name=_('downloads'))
+
+    class Meta:
+        unique_together = ['date', 'media', 'tier']
+        verbose_name = _('Daily media downloads')
+        verbose_name_plural = _('Daily media downloads')
+
+
+class DownloadLogImport(models.Model):
+    """
+    A premium_downloads log counted by the import_premium_downloads command,
+    identified by its inode, size and modification time, so it is only
+    counted once however often the command is run on it.
+    """
+    name = models.CharField(max_length=255)
+    inode = models.BigIntegerField()
+    size = models.BigIntegerField()
+    mtime_ns = models.BigIntegerField()
+    downloads = models.PositiveIntegerField(default=0)
+    imported_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        unique_together = ['inode', 'size', 'mtime_ns']
+
+
+class DownloadRollup(models.Model):
+    """
+    The last DownloadEvent counted into DailyMediaDownloads, and the last
+    added to the Download records, which a rebuild of the daily totals
+    doesn't count again.
+    """
+    last_event_id = models.BigIntegerField(default=0)
+    counted_event_id = models.BigIntegerField(default=0)
+    rolled_up_at = models.DateTimeField(null=True)
+
@@ -3,8 +3,6 @@ import json
 import logging
 import lxml
 import os
-import pathlib
-import requests
 import uuid
 from comment.models import Comment
 from datetime import datetime
@@ -20,14 +18,15 @@ from django.core.files.storage import FileSystemStorage
 from django.core.mail import EmailMessage
 from django.core.paginator import Paginator, InvalidPage, EmptyPage, PageNotAnInteger
 from django.core.serializers.json import DjangoJSONEncoder
+from django.core.cache import cache
 from django.db import models
-from django.db.models import Q
+from django.db.models import Count, Max, Q
 from django.db.models.expressions import F
 from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from django.http import HttpResponseRedirect, HttpResponseForbidden
 from django.shortcuts import render, redirect
-from django.template import Context, Template
+from django.template import Context
 from django.utils import timezone
 from django.utils.decorators import method_decorator
 from django.utils.html import strip_tags
@@ -40,7 +39,6 @@ from modelcluster.fields import ParentalKey
 from modelcluster.models import get_all_child_relations
 from modelcluster.tags import ClusterTaggableManager
 from pathlib import Path
-from post_office import mail
 from taggit.models import TaggedItemBase
 from users.tokens import premium_token
 from wagtail.admin.edit_handlers import (
@@ -70,8 +68,8 @@ from wagtail.snippets.edit_handlers import SnippetChooserPanel
 from wagtail.utils.decorators import cached_classmethod
 from wagtailcache.cache import cache_page, nocache_page, WagtailCacheMixin
 from wagtail_personalisation.models import PersonalisablePageMixin, PersonalisablePageMetadata
-from wagtail_personalisation.utils import exclude_variants
-from website import utils
+from website import feed_cache, form_mail, utils
+from website.tiers import resolve_tiers
 from website.forms import (
     DateTimeField,
     DateField,
@@ -84,7 +82,6 @@ from website.models.blocks import (
     ContentWallBlock
 )
 from website.models.choices import page_choices
-from website.models.rules import TierEqualOrGreater, TierEqual
 from website.models.settings import GeneralSettings, LayoutSettings, SeoSettings
 from website.models.snippets import Email
 from website.article_feeds import ArticleFeed
@@ -114,13 +111,19 @@ def get_page_models():
     return WEB_PAGE_MODELS
 
 
+def exclude_variants(pages):
+    """
+    Returns pages without personalised variants, using the `is_variant` flag
+    kept in sync with the personalisation metadata by website.signals.
+    """
+    if issubclass(pages.model, BasePage):
+        return pages.filter(is_variant=False)
+    return pages.exclude(basepage__is_variant=True)
+
+
 class BasePageMeta(PageBase):
     def __init__(cls, name, bases, dct):
         super().__init__(name, bases, dct)
-        if 'search_db_include' not in dct:
-            cls.search_db_include = False
-        if 'search_db_boost' not in dct:
-            cls.search_db_boost = 0
         if 'search_filterable' not in dct:
             cls.search_filterable = False
         if 'search_name' not in dct:
@@ -260,6 +263,17 @@ class BasePage(Page, metaclass=BasePageMeta):
         verbose_name=_('Content Walls')
     )
 
+    is_variant = models.BooleanField(
+        default=False,
+        editable=False,
+        db_index=True,
+        verbose_name=_('Personalised variant'),
+        help_text=_('Whether this page is a segment variant of another page, kept in sync with its personalisation metadata.')
+    )
+
+    # set from the personalisation metadata, not copied with the page
+    exclude_fields_in_copy = ['is_variant']
+
     ###############
     # Search
     ###############
@@ -268,6 +282,7 @@ class BasePage(Page, metaclass=BasePageMeta):
         index.SearchField('title', partial_match=True, boost=3),
         index.SearchField('seo_title', partial_match=True, boost=3),
         index.SearchField('search_description', boost=2),
+        index.AutocompleteField('title'),
         index.FilterField('title'),
         index.FilterField('id'),
         index.FilterField('live'),
@@ -282,6 +297,7 @@ class BasePage(Page, metaclass=BasePageMeta):
         index.FilterField('index_show_subpages'),
         index.FilterField('index_order_by'),
         index.FilterField('custom_template'),
+        index.FilterField('is_variant'),
     ]
 
     ###############
@@ -450,20 +466,30 @@ class BasePage(Page, metaclass=BasePageMeta):
 
         return False
 
+    def paginate_index_children(self, request, children):
+        """
+        Returns the requested page of `children`. Ordered indexes are paged
+        by keyset, from the child a page comes `after` or `before`, so deep
+        pages of large archives are not counted and offset.
+        """
+        if self.index_order_by:
+            paginator = utils.KeysetPaginator(children, self.index_num_per_page, self.index_order_by)
+            return paginator.page(after=request.GET.get('after'), before=request.GET.get('before'))
+
+        paginator = Paginator(children, self.index_num_per_page)
+        pagenum = request.GET.get('p', 1)
+        try:
+            return paginator.page(pagenum)
+        except (PageNotAnInteger, EmptyPage, InvalidPage) as e:
+            return paginator.page(1)
+
     def get_context(self, request, *args, **kwargs):
 
         context = super().get_context(request)
 
         if self.index_show_subpages:
             all_children = self.get_index_children()
-            paginator = Paginator(all_children, self.index_num_per_page)
-            pagenum = request.GET.get('p', 1)
-            try:
-                paged_children = paginator.page(pagenum)
-            except (PageNotAnInteger, EmptyPage, InvalidPage) as e:
-                paged_children = paginator.page(1)
-
-            context['index_paginated'] = paged_children
+            context['index_paginated'] = self.paginate_index_children(request, all_children)
             context['index_children'] = all_children
         context['content_walls'] = self.get_content_walls()
         return context
@@ -1194,55 +1220,40 @@ class PodcastContentIndexPage(WagtailCacheMixin, RoutablePageMixin, WebPage):
     def get_context(self, request, *args, **kwargs):
         context = super().get_context(request, *args, **kwargs)
         try:
-            all_children = self.get_index_children()
+            all_children = context['index_children'] if 'index_children' in context else self.get_index_children()
         except:
             all_children = None
+        seasons = self.get_seasons() if self.rss_itunes_type == 'serial' else []
 
-        if all_children and all_children.first().season_number and self.rss_itunes_type == 'serial':
+        if all_children is not None and seasons:
             from website.utils import LocalPaginator
-            from website.utils import LocalPage
-            oldest_season = all_children.first().season_number
-            loop_end = all_children.last().season_number
-            season_qs = dict()
-            for i in range(oldest_season, loop_end + 1):
-                season_qs[i] = LocalPaginator(all_children.filter(season_number=i), 200)
-                if i > oldest_season:
-                    season_qs[i].has_previous = True
-                    season_qs[i].previous_page_number = i - 1
-                    season_qs[i].num_pages = loop_end
-                if i < loop_end:
-                    season_qs[i].has_next = True
-                    season_qs[i].next_page_number = i + 1
-                    season_qs[i].num_pages = loop_end
-                season_qs[i].number = i
-
-            pagenum = request.GET.get('p', 1)
-
-            if pagenum == 'latest':
-                try:
-                    paged_series_children = season_qs.get(loop_end).page(1)
-                except (PageNotAnInteger, EmptyPage, InvalidPage) as e:
-                    paged_series_children = season_qs[count(season_qs)].page(1)
-            else:
-                try:
-                    paged_series_children = season_qs.get(int(pagenum)).page(1)
-                except (PageNotAnInteger, EmptyPage, InvalidPage) as e:
-                    paged_series_children = season_qs[count(season_qs)].page(1)
-
-            context['index_paginated'] = paged_series_children
-            context['index_children'] = all_children
-            
-            
-        else:
-            paginator = Paginator(all_children, self.index_num_per_page)
-
+            numbers = [season['season_number'] for season in seasons]
             pagenum = request.GET.get('p', 1)
             try:
-                paged_children = paginator.page(pagenum)
-            except (PageNotAnInteger, EmptyPage, InvalidPage) as e:
-                paged_children = paginator.page(1)
+                number = int(pagenum)
+            except (TypeError, ValueError):
+                number = None
+            if number not in numbers:
+                number = numbers[-1]
+            i = numbers.index(number)
+
+            # one season per page, counted by the season summary
+            paginator = LocalPaginator(all_children.filter(season_number=number), 200)
+            paginator.count = seasons[i]['count']
+            paginator.number = number
+            paginator.num_pages = numbers[-1]
+            if i > 0:
+                paginator.has_previous = True
+                paginator.previous_page_number = numbers[i - 1]
+            if i < len(numbers) - 1:
+                paginator.has_next = True
+                paginator.next_page_number = numbers[i + 1]
+
+            context['index_paginated'] = paginator.page(1)
+            context['index_children'] = all_children
 
-            context['index_paginated'] = paged_children
+        elif 'index_paginated' not in context:
+            context['index_paginated'] = self.paginate_index_children(request, all_children)
             context['index_children'] = all_children
 
         if request.GET.get('tag', None):
@@ -1265,24 +1276,42 @@ class PodcastContentIndexPage(WagtailCacheMixin, RoutablePageMixin, WebPage):
 
         return cleaned_data
 
+    def get_seasons(self):
+        """
+        Returns the seasons of the live episodes under this index, oldest first,
+        with their episode count and latest revision date. Computed with one
+        aggregate query and cached until an episode here is published,
+        unpublished or moved, see website.signals.
+        """
+        key = self.seasons_cache_key(self.pk)
+        seasons = cache.get(key)
+        if seasons is None:
+            querymodel = resolve_model_string(self.index_query_pagemodel, self._meta.app_label)
+            seasons = list(
+                exclude_variants(querymodel.objects.child_of(self).live())
+                .exclude(season_number=None)
+                .values('season_number')
+                .annotate(count=Count('pk'), lastmod=Max('latest_revision_created_at'))
+                .order_by('season_number')
+            )
+            cache.set(key, seasons)
+        return seasons
+
+    @staticmethod
+    def seasons_cache_key(index_page_id):
+        return 'podcast_seasons_{0}'.format(index_page_id)
+
     def get_sitemap_urls(self, request=None):
-        if self.rss_itunes_type == 'serial':
-            all_children = self.get_index_children().order_by('first_published_at')
-            if all_children.first().season_number and self.rss_itunes_type == 'serial':
-                oldest_season = all_children.first().season_number
-                loop_end = all_children.last().season_number
-                season_qs = dict()
-                season_list = []
-                for i in range(oldest_season, loop_end + 1):
-                    season_qs[i] = all_children.filter(season_number=i).order_by('-latest_revision_created_at').first()
-                    season_qs[i].location = self.get_full_url(request) + '?p=' + str(season_qs[i].season_number)
-                    season_qs[i].lastmod = season_qs[i].latest_revision_created_at
-                    season_list.append({
-                        'location': season_qs[i].location,
-                        'lastmod': season_qs[i].lastmod,
-                    })
-
-                return season_list
+        seasons = self.get_seasons() if self.rss_itunes_type == 'serial' else []
+        if seasons:
+            url = self.get_full_url(request)
+            return [
+                {
+                    'location': url + '?p=' + str(season['season_number']),
+                    'lastmod': season['lastmod'],
+                }
+                for season in seasons
+            ]
         else:
             return [
                 {
@@ -1306,6 +1335,11 @@ class PodcastContentIndexPage(WagtailCacheMixin, RoutablePageMixin, WebPage):
         """
         querymodel = resolve_model_string(self.index_query_pagemodel, self._meta.app_label)
 
+        etag, last_modified = feed_cache.get_feed_validators(self, querymodel, request.get_host())
+        response = feed_cache.get_not_modified(request, etag, last_modified)
+        if response is not None:
+            return response
+
         public = exclude_variants(querymodel.objects.child_of(self)).live().order_by('-date_display')
         if self.rss_omit_previews:
             all_public = public.exclude(episode_preview=True)
@@ -1322,7 +1356,7 @@ class PodcastContentIndexPage(WagtailCacheMixin, RoutablePageMixin, WebPage):
         feed = PodcastFeed(request, rss_link, home_link, all_public, all_private, token, uidb64)
         # 'feed' is a class-based view, so we need to call feed and pass it the request to get our response.
 
-        return feed(request)
+        return feed_cache.set_validators(feed(request), etag, last_modified)
 
     
     @cache_control(private=True)
@@ -1347,52 +1381,21 @@ class PodcastContentIndexPage(WagtailCacheMixin, RoutablePageMixin, WebPage):
                     public_queryset = None
 
                 if public_queryset:
-                    user_gte_tiers = []
-                    user_eq_tiers = []
-
-                    self.user = user
-
-                    try:
-                        tier_gte_objects = TierEqualOrGreater.objects.all()
-                    except:
-                        tier_gte_objects = None
-
-                    try:
-                        tier_eq_objects = TierEqual.objects.all()
-                    except:
-                        tier_eq_objects = None
-
-                    if tier_gte_objects:
-                        for obj in tier_gte_objects:
-                            if obj.test_user(self):
-                                user_gte_tiers += [obj.segment_id]
-
-                    if tier_eq_objects:
-                        for obj in tier_eq_objects:
-                            if obj.test_user(self):
-                                user_eq_tiers += [obj.segment_id]
-
-                    private_queryset_pages = querymodel.objects.none()
-                    public_queryset_pages = querymodel.objects.none()
-
-                    if tier_gte_objects and tier_eq_objects:
-                        for tier in user_gte_tiers:
-                            public_queryset_pages |= TierEqualOrGreater.segment.get_queryset().get(id=tier).get_used_pages().values_list('canonical_page_id')
-                            private_queryset_pages |= TierEqualOrGreater.segment.get_queryset().get(id=tier).get_used_pages().values_list('variant_id')
-                        for tier in user_eq_tiers:
-                            public_queryset_pages |= TierEqual.segment.get_queryset().get(id=tier).get_used_pages().values_list('canonical_page_id')
-                            private_queryset_pages |= TierEqual.segment.get_queryset().get(id=tier).get_used_pages().values_list('variant_id')
-                    elif tier_gte_objects and not tier_eq_objects:
-                        for tier in user_gte_tiers:
-                            public_queryset_pages |= TierEqualOrGreater.segment.get_queryset().get(id=tier).get_used_pages().values_list('canonical_page_id')
-                            private_queryset_pages |= TierEqualOrGreater.segment.get_queryset().get(id=tier).get_used_pages().values_list('variant_id')
-                    elif tier_eq_objects and not tier_gte_objects:
-                        for tier in user_eq_tiers:
-                            public_queryset_pages |= TierEqual.segment.get_queryset().get(id=tier).get_used_pages().values_list('canonical_page_id')
-                            private_queryset_pages |= TierEqual.segment.get_queryset().get(id=tier).get_used_pages().values_list('variant_id')
-                    else:
-                        private_queryset_pages = None
-                        public_queryset_pages = None
+                    tiers = resolve_tiers(user)
+
+                    etag, last_modified = feed_cache.get_feed_validators(self, querymodel, request.get_host(), tiers['segments'])
+                    response = feed_cache.get_not_modified(request, etag, last_modified)
+                    if response is not None:
+                        return response
+
+                    # Subscribers on the same tiers share one cached feed body.
+                    cache_key = feed_cache.premium_feed_cache_key(self, request.get_host(), tiers['segments'])
+                    response = feed_cache.get_premium_feed(cache_key, uidb64, token, user.is_paysubscribed)
+                    if response is not None:
+                        return feed_cache.set_validators(response, etag, last_modified)
+
+                    private_queryset_pages = tiers['variant_ids']
+                    public_queryset_pages = tiers['canonical_ids']
 
                     if self.rss_combine_private:
                         queryset_public = public_queryset.filter(~Q(id__in=public_queryset_pages)).filter(parent_page=self.id).order_by('-date_display')
@@ -1403,13 +1406,15 @@ class PodcastContentIndexPage(WagtailCacheMixin, RoutablePageMixin, WebPage):
 
                     all_public = queryset_public if self.rss_combine_private else None
                     all_private = queryset
-                    rss_link = request.get_raw_uri()
+                    rss_link = feed_cache.placeholder_link(request.get_raw_uri(), uidb64, token)
                     home_link = self.get_site().root_url
 
                     # Construct the feed by passing ourself to it, so it can determine the feed's "link".
-                    feed = PodcastFeed(request, rss_link, home_link, all_public, all_private, token, uidb64)
+                    # The feed is rendered with placeholder credentials so it can be shared across the tier.
+                    feed = PodcastFeed(request, rss_link, home_link, all_public, all_private, feed_cache.PREMIUM_FEED_TOKEN, feed_cache.PREMIUM_FEED_UIDB64)
                     # 'feed' is a class-based view, so we need to call feed and pass it the request to get our response.
-                    return feed(request)
+                    response = feed_cache.set_premium_feed(cache_key, feed(request), uidb64, token, user.is_paysubscribed)
+                    return feed_cache.set_validators(response, etag, last_modified)
                 else:
                     return HttpResponseForbidden()
             else:
@@ -1424,9 +1429,10 @@ class PodcastContentIndexPage(WagtailCacheMixin, RoutablePageMixin, WebPage):
             path = request.path_info.strip('/')
             slug = self.slug
             if path == slug:
-                latest_episode = self.get_index_children().first()
-                season = str(latest_episode.season_number)
-                return redirect(str(request.get_raw_uri()) + '?p=' + season, permanent=False)
+                seasons = self.get_seasons()
+                if seasons:
+                    season = str(seasons[-1]['season_number'])
+                    return redirect(str(request.get_raw_uri()) + '?p=' + season, permanent=False)
    
         return super().serve(request, *args, **kwargs)
 
@@ -1622,25 +1628,18 @@ class ArticleContentIndexPage(WagtailCacheMixin, RoutablePageMixin, WebPage):
     def get_context(self, request, *args, **kwargs):
         context = super().get_context(request, *args, **kwargs)
 
-        all_children = self.get_index_children()
-        paginator = Paginator(all_children, self.index_num_per_page)
-
-        pagenum = request.GET.get('p', 1)
-        try:
-            paged_children = paginator.page(pagenum)
-        except (PageNotAnInteger, EmptyPage, InvalidPage) as e:
-            paged_children = paginator.page(1)
-
-        context['index_paginated'] = paged_children
-        context['index_children'] = all_children
+        # already paginated by BasePage when the index shows subpages
+        if 'index_paginated' not in context:
+            all_children = self.get_index_children()
+            context['index_paginated'] = self.paginate_index_children(request, all_children)
+            context['index_children'] = all_children
+        all_children = context['index_children']
 
         if request.GET.get('tag', None):
             context['has_tags'] = True
             tags = request.GET.get('tag')
             all_children = all_children.filter(tags__slug__in=[tags])
             context['index_paginated'] = all_children
-        else:
-            context['index_paginated'] = paged_children
 
         return context
 
@@ -1653,6 +1652,11 @@ class ArticleContentIndexPage(WagtailCacheMixin, RoutablePageMixin, WebPage):
 
         querymodel = resolve_model_string(self.index_query_pagemodel, self._meta.app_label)
 
+        etag, last_modified = feed_cache.get_feed_validators(self, querymodel, request.get_host())
+        response = feed_cache.get_not_modified(request, etag, last_modified)
+        if response is not None:
+            return response
+
         all_public = exclude_variants(querymodel.objects.child_of(self)).live().order_by('-date_display')
         all_private = None
         rss_link = request.get_raw_uri()
@@ -1664,7 +1668,7 @@ class ArticleContentIndexPage(WagtailCacheMixin, RoutablePageMixin, WebPage):
         # Construct the feed by passing ourself to it, so it can determine the feed's "link".
         feed = ArticleFeed(request, rss_link, home_link, all_public, all_private, tags, uidb64, token)
         # 'feed' is a class-based view, so we need to call feed and pass it the request to get our response.
-        return feed(request)
+        return feed_cache.set_validators(feed(request), etag, last_modified)
 
     @cache_control(private=True)
     @nocache_page
@@ -1688,52 +1692,21 @@ class ArticleContentIndexPage(WagtailCacheMixin, RoutablePageMixin, WebPage):
                     public_queryset = None
 
                 if public_queryset:
-                    user_gte_tiers = []
-                    user_eq_tiers = []
-                    queryset = ArticleContentPage.objects.none()
-                    self.user = user
-
-                    try:
-                        tier_gte_objects = TierEqualOrGreater.objects.all()
-                    except:
-                        tier_gte_objects = None
-
-                    try:
-                        tier_eq_objects = TierEqual.objects.all()
-                    except:
-                        tier_eq_objects = None
-
-                    if tier_gte_objects:
-                        for obj in tier_gte_objects:
-                            if obj.test_user(self):
-                                user_gte_tiers += [obj.segment_id]
-
-                    if tier_eq_objects:
-                        for obj in tier_eq_objects:
-                            if obj.test_user(self):
-                                user_eq_tiers += [obj.segment_id]
-
-                    private_queryset_pages = querymodel.objects.none()
-                    public_queryset_pages = querymodel.objects.none()
-
-                    if tier_gte_objects and tier_eq_objects:
-                        for tier in user_gte_tiers:
-                            public_queryset_pages |= TierEqualOrGreater.segment.get_queryset().get(id=tier).get_used_pages().values_list('canonical_page_id')
-                            private_queryset_pages |= TierEqualOrGreater.segment.get_queryset().get(id=tier).get_used_pages().values_list('variant_id')
-                        for tier in user_eq_tiers:
-                            public_queryset_pages |= TierEqual.segment.get_queryset().get(id=tier).get_used_pages().values_list('canonical_page_id')
-                            private_queryset_pages |= TierEqual.segment.get_queryset().get(id=tier).get_used_pages().values_list('variant_id')
-                    elif tier_gte_objects and not tier_eq_objects:
-                        for tier in user_gte_tiers:
-                            public_queryset_pages |= TierEqualOrGreater.segment.get_queryset().get(id=tier).get_used_pages().values_list('canonical_page_id')
-                            private_queryset_pages |= TierEqualOrGreater.segment.get_queryset().get(id=tier).get_used_pages().values_list('variant_id')
-                    elif tier_eq_objects and not tier_gte_objects:
-                        for tier in user_eq_tiers:
-                            public_queryset_pages |= TierEqual.segment.get_queryset().get(id=tier).get_used_pages().values_list('canonical_page_id')
-                            private_queryset_pages |= TierEqual.segment.get_queryset().get(id=tier).get_used_pages().values_list('variant_id')
-                    else:
-                        private_queryset_pages = None
-                        public_queryset_pages = None
+                    tiers = resolve_tiers(user)
+
+                    etag, last_modified = feed_cache.get_feed_validators(self, querymodel, request.get_host(), tiers['segments'])
+                    response = feed_cache.get_not_modified(request, etag, last_modified)
+                    if response is not None:
+                        return response
+
+                    # Subscribers on the same tiers share one cached feed body.
+                    cache_key = feed_cache.premium_feed_cache_key(self, request.get_host(), tiers['segments'])
+                    response = feed_cache.get_premium_feed(cache_key, uidb64, token, user.is_paysubscribed)
+                    if response is not None:
+                        return feed_cache.set_validators(response, etag, last_modified)
+
+                    private_queryset_pages = tiers['variant_ids']
+                    public_queryset_pages = tiers['canonical_ids']
 
                     if self.rss_combine_private:
                          queryset_public = public_queryset.filter(~Q(id__in=public_queryset_pages)).filter(parent_page=self.id).order_by('-date_display')
@@ -1744,14 +1717,16 @@ class ArticleContentIndexPage(WagtailCacheMixin, RoutablePageMixin, WebPage):
 
                     all_public = queryset_public if self.rss_combine_private else None
                     all_private = queryset
-                    rss_link = request.get_raw_uri()
+                    rss_link = feed_cache.placeholder_link(request.get_raw_uri(), uidb64, token)
                     home_link = self.get_site().root_url
                     tags = self.tags.all() if self.tags.first() else None
 
                     # Construct the feed by passing ourself to it, so it can determine the feed's "link".
-                    feed = ArticleFeed(request, rss_link, home_link, all_public, all_private, tags, uidb64, token)
+                    # The feed is rendered with placeholder credentials so it can be shared across the tier.
+                    feed = ArticleFeed(request, rss_link, home_link, all_public, all_private, tags, feed_cache.PREMIUM_FEED_UIDB64, feed_cache.PREMIUM_FEED_TOKEN)
                     # 'feed' is a class-based view, so we need to call feed and pass it the request to get our response.
-                    return feed(request)
+                    response = feed_cache.set_premium_feed(cache_key, feed(request), uidb64, token, user.is_paysubscribed)
+                    return feed_cache.set_validators(response, etag, last_modified)
                 else:
                     return HttpResponseForbidden()
             else:
@@ -1767,6 +1742,10 @@ class ArticleContentPage(WagtailCacheMixin, PersonalisablePageMixin, WebPage):
     class Meta:
         verbose_name = _('Article Post Page')
         abstract = False
+        # keyset pagination of content indexes, see KeysetPaginator
+        indexes = [
+            models.Index(fields=['date_display', 'basepage_ptr'], name='website_article_date_id_idx'),
+        ]
 
     parent_page_types = ['website.ArticleContentIndexPage']
 
@@ -1815,15 +1794,22 @@ class ArticleContentPage(WagtailCacheMixin, PersonalisablePageMixin, WebPage):
             index.SearchField('caption', boost=2),
             index.FilterField('date_display'),
             index.RelatedFields('contributor', [
-                index.SearchField('contributor'),
+                index.RelatedFields('contributor', [
+                    index.SearchField('first_name'),
+                    index.SearchField('last_name'),
+                ]),
                 index.SearchField('contributor_display'),
             ]),
             index.RelatedFields('author', [
-                index.SearchField('author'),
-                index.SearchField('author_display'),
+                index.RelatedFields('author', [
+                    index.SearchField('first_name', boost=2),
+                    index.SearchField('last_name', boost=2),
+                ]),
+                index.SearchField('author_display', boost=2),
             ]),
             index.RelatedFields('tags', [
                 index.SearchField('name', partial_match=True, boost=10),
+                index.AutocompleteField('name'),
             ]),
         ]
     )
@@ -1922,6 +1908,13 @@ class ArticleContentPage(WagtailCacheMixin, PersonalisablePageMixin, WebPage):
         blank=True,
     )
 
+    feed_description = models.TextField(
+        blank=True,
+        editable=False,
+        verbose_name=_('Feed description'),
+        help_text=_('Sanitised RSS description, generated from the caption and body text when the page is saved.')
+    )
+
     def get_pub_date(self):
         """
         Gets published date.
@@ -1997,19 +1990,24 @@ class ArticleContentPage(WagtailCacheMixin, PersonalisablePageMixin, WebPage):
             self.remote_media_size = None
             self.remote_media_duration = None
 
+        # the remote media's size is probed in the background, see website/media_probe.py
+        from website import media_probe
+        probe = media_probe.needs_probe(self, kwargs.get('update_fields'))
         if self.remote_media:
-            try:
-                size = requests.get(self.remote_media, stream=True).headers['content-length']
-            except:
-                size = None
-            extension = pathlib.Path(self.remote_media).suffix.split('.')[-1]
             self.uploaded_media = None
             self.uploaded_media_type = None
             self.uploaded_media_size = None
-            self.remote_media_size = size
         self.parent_page = self.get_parent().specific
 
-        super().save()
+        try:
+            self.feed_description = utils.render_feed_description(self)
+        except:
+            self.feed_description = ''
+
+        super().save(*args, **kwargs)
+
+        if probe:
+            media_probe.probe_later(self)
 
     content_panels = WebPage.content_panels + [
         FieldPanel('front_page'),
@@ -2060,6 +2058,10 @@ class PodcastContentPage(WagtailCacheMixin, PersonalisablePageMixin, WebPage):
     class Meta:
         verbose_name = _('Podcast Episode Page')
         abstract = False
+        # keyset pagination of content indexes, see KeysetPaginator
+        indexes = [
+            models.Index(fields=['date_display', 'basepage_ptr'], name='website_podcast_date_id_idx'),
+        ]
 
     parent_page_types = ['website.PodcastContentIndexPage']
 
@@ -2107,15 +2109,22 @@ class PodcastContentPage(WagtailCacheMixin, PersonalisablePageMixin, WebPage):
             index.SearchField('caption', boost=2),
             index.FilterField('date_display'),
             index.RelatedFields('contributor', [
-                index.SearchField('contributor'),
+                index.RelatedFields('contributor', [
+                    index.SearchField('first_name'),
+                    index.SearchField('last_name'),
+                ]),
                 index.SearchField('contributor_display'),
             ]),
             index.RelatedFields('author', [
-                index.SearchField('author'),
-                index.SearchField('author_display'),
+                index.RelatedFields('author', [
+                    index.SearchField('first_name', boost=2),
+                    index.SearchField('last_name', boost=2),
+                ]),
+                index.SearchField('author_display', boost=2),
             ]),
             index.RelatedFields('tags', [
                 index.SearchField('name', partial_match=True, boost=10),
+                index.AutocompleteField('name'),
             ]),
         ]
     )
@@ -2238,6 +2247,13 @@ class PodcastContentPage(WagtailCacheMixin, PersonalisablePageMixin, WebPage):
         blank=True,
     )
 
+    feed_description = models.TextField(
+        blank=True,
+        editable=False,
+        verbose_name=_('Feed description'),
+        help_text=_('Sanitised RSS description, generated from the caption and body text when the page is saved.')
+    )
+
     episode_preview = models.BooleanField(
         max_length=50,
         blank=False,
@@ -2322,19 +2338,24 @@ class PodcastContentPage(WagtailCacheMixin, PersonalisablePageMixin, WebPage):
             self.remote_media_size = None
             self.remote_media_duration = None
 
+        # the remote media's size is probed in the background, see website/media_probe.py
+        from website import media_probe
+        probe = media_probe.needs_probe(self, kwargs.get('update_fields'))
         if self.remote_media:
-            try:
-                size = requests.get(self.remote_media, stream=True).headers['content-length']
-            except:
-                size = None
-            extension = pathlib.Path(self.remote_media).suffix.split('.')[-1]
             self.uploaded_media = None
             self.uploaded_media_type = None
             self.uploaded_media_size = None
-            self.remote_media_size = size
         self.parent_page = self.get_parent().specific
 
-        super().save()
+        try:
+            self.feed_description = utils.render_feed_description(self)
+        except:
+            self.feed_description = ''
+
+        super().save(*args, **kwargs)
+
+        if probe:
+            media_probe.probe_later(self)
 
     content_panels = WebPage.content_panels + [
         FieldPanel('episode_number'),
@@ -2608,109 +2629,50 @@ class FormPageMixin(models.Model):
         if self.save_to_database:
             form_submission.save()
 
-        # Send the mails
+        # Queue the mails, see website/form_mail.py
         if self.to_address:
             self.send_summary_mail(request, form, processed_data)
 
         if self.confirmation_emails:
             # Convert form data into a context.
             context = Context(self.data_to_dict(processed_data, request))
+            genemail = GeneralSettings.for_request(request).from_email
+            messages = []
             # Render emails as if they are django templates.
             for email in self.confirmation_emails.all():
-
-                # Build email message parameters.
-                message_args = {}
-                # From
-                if email.from_address:
-                    template_from_email = Template(email.from_address)
-                    message_args['from_email'] = template_from_email.render(context)
-                else:
-                    genemail = GeneralSettings.for_request(request).from_email
-                    if genemail:
-                        message_args['from_email'] = genemail
-                # Reply-to
-                if email.reply_address:
-                    template_reply_to = Template(email.reply_address)
-                    message_args['reply_to'] = template_reply_to.render(context).split(',')
-                else:
-                    template_reply_to = Template(settings.EMAIL_ADDR)
-                    message_args['reply_to'] = template_reply_to.render(context)
-                # CC
-                if email.cc_address:
-                    template_cc = Template(email.cc_address)
-                    message_args['cc'] = template_cc.render(context).split(',')
-                # BCC
-                if email.bcc_address:
-                    template_bcc = Template(email.bcc_address)
-                    message_args['bcc'] = template_bcc.render(context).split(',')
-                # Subject
-                if email.subject:
-                    template_subject = Template(email.subject)
-                    message_args['subject'] = template_subject.render(context)
-                else:
-                    message_args['subject'] = self.title
-                # Body
-                template_body = Template(email.body)
-                message_args['body'] = template_body.render(context)
-                # To
-                template_to = Template(email.to_address)
-                message_args['to'] = template_to.render(context).split(',')
-
-                mail.send(
-                    message_args['to'],
-                    message_args['from_email'],
-                    subject=message_args['subject'],
-                    cc=message_args['cc'] if email.bcc_address else None,
-                    bcc=message_args['bcc'] if email.bcc_address else None,
-                    html_message=message_args['body'],
-                    headers={'Reply-to': message_args['reply_to']}
-                )
+                messages.append({
+                    'recipients': form_mail.render(email.to_address, context).split(','),
+                    'sender': form_mail.render(email.from_address, context) if email.from_address else genemail or None,
+                    'subject': form_mail.render(email.subject, context) if email.subject else self.title,
+                    'html_message': form_mail.render(email.body, context),
+                    'cc': form_mail.render(email.cc_address, context).split(',') if email.cc_address else None,
+                    'bcc': form_mail.render(email.bcc_address, context).split(',') if email.bcc_address else None,
+                    'headers': {'Reply-to': form_mail.render(email.reply_address or settings.EMAIL_ADDR, context)},
+                })
+            form_mail.queue_later(messages)
 
         for fn in hooks.get_hooks('form_page_submit'):
             fn(instance=self, form_submission=form_submission)
 
     def send_summary_mail(self, request, form, processed_data):
         """
-        Sends a form submission summary email.
+        Queues a form submission summary email.
         """
         addresses = [x.strip() for x in self.to_address.split(',')]
-        content = []
 
         context = Context(self.data_to_dict(processed_data, request))
 
         genemail = GeneralSettings.for_request(request).from_email
 
         # Build email message parameters
-        message_args = {
-            'body': context['message']
+        message = {
+            'sender': form_mail.render(genemail or settings.EMAIL_ADDR, context),
+            'subject': self.subject or self.title,
+            'message': '\n-------------------- \n' + context['message'],
+            'headers': {'Reply-to': form_mail.render(self.reply_address or settings.EMAIL_ADDR, context)},
         }
 
-        for address in addresses:
-
-            if self.subject:
-                message_args['subject'] = self.subject
-            else:
-                message_args['subject'] = self.title
-            if genemail:
-                template_from_email = Template(genemail)
-                message_args['from_email'] = template_from_email.render(context)
-            else:
-                template_from = Template(settings.EMAIL_ADDR)
-                message_args['from_email'] = template_from_email.render(context)
-            if self.reply_address:
-                template_reply_to = Template(self.reply_address)
-                message_args['reply_to'] = template_reply_to.render(context)
-            else:
-                template_reply_to = Template(settings.EMAIL_ADDR)
-                message_args['reply_to'] = template_reply_to.render(context)
-
-            mail.send(
-                address,
-                message_args['from_email'],
-                subject=message_args['subject'],
-                message='\n-------------------- \n' + message_args['body'],
-                headers={'Reply-to': message_args['reply_to']}
-            )
+        form_mail.queue_later([dict(message, recipients=address) for address in addresses])
 
     def render_landing_page(self, request, form_submission=None):
 
@@ -0,0 +1,207 @@
+import re
+from django.db.models import Q
+from wagtail.core.models import Site
+from wagtail_personalisation.models import PersonalisablePageMetadata
+from wagtailcache.cache import clear_cache
+from website.models.pages import BasePage, get_page_models
+from website.models.settings import LayoutSettings
+from website.models.snippets import Carousel, CarouselSlide, ContentWall, Footer, Header, ReusableContent
+
+
+# Stream blocks that embed another object, mapped to the struct field
+# holding its id and the model name of what it embeds.
+REFERENCE_BLOCKS = {
+    'page_preview': ('page', 'page'),
+    'page_list': ('indexed_by', 'page'),
+    'carousel': ('carousel', 'carousel'),
+    'content_wall': ('content_wall', 'contentwall'),
+    'reusable_content': ('content', 'reusablecontent'),
+}
+
+# Url patterns, matched against the absolute urls in wagtailcache's keyring.
+# Index pages serve their feeds from routes below the page itself.
+PAGE_URL = r'((rss|premiumfeed)/.*)?(\?.*)?$'
+SUBTREE_URLS = r'.*'
+EVERYTHING = r'.*'
+
+
+def purge(patterns):
+    """
+    Drops every cached response whose url matches one of patterns.
+    """
+    if not patterns:
+        return
+    if EVERYTHING in patterns:
+        clear_cache()
+    else:
+        clear_cache(urls=sorted(set(patterns)))
+
+
+def get_references(raw_data):
+    """
+    Returns the (model name, id) pairs embedded anywhere in a StreamField's raw data.
+    """
+    references = set()
+    if isinstance(raw_data, dict):
+        block = REFERENCE_BLOCKS.get(raw_data.get('type'))
+        value = raw_data.get('value')
+        if block and isinstance(value, dict) and value.get(block[0]):
+            references.add((block[1], value[block[0]]))
+        children = raw_data.values()
+    elif isinstance(raw_data, (list, tuple)):
+        children = raw_data
+    else:
+        return references
+    for child in children:
+        references |= get_references(child)
+    return references
+
+
+def _stream_references(*values):
+    references = set()
+    for value in values:
+        try:
+            references |= get_references(list(value.raw_data))
+        except:
+            pass
+    return references
+
+
+def url_path_patterns(url_path, suffix=PAGE_URL):
+    patterns = []
+    for root in Site.get_site_root_paths():
+        if url_path.startswith(root.root_path):
+            page_path = url_path[len(root.root_path) - 1:]
+            patterns.append(r'^https?://[^/]+' + re.escape(page_path) + suffix)
+    return patterns
+
+
+def _reference_query(field_name, targets):
+    """
+    Returns a filter matching the json of a StreamField with a block embedding
+    one of targets, on the struct field holding its id, or None if no block
+    can embed targets. Matches are checked with get_references().
+    """
+    query = None
+    for block_field, model_name in REFERENCE_BLOCKS.values():
+        for pk in sorted(set(pk for name, pk in targets if name == model_name)):
+            for end in [',', '}']:
+                match = Q(**{field_name + '__contains': '"{0}": {1}{2}'.format(block_field, pk, end)})
+                query = match if query is None else query | match
+    return query
+
+
+def _embedding_snippets(targets):
+    """
+    Returns targets plus every snippet embedding one of them, directly or
+    through other snippets.
+    """
+    targets = set(targets)
+    found = targets
+    while found:
+        query = _reference_query('content', found)
+        if query is None:
+            break
+        embedding = set()
+        for model in [Header, Footer, ReusableContent, ContentWall]:
+            for snippet in model.objects.filter(query):
+                if _stream_references(snippet.content) & found:
+                    embedding.add((model._meta.model_name, snippet.pk))
+        for slide in CarouselSlide.objects.filter(query):
+            if _stream_references(slide.content) & found:
+                embedding.add(('carousel', slide.carousel_id))
+        found = embedding - targets
+        targets |= found
+    return targets
+
+
+def _embedding_pages(targets):
+    """
+    Returns the live pages whose header, footer, content walls or body embed
+    one of targets. Stream fields are filtered on the blocks that can embed
+    targets first, then checked block by block.
+    """
+    headers = [pk for name, pk in targets if name == 'header']
+    footers = [pk for name, pk in targets if name == 'footer']
+
+    pages = {}
+    query = Q(page_header_id__in=headers) | Q(page_footer_id__in=footers)
+    content_walls = _reference_query('content_walls', targets)
+    if content_walls is not None:
+        query |= content_walls
+    if headers or footers or content_walls is not None:
+        for page in BasePage.objects.live().filter(query):
+            if page.page_header_id in headers or page.page_footer_id in footers or _stream_references(page.content_walls) & targets:
+                pages[page.pk] = page
+
+    query = _reference_query('body', targets)
+    if query is None:
+        return pages.values()
+    for model in get_page_models():
+        try:
+            model._meta.get_field('body')
+        except:
+            continue
+        for page in model.objects.live().filter(query).exclude(pk__in=pages.keys()):
+            if _stream_references(page.body) & targets:
+                pages[page.pk] = page
+    return pages.values()
+
+
+def get_page_patterns(page, parent=None, url_path=None, descendants=False):
+    """
+    Returns url patterns for the cached responses showing page: the page (or
+    its whole subtree), its parent index and feeds, the canonical page of a
+    variant, and pages embedding any of those through blocks or snippets.
+    Pass the parent and url_path a page had before moving to purge its old location.
+    """
+    if parent is None:
+        parent = page.get_parent()
+    if url_path is None:
+        url_path = page.url_path
+
+    patterns = url_path_patterns(url_path, SUBTREE_URLS if descendants else PAGE_URL)
+    targets = {('page', page.pk)}
+    if parent is not None:
+        patterns += url_path_patterns(parent.url_path)
+        targets.add(('page', parent.pk))
+
+    metadata = PersonalisablePageMetadata.objects.filter(variant_id=page.pk).exclude(
+        canonical_page_id=page.pk
+    ).select_related('canonical_page').first()
+    if metadata is not None:
+        patterns += url_path_patterns(metadata.canonical_page.url_path)
+        targets.add(('page', metadata.canonical_page_id))
+
+    for embedding in _embedding_pages(_embedding_snippets(targets)):
+        patterns += url_path_patterns(embedding.url_path)
+    return patterns
+
+
+def get_snippet_patterns(snippets):
+    """
+    Returns url patterns for the cached responses showing any of snippets.
+    Headers and footers chosen in layout settings are shown on search,
+    subscribe and account views, so those clear everything.
+    """
+    models = [Carousel, ContentWall, Footer, Header, ReusableContent]
+    targets = set(
+        (snippet._meta.model_name, snippet.pk) for snippet in snippets
+        if isinstance(snippet, tuple(models)) and snippet.pk is not None
+    )
+    if not targets:
+        return []
+    targets = _embedding_snippets(targets)
+
+    headers = [pk for name, pk in targets if name == 'header']
+    footers = [pk for name, pk in targets if name == 'footer']
+    if LayoutSettings.objects.filter(
+        Q(search_header_id__in=headers) | Q(subscribe_header_id__in=headers) | Q(account_header_id__in=headers) |
+        Q(search_footer_id__in=footers) | Q(subscribe_footer_id__in=footers) | Q(account_footer_id__in=footers)
+    ).exists():
+        return [EVERYTHING]
+
+    patterns = []
+    for embedding in _embedding_pages(targets):
+        patterns += url_path_patterns(embedding.url_path)
+    return patterns
@@ -1,27 +1,14 @@
 import bleach
-import lxml
 import re
-from bs4 import BeautifulSoup
 from django.conf import settings
 from django.contrib.syndication.views import Feed
 from django.utils.feedgenerator import Rss201rev2Feed, rfc2822_date
 from django.utils.text import slugify
+from website import utils
+from website.feeds import StreamingFeedGeneratorMixin, StreamingFeedMixin, get_rendition_url
 from xml.sax.saxutils import XMLGenerator
 
 
-def disallow_anchors(description):
-    soup = BeautifulSoup(description, 'lxml')
-    for link in soup.find_all('a'):
-        if 'href' in link.attrs:
-            if re.match(r'^<a\shref="\#.*?">.*?</a>$', str(link), re.IGNORECASE):
-                link.replace_with_children()
-            else:
-                pass
-        else:
-            pass
-    return soup.body.decode_contents()
-
-
 class SimplerXMLGenerator(XMLGenerator):
     def addQuickElement(self, name, contents=None, attrs=None):
         "Convenience method for adding an element with no children"
@@ -54,7 +41,8 @@ class SimplerXMLGenerator(XMLGenerator):
         sorted_attrs = dict(sorted(attrs.items())) if attrs else attrs
         super().startElement(name, sorted_attrs)
 
-class iTunesPodcastsFeedGenerator(Rss201rev2Feed):
+class iTunesPodcastsFeedGenerator(StreamingFeedGeneratorMixin, Rss201rev2Feed):
+    handler_class = SimplerXMLGenerator
 
     def rss_attributes(self):
         return {
@@ -134,9 +122,7 @@ class iTunesPodcastsFeedGenerator(Rss201rev2Feed):
         if item['item_epnum'] is not None:
             handler.addQuickElement("itunes:episode", item['item_epnum'])
         if item['description'] is not None:
-            description = (bleach.clean(item['description'].replace('</p>', '</p><br />'), strip=True, tags=['p', 'ul', 'li', 'a', 'br'])).lstrip()
-            description_stripped = disallow_anchors(description)
-            handler.addQuickElement("description", '<![CDATA[' + description_stripped + ']]>')
+            handler.addQuickElement("description", '<![CDATA[' + item['description'] + ']]>')
         # Author information.
         if item['item_episode_type'] is not None:
            handler.addQuickElement("itunes:episodeType", item['item_episode_type'])
@@ -206,7 +192,7 @@ class iTunesPodcastsFeedGenerator(Rss201rev2Feed):
         handler.endElement("rss")
 
 
-class PodcastFeed(Feed):
+class PodcastFeed(StreamingFeedMixin, Feed):
     """
     Serves an RSS feed for a public podcast index page in Wagtail with a routable url that calls this feed.
     Note required data being passed to __init__: first = first post in the feed, use .specific() to get the 
@@ -259,11 +245,11 @@ class PodcastFeed(Feed):
             return first_year + '-' + last_year + ', ' + copyright_string
 
     def get_object(self, request):
-        if self.all_public and self.all_private:
+        if self.all_public is not None and self.all_private is not None:
             return self.all_public | self.all_private
-        elif self.all_public and not self.all_private:
+        elif self.all_public is not None:
             return self.all_public
-        elif self.all_private and not self.all_public:
+        elif self.all_private is not None:
             return self.all_private
         else:
             return None
@@ -282,17 +268,30 @@ class PodcastFeed(Feed):
 
     def item_link(self, item):
         if item.personalisation_metadata.is_canonical:
-            return item.full_url
+            return item.get_full_url(self.request)
         else:
-            return item.personalisation_metadata.canonical_page.full_url
+            return item.personalisation_metadata.canonical_page.get_full_url(self.request)
 
     def items(self):
-        if self.all_public and self.all_private:
-            return self.all_public | self.all_private
-        elif self.all_public and not self.all_private:
-            return self.all_public
-        elif self.all_private and not self.all_public:
-            return self.all_private
+        if self.all_public is not None and self.all_private is not None:
+            queryset = self.all_public | self.all_private
+        elif self.all_public is not None:
+            queryset = self.all_public
+        elif self.all_private is not None:
+            queryset = self.all_private
+        else:
+            return None
+        # Fetch everything the item methods below touch up front, so the number
+        # of queries doesn't grow with the number of episodes.
+        return queryset.select_related(
+            '_personalisable_page_metadata__canonical_page',
+            'uploaded_media',
+            'remote_media_thumbnail',
+        ).prefetch_related(
+            'author__author',
+            'contributor__contributor',
+            'remote_media_thumbnail__renditions',
+        )
 
     def item_title(self, item):
         if item.personalisation_metadata.is_canonical:
@@ -301,12 +300,10 @@ class PodcastFeed(Feed):
             return item.personalisation_metadata.canonical_page.title
 
     def item_description(self, item):
-        item_bodytext = item.body.render_as_block()
-        soup = BeautifulSoup(item_bodytext, 'lxml')
-        soup_body = str(soup.select_one('.block-body_text'))
-        item.bodytext = bleach.clean(soup_body, strip=True, tags=['p', 'ul', 'li', 'a', 'br']).lstrip()
-
-        return '<p>' + item.caption + '</p>' + item.bodytext
+        if item.feed_description:
+            return item.feed_description
+        else:
+            return utils.render_feed_description(item)
 
     def item_enclosure_url(self, item):
         if item.personalisation_metadata.is_canonical:
@@ -337,7 +334,7 @@ class PodcastFeed(Feed):
             else:
                 return None
         elif item.uploaded_media:
-            return item.uploaded_media.file.size
+            return item.uploaded_media.get_file_size()
         else:
             return None
 
@@ -348,7 +345,7 @@ class PodcastFeed(Feed):
             else:
                 return None
         elif item.uploaded_media:
-            return item.uploaded_media_type
+            return item.uploaded_media_type or item.uploaded_media.mime_type
         else:
             return None
 
@@ -363,9 +360,9 @@ class PodcastFeed(Feed):
 
     def item_comments(self, item):
         if item.personalisation_metadata.is_canonical:
-            return item.full_url + '#comments'
+            return item.get_full_url(self.request) + '#comments'
         else:
-            return item.personalisation_metadata.canonical_page.full_url + '#comments'
+            return item.personalisation_metadata.canonical_page.get_full_url(self.request) + '#comments'
 
 
     def feed_extra_kwargs(self, obj):
@@ -374,8 +371,8 @@ class PodcastFeed(Feed):
             'itunes_author': self.index_page.rss_itunes_author if self.index_page.rss_itunes_author else self.index_page.rss_title,
             'itunes_name': self.index_page.rss_itunes_owner if self.index_page.rss_itunes_owner else self.index_page.rss_title,
             'itunes_email': self.index_page.rss_itunes_owner_email.email if self.index_page.rss_itunes_owner_email else settings.EMAIL_ADDR,
-            'itunes_image_url': self.index_page.rss_premium_image.get_rendition('fill-3000x3000|jpegquality-60').url if self.token and self.uidb64 and self.index_page.rss_premium_image else self.index_page.rss_image.get_rendition('fill-3000x3000|format-jpeg|jpegquality-80').url,
-            'rss_image_url': self.index_page.rss_premium_image.get_rendition('fill-1440x1440|jpegquality-60').url if self.token and self.uidb64 and self.index_page.rss_premium_image else self.index_page.rss_image.get_rendition('fill-1440x1440|format-jpeg|jpegquality-80').url,
+            'itunes_image_url': get_rendition_url(self.index_page.rss_premium_image, 'fill-3000x3000|jpegquality-60') if self.token and self.uidb64 and self.index_page.rss_premium_image else get_rendition_url(self.index_page.rss_image, 'fill-3000x3000|format-jpeg|jpegquality-80'),
+            'rss_image_url': get_rendition_url(self.index_page.rss_premium_image, 'fill-1440x1440|jpegquality-60') if self.token and self.uidb64 and self.index_page.rss_premium_image else get_rendition_url(self.index_page.rss_image, 'fill-1440x1440|format-jpeg|jpegquality-80'),
             'itunes_explicit': str(self.index_page.rss_itunes_explicit).lower(),
             'googleplay_explicit': 'yes' if self.index_page.rss_itunes_explicit else 'no',
             'itunes_primary_category': self.index_page.rss_itunes_primary_category if self.index_page.rss_itunes_primary_category else None,
@@ -387,14 +384,16 @@ class PodcastFeed(Feed):
         }
 
     def item_extra_kwargs(self, item):
+        authors = list(item.author.all())
+        contributors = list(item.contributor.all())
         return {
             'item_season': str(item.season_number) if item.season_number else None,
             'item_epnum': str(item.episode_number) if (item.episode_number and self.index_page.rss_include_episode_number) else None,
             'item_preview': item.episode_preview if item.episode_preview else None,
-            'item_remote_image': item.remote_media_thumbnail.get_rendition('fill-3000x3000|jpegquality-60').url if (item.remote_media and item.remote_media_thumbnail) else None,
-            'item_uploaded_image': item.uploaded_media.thumbnail.get_rendition('fill-3000x3000|jpegquality-60').url if (item.uploaded_media and item.uploaded_media.thumbnail) else None,
+            'item_remote_image': get_rendition_url(item.remote_media_thumbnail, 'fill-3000x3000|jpegquality-60') if (item.remote_media and item.remote_media_thumbnail) else None,
+            'item_uploaded_image': item.uploaded_media.thumbnail.url if (item.uploaded_media and item.uploaded_media.thumbnail) else None,
             'item_duration': str(item.remote_media_duration) if item.remote_media_duration else item.uploaded_media.duration if item.uploaded_media.duration else None,
-            'item_authors': item.author.all() if item.author.first() else None,
-            'item_contributors': item.contributor.all() if item.contributor.first() else None,
+            'item_authors': authors if authors else None,
+            'item_contributors': contributors if contributors else None,
             'item_episode_type': item.episode_type if item.episode_type else None
         }
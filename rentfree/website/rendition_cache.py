@@ -0,0 +1,113 @@
+import collections
+import hashlib
+import threading
+import time
+from django.conf import settings
+from django.core.cache import cache
+from wagtail.images.models import Filter, SourceImageIOError
+from wagtail.images.shortcuts import get_rendition_or_not_found
+
+
+# Rendition lookups are kept in a small LRU in each process, in front of the
+# shared cache, so templates and feeds don't query wagtailimages_rendition for
+# every image they show. Entries are keyed on the image's file and focal point,
+# so replacing either one looks up a new rendition, and a deleted rendition is
+# dropped by a signal. Lookups are rebuilt into unsaved renditions that have
+# the url, size and alt of the stored one.
+_renditions = collections.OrderedDict()
+_renditions_lock = threading.Lock()
+
+
+def _local_size():
+    return getattr(settings, 'RENDITION_CACHE_SIZE', 1000)
+
+
+def _local_timeout():
+    return getattr(settings, 'RENDITION_CACHE_LOCAL_TIMEOUT', 300)
+
+
+def get_key(image_id, file_name, focal_point_key, spec):
+    value = '{0}|{1}|{2}'.format(file_name, focal_point_key, spec)
+    return 'rendition_{0}_{1}'.format(image_id, hashlib.sha1(value.encode()).hexdigest())
+
+
+def _get_local(key):
+    with _renditions_lock:
+        entry = _renditions.get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            del _renditions[key]
+            return None
+        _renditions.move_to_end(key)
+        return entry[1]
+
+
+def _set_local(key, value):
+    with _renditions_lock:
+        _renditions[key] = (time.monotonic() + _local_timeout(), value)
+        _renditions.move_to_end(key)
+        while len(_renditions) > _local_size():
+            _renditions.popitem(last=False)
+
+
+def _build(image, spec, focal_point_key, value):
+    rendition_id, file_name, width, height = value
+    return image.get_rendition_model()(
+        id=rendition_id, image=image, filter_spec=spec, focal_point_key=focal_point_key,
+        file=file_name, width=width, height=height,
+    )
+
+
+def get_rendition(image, spec):
+    """
+    Returns image's rendition for spec, as image.get_rendition() does,
+    looking it up in the process and shared caches first.
+    """
+    image_filter = spec if isinstance(spec, Filter) else Filter(spec=spec)
+    focal_point_key = image_filter.get_cache_key(image)
+    key = get_key(image.pk, image.file.name, focal_point_key, image_filter.spec)
+
+    value = _get_local(key)
+    if value is None:
+        value = cache.get(key)
+        if value is not None:
+            _set_local(key, value)
+    if value is not None:
+        return _build(image, image_filter.spec, focal_point_key, value)
+
+    rendition = image.get_rendition(image_filter)
+    value = (rendition.pk, rendition.file.name, rendition.width, rendition.height)
+    cache.set(key, value, getattr(settings, 'RENDITION_CACHE_TIMEOUT', 86400))
+    _set_local(key, value)
+    return rendition
+
+
+def get_rendition_or_missing(image, spec):
+    """
+    Returns get_rendition(), or wagtail's placeholder for an image whose
+    file has gone missing, which isn't cached.
+    """
+    try:
+        return get_rendition(image, spec)
+    except SourceImageIOError:
+        return get_rendition_or_not_found(image, spec)
+
+
+def get_rendition_url(image, spec):
+    return get_rendition(image, spec).url
+
+
+def purge(rendition):
+    """
+    Drops a rendition from the shared cache and from this process. Other
+    processes forget it within RENDITION_CACHE_LOCAL_TIMEOUT.
+    """
+    try:
+        key = get_key(rendition.image_id, rendition.image.file.name, rendition.focal_point_key, rendition.filter_spec)
+    except:
+        # the image went first, so nothing can look the rendition up again
+        return
+    cache.delete(key)
+    with _renditions_lock:
+        _renditions.pop(key, None)
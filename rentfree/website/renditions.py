@@ -0,0 +1,143 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import connection, transaction
+from wagtail.images import get_image_model
+
+logger = logging.getLogger('website')
+
+
+# The filter specs each image field is rendered with by the templates and
+# feeds, generated in a pool of threads when a page is published or the site
+# settings are saved, so visitors and podcatchers never wait on a resize.
+# Keep these in step with the {% image %} tags and get_rendition() calls.
+STRUCT_DATA_SPECS = [
+    'fill-10000x10000-c75|format-jpeg|jpegquality-60',
+    'fill-40000x30000-c75|format-jpeg|jpegquality-60',
+    'fill-16000x9000-c75|format-jpeg|jpegquality-60',
+]
+
+PAGE_IMAGE_SPECS = {
+    'cover_image': [
+        'original',
+        'fill-900x600-c75|format-jpeg|jpegquality-60',
+        'fill-750x750-c100|format-jpeg|jpegquality-60',
+        'fill-150x100-c75|format-jpeg|jpegquality-60',
+    ] + STRUCT_DATA_SPECS,
+    'og_image': ['original'],
+    'rss_image': [
+        'fill-3000x3000|format-jpeg|jpegquality-80',
+        'fill-1440x1440|format-jpeg|jpegquality-80',
+    ] + STRUCT_DATA_SPECS,
+    'rss_premium_image': ['fill-3000x3000|jpegquality-60', 'fill-1440x1440|jpegquality-60'],
+    'remote_media_thumbnail': ['fill-3000x3000|jpegquality-60'] + STRUCT_DATA_SPECS,
+}
+
+SETTINGS_IMAGE_SPECS = {
+    'logo': ['original'] + STRUCT_DATA_SPECS,
+    'favicon': [
+        'original',
+        'fill-120x120-c100|format-png',
+        'fill-152x152-c100|format-png',
+        'fill-167x167-c100|format-png',
+        'fill-180x180-c100|format-png',
+    ],
+    'struct_org_logo': STRUCT_DATA_SPECS,
+}
+
+
+def _block_renditions(raw_data):
+    """
+    Returns the (image id, spec) pairs of the image, card and jumbotron
+    blocks anywhere in a StreamField's raw data.
+    """
+    renditions = set()
+    if isinstance(raw_data, dict):
+        block_type = raw_data.get('type')
+        value = raw_data.get('value')
+        if isinstance(value, dict):
+            if block_type in ['image', 'image_link'] and value.get('image'):
+                spec = 'max-1000x1000|format-jpeg|jpegquality-60' if value.get('convert_to_jpeg') else 'max-1000x1000'
+                renditions.add((value['image'], spec))
+            elif block_type == 'card' and value.get('image'):
+                renditions.add((value['image'], 'fill-900x600-c75|format-jpeg|jpegquality-60'))
+            elif block_type == 'jumbotron' and value.get('background_image'):
+                renditions.add((value['background_image'], 'max-2000x2000|format-jpeg|jpegquality-60'))
+        children = raw_data.values()
+    elif isinstance(raw_data, (list, tuple)):
+        children = raw_data
+    else:
+        return renditions
+    for child in children:
+        renditions |= _block_renditions(child)
+    return renditions
+
+
+def _field_renditions(obj, field_specs):
+    renditions = set()
+    for field, specs in field_specs.items():
+        image_id = getattr(obj, field + '_id', None)
+        if image_id:
+            renditions |= set((image_id, spec) for spec in specs)
+    return renditions
+
+
+def get_page_renditions(page):
+    """
+    Returns the (image id, spec) pairs a page is shown with.
+    """
+    renditions = _field_renditions(page, PAGE_IMAGE_SPECS)
+    try:
+        renditions |= _block_renditions(list(page.body.raw_data))
+    except:
+        pass
+    return renditions
+
+
+def get_settings_renditions(site_settings):
+    return _field_renditions(site_settings, SETTINGS_IMAGE_SPECS)
+
+
+def generate(image_id, specs):
+    """
+    Renders every spec of an image that hasn't been rendered yet.
+    """
+    try:
+        image = get_image_model().objects.filter(pk=image_id).first()
+        if image is None:
+            return
+        for spec in specs:
+            try:
+                image.get_rendition(spec)
+            except:
+                logger.exception('Could not render image %s as %s.', image_id, spec)
+    finally:
+        connection.close()
+
+
+def generate_all(renditions, executor):
+    """
+    Renders renditions, (image id, spec) pairs, with one job per image.
+    """
+    by_image = {}
+    for image_id, spec in renditions:
+        by_image.setdefault(image_id, []).append(spec)
+    return [executor.submit(generate, image_id, specs) for image_id, specs in by_image.items()]
+
+
+_executor = None
+
+
+def generate_later(renditions):
+    """
+    Renders renditions in the background once the current transaction commits.
+    """
+    global _executor
+    if not renditions:
+        return
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'RENDITION_WORKERS', 2), thread_name_prefix='renditions'
+        )
+    renditions = set(renditions)
+    transaction.on_commit(lambda: generate_all(renditions, _executor))
@@ -0,0 +1,98 @@
+import atexit
+import collections
+import hashlib
+import logging
+import threading
+import time
+import uuid
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import F
+from django.utils import timezone
+from wagtail.search.models import Query, QueryDailyHits
+from wagtail.search.utils import normalise_query_string
+
+logger = logging.getLogger('website')
+
+
+# Search results and suggestions are cached by page id under a generation
+# that is replaced whenever a page is published, unpublished or moved.
+SEARCH_GENERATION_KEY = 'search_generation'
+
+
+def _get_generation():
+    generation = cache.get(SEARCH_GENERATION_KEY)
+    if generation is None:
+        generation = uuid.uuid4().hex
+        cache.set(SEARCH_GENERATION_KEY, generation, None)
+    return generation
+
+
+def invalidate_search(*args, **kwargs):
+    cache.set(SEARCH_GENERATION_KEY, uuid.uuid4().hex, None)
+
+
+def search_cache_key(kind, query_string, *args):
+    parts = [normalise_query_string(query_string)] + [str(arg) for arg in args]
+    digest = hashlib.md5('|'.join(parts).encode()).hexdigest()
+    return 'search_{0}_{1}_{2}'.format(kind, _get_generation(), digest)
+
+
+def get_results(key):
+    return cache.get(key)
+
+
+def set_results(key, results):
+    cache.set(key, results, getattr(settings, 'SEARCH_CACHE_TIMEOUT', 600))
+
+
+# Query hits are counted in each process and written in one batch, from a
+# thread, every SEARCH_HITS_BATCH hits or SEARCH_HITS_INTERVAL seconds.
+_hits = collections.Counter()
+_hits_lock = threading.Lock()
+_hits_flushed = time.monotonic()
+
+
+def _take_hits():
+    global _hits, _hits_flushed
+    hits = _hits
+    _hits = collections.Counter()
+    _hits_flushed = time.monotonic()
+    return hits
+
+
+def flush_hits(hits):
+    """
+    Adds hits, a mapping of query strings to hit counts, to today's query hits.
+    """
+    date = timezone.now().date()
+    try:
+        for query_string, count in hits.items():
+            query = Query.get(query_string)
+            daily_hits, created = QueryDailyHits.objects.get_or_create(query=query, date=date)
+            QueryDailyHits.objects.filter(pk=daily_hits.pk).update(hits=F('hits') + count)
+    except:
+        logger.exception('Could not log search query hits.')
+    finally:
+        connection.close()
+
+
+def log_hit(query_string):
+    with _hits_lock:
+        _hits[normalise_query_string(query_string)] += 1
+        if (
+            sum(_hits.values()) < getattr(settings, 'SEARCH_HITS_BATCH', 50) and
+            time.monotonic() - _hits_flushed < getattr(settings, 'SEARCH_HITS_INTERVAL', 60)
+        ):
+            return
+        hits = _take_hits()
+    threading.Thread(target=flush_hits, args=(hits,), daemon=True).start()
+
+
+@atexit.register
+def _flush_remaining_hits():
+    with _hits_lock:
+        hits = _take_hits()
+    if hits:
+        flush_hits(hits)
@@ -278,3 +278,45 @@ COMMENT_ALLOW_BLOCKING_USERS = True
 COMMENT_ALLOW_MODERATOR_TO_BLOCK = True
 
 MAX_UPLOAD_SIZE = 4294967296
+
+# RSS feeds with more items than this are streamed instead of built in memory.
+# Streamed feeds can't be stored by wagtail-cache, so keep this above typical feed sizes.
+RSS_STREAM_THRESHOLD = 1000
+RSS_STREAM_CHUNK_SIZE = 100
+# Streamed premium feeds are buffered to be cached up to this size, and larger ones aren't cached. (bytes)
+PREMIUM_FEED_CACHE_MAX_SIZE = 8388608
+
+# wagtail-cache stores pages in their own cache, apart from everything else in 'default'.
+WAGTAIL_CACHE_BACKEND = 'pages'
+
+# Stale copies and render locks for wagtail-cache, see website/middleware.py. (seconds)
+WAGTAIL_CACHE_STALE_TIMEOUT = 86400
+WAGTAIL_CACHE_LOCK_TIMEOUT = 30
+WAGTAIL_CACHE_LOCK_WAIT = 2
+
+# Cached search results and batched query hit logging, see website/search_cache.py.
+SEARCH_CACHE_TIMEOUT = 600
+SEARCH_HITS_BATCH = 50
+SEARCH_HITS_INTERVAL = 60
+
+# Seconds to wait on a remote media host when probing its size, see website/media_probe.py.
+MEDIA_PROBE_TIMEOUT = 5
+
+# How long signed premium media links last: to the end of the next window of this many seconds.
+PREMIUM_MEDIA_SIGNED_TTL = 86400
+
+# Threads rendering images in the background when pages are published, see website/renditions.py.
+RENDITION_WORKERS = 2
+
+# Rendition lookups kept in each process and in the cache, see website/rendition_cache.py. (seconds)
+RENDITION_CACHE_SIZE = 1000
+RENDITION_CACHE_LOCAL_TIMEOUT = 300
+RENDITION_CACHE_TIMEOUT = 86400
+
+# Avatars are replaced by a square AVATAR_SIZE copy, with WebP copies at AVATAR_SIZES, see users/avatars.py. (pixels)
+AVATAR_SIZE = 100
+AVATAR_SIZES = [50, 100, 200]
+AVATAR_WORKERS = 2
+
+# Threads queueing form submission emails in post_office, see website/form_mail.py.
+FORM_MAIL_WORKERS = 1
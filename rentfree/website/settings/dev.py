@@ -49,7 +49,7 @@ MANAGERS = f'{EMAIL_ADMIN}'
 SERVER_EMAIL = f'{EMAIL_ADDR}'
 
 MIDDLEWARE = [
-        'wagtailcache.cache.UpdateCacheMiddleware',
+        'website.middleware.UpdateCacheMiddleware',
         'django.contrib.sessions.middleware.SessionMiddleware',
         'django.middleware.common.CommonMiddleware',
         'django.middleware.csrf.CsrfViewMiddleware',
@@ -62,7 +62,7 @@ MIDDLEWARE = [
         'django.middleware.clickjacking.XFrameOptionsMiddleware',
         'django.middleware.security.SecurityMiddleware',
         'wagtail.contrib.redirects.middleware.RedirectMiddleware',
-        'wagtailcache.cache.FetchFromCacheMiddleware',
+        'website.middleware.FetchFromCacheMiddleware',
 ]
 
 DATABASES = {
@@ -75,7 +75,10 @@ DATABASES = {
 CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
-    }
+    },
+    'pages': {
+        'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+    },
 }
 
 AUTHENTICATION_BACKENDS = (
@@ -64,6 +64,9 @@ AWS_HEADERS = {
 AWS_S3_REGION_NAME = os.environ.get('DOAWS_REGION')
 AWS_S3_URL = os.environ.get('DOPROVIDER_URL')
 AWS_S3_ENDPOINT_URL = 'https://' + f'{AWS_S3_REGION_NAME}' + '.' + f'{AWS_S3_URL}'
+# premium enclosures signed for nginx's secure_link, see website/signed_media.py
+PREMIUM_MEDIA_SIGNED_URLS = os.environ.get('DOSIGNED_MEDIA') == 'True'
+PREMIUM_MEDIA_SIGNING_KEY = os.environ.get('DOSIGNED_MEDIA_KEY')
 # most only required in development, anymail sends API mail by... API, see POST_OFFICE section
 EMAIL_BACKEND = 'post_office.EmailBackend'
 EMAIL_HOST = os.environ.get('DOEMAIL_HOST')
@@ -87,7 +90,7 @@ MANAGERS = f'{EMAIL_ADMIN}'
 SERVER_EMAIL = f'{EMAIL_ADDR}'
 
 MIDDLEWARE = [
-        'wagtailcache.cache.UpdateCacheMiddleware',
+        'website.middleware.UpdateCacheMiddleware',
         'django.contrib.sessions.middleware.SessionMiddleware',
         'django.middleware.common.CommonMiddleware',
         'django.middleware.csrf.CsrfViewMiddleware',
@@ -99,7 +102,7 @@ MIDDLEWARE = [
         'django.middleware.clickjacking.XFrameOptionsMiddleware',
         'django.middleware.security.SecurityMiddleware',
         'wagtail.contrib.redirects.middleware.RedirectMiddleware',
-        'wagtailcache.cache.FetchFromCacheMiddleware',
+        'website.middleware.FetchFromCacheMiddleware',
 ]
 
 DATABASES = {
@@ -113,14 +116,46 @@ DATABASES = {
     }
 }
 
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
-        'LOCATION': BASE_DIR / 'cache',
-        'KEY_PREFIX': 'wagtailcache',
-        'TIMEOUT': 3600, # one hour (in seconds)
+# Set DOCACHE_BACKEND=memcached to share one in-memory cache between the
+# gunicorn workers. Keys are prefixed per site and clear() only drops this
+# site's keys. Anything else falls back to the file cache.
+# Ansible raises memcached's item size to 8 MB (-I 8m) for whole feeds and
+# sitemap sections, and anything larger is logged and left uncached.
+# wagtail-cache keeps pages in 'pages', which it clears whole whenever its
+# keyring goes missing, so the application's own data lives in 'default'.
+
+if os.environ.get('DOCACHE_BACKEND') == 'memcached':
+    CACHES = {
+        'default': {
+            'BACKEND': 'custom_caches.NamespacedMemcacheCache',
+            'LOCATION': os.environ.get('DOCACHE_LOCATION', '127.0.0.1:11211'),
+            'KEY_PREFIX': f'rentfree_{BASE_URL}',
+            'TIMEOUT': 3600, # one hour (in seconds)
+            'NAMESPACE_TIMEOUT': 5, # how long a thread trusts its namespace before a clear() elsewhere (in seconds)
+        },
+        'pages': {
+            'BACKEND': 'custom_caches.NamespacedMemcacheCache',
+            'LOCATION': os.environ.get('DOCACHE_LOCATION', '127.0.0.1:11211'),
+            'KEY_PREFIX': f'wagtailcache_{BASE_URL}',
+            'TIMEOUT': 3600, # one hour (in seconds)
+            'NAMESPACE_TIMEOUT': 5, # how long a thread trusts its namespace before a clear() elsewhere (in seconds)
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': BASE_DIR / 'cache' / 'data',
+            'KEY_PREFIX': 'rentfree',
+            'TIMEOUT': 3600, # one hour (in seconds)
+        },
+        'pages': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': BASE_DIR / 'cache' / 'pages',
+            'KEY_PREFIX': 'wagtailcache',
+            'TIMEOUT': 3600, # one hour (in seconds)
+        },
     }
-}
 
 AUTHENTICATION_BACKENDS = (
     # Needed to login by username in Django admin, regardless of `allauth`
@@ -0,0 +1,182 @@
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from djstripe.models import Product
+from wagtail.core.signals import page_published, page_unpublished, post_page_move
+from wagtail.images.models import Rendition
+from wagtail_personalisation.models import PersonalisablePageMetadata, Segment
+from website import feed_cache, page_cache, rendition_cache, renditions, search_cache, sitemaps
+from website.models.pages import BasePage, PodcastContentIndexPage, PodcastContentPage
+from website.models.rules import TierEqualOrGreater, TierEqual
+from website.models.settings import LayoutSettings, SeoSettings
+from website.tiers import invalidate_tiers
+
+
+@receiver(post_save, sender=TierEqualOrGreater)
+@receiver(post_delete, sender=TierEqualOrGreater)
+@receiver(post_save, sender=TierEqual)
+@receiver(post_delete, sender=TierEqual)
+@receiver(post_save, sender=Segment)
+@receiver(post_delete, sender=Segment)
+@receiver(post_save, sender=PersonalisablePageMetadata)
+@receiver(post_delete, sender=PersonalisablePageMetadata)
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def tiers_changed(sender, **kwargs):
+    """ drop memoized tier resolutions when tier rules, their
+    segments, page variants or stripe products change. """
+    invalidate_tiers()
+
+
+@receiver(post_save, sender=PersonalisablePageMetadata)
+def flag_variant(sender, instance, **kwargs):
+    """ keep BasePage.is_variant in step with the metadata, so
+    listings and search filter on a flag instead of a subquery. """
+    BasePage.objects.filter(pk=instance.variant_id).update(
+        is_variant=instance.canonical_page_id != instance.variant_id
+    )
+
+
+@receiver(post_delete, sender=PersonalisablePageMetadata)
+def unflag_variant(sender, instance, **kwargs):
+    BasePage.objects.filter(pk=instance.variant_id).update(is_variant=False)
+
+
+@receiver(pre_save)
+def sync_variant_flag(sender, instance, update_fields=None, **kwargs):
+    """ pages are saved from revisions and copies that may predate
+    their metadata, so the flag is read from it on every save. """
+    if not isinstance(instance, BasePage):
+        return
+    if update_fields is not None and 'is_variant' not in update_fields:
+        return
+    if instance.pk is None:
+        # new pages and copies have no metadata yet
+        instance.is_variant = False
+        return
+    instance.is_variant = PersonalisablePageMetadata.objects.filter(variant_id=instance.pk).exclude(
+        canonical_page_id=instance.pk
+    ).exists()
+
+
+@receiver(page_published)
+@receiver(page_unpublished)
+@receiver(post_page_move)
+@receiver(post_save, sender=PersonalisablePageMetadata)
+@receiver(post_delete, sender=PersonalisablePageMetadata)
+def search_changed(sender, **kwargs):
+    """ drop cached search results and suggestions when
+    pages are published, unpublished, moved or personalised. """
+    search_cache.invalidate_search()
+
+
+@receiver(page_published)
+@receiver(page_unpublished)
+def seasons_changed(sender, instance, **kwargs):
+    """ drop the season summary of the podcast index
+    above an episode that was published or unpublished. """
+    if isinstance(instance, PodcastContentPage):
+        cache.delete(PodcastContentIndexPage.seasons_cache_key(instance.get_parent().pk))
+
+
+@receiver(post_page_move)
+def seasons_moved(sender, instance, parent_page_before, parent_page_after, **kwargs):
+    if isinstance(instance, PodcastContentPage):
+        cache.delete_many([
+            PodcastContentIndexPage.seasons_cache_key(parent_page_before.pk),
+            PodcastContentIndexPage.seasons_cache_key(parent_page_after.pk),
+        ])
+
+
+@receiver(page_published)
+@receiver(page_unpublished)
+def sitemap_changed(sender, instance, **kwargs):
+    """ regenerate the sitemap section listing a page when it is
+    published or unpublished, and every section when its url changed. """
+    sitemaps.invalidate_section(sitemaps.get_page_section(instance))
+    if isinstance(instance, tuple(sitemaps.INDEX_MODELS)):
+        sitemaps.invalidate_section(sitemaps.index_section(instance.pk))
+    # season pages of serial podcasts are dated by their episodes
+    if isinstance(instance, PodcastContentPage) and PodcastContentIndexPage.objects.filter(
+        pk=instance.get_parent().pk, rss_itunes_type='serial'
+    ).exists():
+        sitemaps.invalidate_section(sitemaps.PAGES_SECTION)
+    url_path_before = getattr(instance, '_url_path_before', None)
+    if url_path_before and url_path_before != instance.url_path:
+        sitemaps.invalidate_sitemaps()
+
+
+@receiver(post_page_move)
+def sitemap_moved(sender, instance, **kwargs):
+    sitemaps.invalidate_sitemaps()
+
+
+@receiver(page_published)
+@receiver(page_unpublished)
+def premium_feeds_changed(sender, instance, **kwargs):
+    """ drop the shared premium feeds of an index page that was published
+    or unpublished, or of the index page above such an episode or article. """
+    for index_page in [instance, instance.get_parent()]:
+        if index_page and hasattr(index_page.specific_class, 'premium_feed'):
+            feed_cache.invalidate_premium_feeds(index_page.id)
+
+
+@receiver(post_page_move)
+def premium_feeds_moved(sender, instance, parent_page_before, parent_page_after, **kwargs):
+    for index_page in [parent_page_before, parent_page_after]:
+        if hasattr(index_page.specific_class, 'premium_feed'):
+            feed_cache.invalidate_premium_feeds(index_page.id)
+
+
+@receiver(page_published)
+def render_page_images(sender, instance, **kwargs):
+    """ render the images a page is shown with in the background. """
+    renditions.generate_later(renditions.get_page_renditions(instance))
+
+
+@receiver(post_save, sender=LayoutSettings)
+@receiver(post_save, sender=SeoSettings)
+def render_settings_images(sender, instance, **kwargs):
+    renditions.generate_later(renditions.get_settings_renditions(instance))
+
+
+@receiver(post_delete, sender=Rendition)
+def forget_rendition(sender, instance, **kwargs):
+    """ drop a deleted rendition's cached url. """
+    rendition_cache.purge(instance)
+
+
+@receiver(pre_save)
+def remember_url_path(sender, instance, update_fields=None, **kwargs):
+    """ keep the url a live page had before it is saved, so
+    a slug change on publish can purge the old url. """
+    if not isinstance(instance, BasePage) or instance.pk is None or not instance.live:
+        return
+    if update_fields is not None and 'url_path' not in update_fields:
+        return
+    instance._url_path_before = BasePage.objects.filter(pk=instance.pk).values_list('url_path', flat=True).first()
+
+
+@receiver(page_published)
+def purge_published_page(sender, instance, **kwargs):
+    patterns = page_cache.get_page_patterns(instance)
+    url_path_before = getattr(instance, '_url_path_before', None)
+    if url_path_before and url_path_before != instance.url_path:
+        patterns += page_cache.url_path_patterns(url_path_before, page_cache.SUBTREE_URLS)
+    page_cache.purge(patterns)
+
+
+@receiver(page_unpublished)
+def purge_unpublished_page(sender, instance, **kwargs):
+    """ also sent for every live page that is deleted. """
+    page_cache.purge(page_cache.get_page_patterns(instance, descendants=True))
+
+
+@receiver(post_page_move)
+def purge_moved_page(sender, instance, parent_page_before, url_path_before, **kwargs):
+    if not instance.live:
+        return
+    page_cache.purge(
+        page_cache.get_page_patterns(instance, descendants=True) +
+        page_cache.get_page_patterns(instance, parent=parent_page_before, url_path=url_path_before, descendants=True)
+    )
@@ -0,0 +1,115 @@
+import base64
+import hashlib
+import hmac
+import re
+import time
+from datetime import datetime, timezone
+from django.conf import settings
+from django.core.cache import cache
+from urllib.parse import urlparse
+from website.models.media import CustomMedia
+
+
+# With PREMIUM_MEDIA_SIGNED_URLS on, premium enclosures skip the download
+# query: each /premium_media/ url in a subscriber's feed is swapped for a
+# /premium_signed/ url that nginx checks with secure_link against
+# PREMIUM_MEDIA_SIGNING_KEY. SignedMediaView then hands nginx the storage
+# url from the cache, so the storage's presigned url never appears in a link.
+# The subscriber's tier is signed into the link so nginx's premium_downloads
+# log records it as it was when the feed was served. Links are signed to the
+# end of the next window of PREMIUM_MEDIA_SIGNED_TTL seconds, so every feed
+# served in a window has the same links and each stays valid for one to two windows.
+ENCLOSURE_RE = re.compile(rb'https?://([^/"<\s]+)/premium_media/([-\w]*)/(\d+)/[-\w]*/([^"<\s]*)')
+
+
+def enabled():
+    return bool(getattr(settings, 'PREMIUM_MEDIA_SIGNED_URLS', False) and getattr(settings, 'PREMIUM_MEDIA_SIGNING_KEY', None))
+
+
+def _ttl():
+    return getattr(settings, 'PREMIUM_MEDIA_SIGNED_TTL', 86400)
+
+
+def current_window():
+    return int(time.time()) // _ttl()
+
+
+def window_start():
+    return datetime.fromtimestamp(current_window() * _ttl(), timezone.utc)
+
+
+def get_expires():
+    return (current_window() + 2) * _ttl()
+
+
+def sign(expires, uidb64, tier, media_id):
+    """
+    Returns the signature nginx's secure_link_md5 computes for a link.
+    """
+    value = '{0}/{1}/{2}/{3} {4}'.format(expires, uidb64, tier, media_id, settings.PREMIUM_MEDIA_SIGNING_KEY)
+    return base64.urlsafe_b64encode(hashlib.md5(value.encode()).digest()).decode().rstrip('=')
+
+
+def verify(signature, expires, uidb64, tier, media_id):
+    return hmac.compare_digest(signature, sign(expires, uidb64, tier, media_id))
+
+
+def get_storage_urls(media_ids, expires):
+    """
+    Returns the storage urls of media, by id, valid until expires. They are
+    the same for every subscriber, so they are cached for the window.
+    """
+    keys = {'signed_media_{0}_{1}'.format(expires, media_id): media_id for media_id in media_ids}
+    urls = {keys[key]: url for key, url in cache.get_many(list(keys)).items()}
+    missing = [media_id for media_id in media_ids if media_id not in urls]
+    if missing:
+        storage = CustomMedia._meta.get_field('file').storage
+        found = {}
+        for media_id, name in CustomMedia.objects.filter(pk__in=missing).values_list('pk', 'file'):
+            try:
+                found[media_id] = storage.url(name, expire=expires - int(time.time()))
+            except TypeError:
+                # storages that don't sign their urls, such as the local one in development
+                found[media_id] = storage.url(name)
+        cache.set_many({'signed_media_{0}_{1}'.format(expires, media_id): url for media_id, url in found.items()}, _ttl() * 2)
+        urls.update(found)
+    return urls
+
+
+def signed_url(host, uidb64, tier, media_id, file_name, expires):
+    signature = sign(expires, uidb64, tier, media_id)
+    return 'https://{0}/premium_signed/{1}/{2}/{3}/{4}/{5}/{6}'.format(
+        host, signature, expires, uidb64, tier, media_id, file_name
+    )
+
+
+def download_path(host, uidb64, tier, media_id, storage_url):
+    """
+    Returns the internal nginx location that proxies a signed download from
+    storage_url and logs it to premium_downloads.
+    """
+    url = urlparse(storage_url)
+    path = '/signed_download/{0}/{1}/{2}/{3}/{4}{5}'.format(
+        uidb64, tier, media_id, url.scheme or 'https', url.netloc or host, url.path
+    )
+    if url.query:
+        path += '?' + url.query
+    return path
+
+
+def sign_enclosures(content, uidb64, tier=0):
+    """
+    Replaces the premium media links in a subscriber's feed with signed ones.
+    """
+    if not ENCLOSURE_RE.search(content):
+        return content
+    expires = get_expires()
+
+    def replace(match):
+        if match.group(2).decode() != uidb64:
+            return match.group(0)
+        return signed_url(
+            match.group(1).decode(), uidb64, tier, int(match.group(3)), match.group(4).decode(), expires
+        ).encode()
+
+    return ENCLOSURE_RE.sub(replace, content)
@@ -0,0 +1,102 @@
+import uuid
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max
+from wagtail.contrib.sitemaps import Sitemap
+from wagtail.core.models import Page
+from wagtail.core.utils import resolve_model_string
+from website.models.pages import ArticleContentIndexPage, ArticleContentPage, PodcastContentIndexPage, PodcastContentPage
+
+
+# The sitemap is split into sections: one for every article and podcast
+# index, listing its articles or episodes, and one for all other pages.
+# Each page of a section is cached under the section's generation, which
+# website.signals replaces when a page in that section is published or
+# unpublished. Moving a page replaces the generation of every section.
+PAGES_SECTION = 'pages'
+INDEX_MODELS = [ArticleContentIndexPage, PodcastContentIndexPage]
+CONTENT_MODELS = [ArticleContentPage, PodcastContentPage]
+
+
+def _get_generation(name):
+    key = 'sitemap_generation_{0}'.format(name)
+    generation = cache.get(key)
+    if generation is None:
+        generation = uuid.uuid4().hex
+        cache.set(key, generation, None)
+    return generation
+
+
+def invalidate_section(name):
+    cache.set('sitemap_generation_{0}'.format(name), uuid.uuid4().hex, None)
+    cache.set('sitemap_generation_index', uuid.uuid4().hex, None)
+
+
+def invalidate_sitemaps():
+    cache.set('sitemap_generation_all', uuid.uuid4().hex, None)
+
+
+def sitemap_cache_key(name, host, page=1):
+    return 'sitemap_{0}_{1}_{2}_{3}_{4}'.format(
+        _get_generation('all'), name, _get_generation(name), host, page
+    )
+
+
+def index_section(index_page_id):
+    return 'index-{0}'.format(index_page_id)
+
+
+def get_page_section(page):
+    """
+    Returns the name of the section listing page.
+    """
+    if isinstance(page, tuple(CONTENT_MODELS)):
+        return index_section(page.get_parent().pk)
+    return PAGES_SECTION
+
+
+class SectionSitemap(Sitemap):
+    limit = getattr(settings, 'SITEMAP_SECTION_SIZE', 5000)
+
+    def summary(self):
+        """
+        Returns the number of pages in this section and when the latest was published.
+        """
+        return self.items().order_by().aggregate(count=Count('pk'), lastmod=Max('last_published_at'))
+
+
+class PagesSitemap(SectionSitemap):
+    """
+    Every live page except articles and episodes.
+    """
+
+    def items(self):
+        return super().items().not_type(*CONTENT_MODELS)
+
+
+class IndexSitemap(SectionSitemap):
+    """
+    The live articles or episodes under one index page.
+    """
+
+    def __init__(self, request, index_page):
+        super().__init__(request)
+        self.index_page = index_page
+
+    def items(self):
+        querymodel = resolve_model_string(self.index_page.index_query_pagemodel, self.index_page._meta.app_label)
+        return querymodel.objects.child_of(self.index_page).live().public().order_by('path').defer_streamfields()
+
+
+def get_sections(request):
+    """
+    Returns the sitemap sections of the request's site, by name.
+    """
+    sections = OrderedDict()
+    sections[PAGES_SECTION] = PagesSitemap(request)
+    root_page = sections[PAGES_SECTION].get_wagtail_site().root_page
+    index_pages = Page.objects.descendant_of(root_page, inclusive=True).live().public().type(*INDEX_MODELS)
+    for index_page in index_pages.order_by('path').specific():
+        sections[index_section(index_page.pk)] = IndexSitemap(request, index_page)
+    return sections
@@ -13,10 +13,13 @@ from django.utils.http import urlsafe_base64_encode
 from pytube import extract
 from videos_id.video_info import VideoInfo
 from wagtail.core.models import Collection
+from wagtail.admin.templatetags.wagtailadmin_tags import avatar_url as wagtail_avatar_url
 from wagtail.core.templatetags.wagtailcore_tags import richtext
 
 from wagtail.images.models import Image
-from website import __version__
+from wagtail.images.templatetags.wagtailimages_tags import ImageNode, image as wagtail_image
+from users import avatars
+from website import __version__, rendition_cache
 from website.forms import SearchForm
 from website.utils import uri_validator, get_protected_media_link, uri_validator
 from website.models.choices import get_bootstrap_setting, page_choices
@@ -50,6 +53,50 @@ def generate_random_id():
 def is_file_form(form):
     return any([isinstance(field.field.widget, ClearableFileInput) for field in form])
 
+class CachedImageNode(ImageNode):
+    """
+    wagtail's image tag, with the rendition looked up in the rendition cache.
+    """
+
+    def render(self, context):
+        try:
+            image = self.image_expr.resolve(context)
+        except template.VariableDoesNotExist:
+            return ''
+
+        if not image:
+            if self.output_var_name:
+                context[self.output_var_name] = None
+            return ''
+
+        if not hasattr(image, 'get_rendition'):
+            raise ValueError("image tag expected an Image object, got %r" % image)
+
+        rendition = rendition_cache.get_rendition_or_missing(image, self.filter)
+
+        if self.output_var_name:
+            context[self.output_var_name] = rendition
+            return ''
+        resolved_attrs = {}
+        for key in self.attrs:
+            resolved_attrs[key] = self.attrs[key].resolve(context)
+        return rendition.img_tag(resolved_attrs)
+
+# Replaces wagtailimages_tags' image tag, so load website_tags after it.
+@register.tag
+def image(parser, token):
+    node = wagtail_image(parser, token)
+    return CachedImageNode(node.image_expr, node.filter_spec, output_var_name=node.output_var_name, attrs=node.attrs)
+
+# Replaces wagtailadmin_tags' avatar_url, so load website_tags after it.
+@register.simple_tag
+def avatar_url(user, size=50, gravatar_only=False):
+    if not gravatar_only and hasattr(user, 'wagtail_userprofile') and user.wagtail_userprofile.avatar:
+        url = avatars.get_variant_url(user.wagtail_userprofile.avatar, size)
+        if url:
+            return url
+    return wagtail_avatar_url(user, size=size, gravatar_only=gravatar_only)
+
 @register.simple_tag(takes_context=True)
 def og_image(context, page):
 
@@ -62,12 +109,12 @@ def og_image(context, page):
 
     if page:
         if page.og_image:
-            return base_url + page.og_image.get_rendition('original').url
+            return base_url + rendition_cache.get_rendition_url(page.og_image, 'original')
         elif page.cover_image:
-            return base_url + page.cover_image.get_rendition('original').url
+            return base_url + rendition_cache.get_rendition_url(page.cover_image, 'original')
     site = context['settings'].request_or_site
     if site.layoutsettings.logo:
-        return site.layoutsettings.logo.get_rendition('original').url
+        return rendition_cache.get_rendition_url(site.layoutsettings.logo, 'original')
     return None
 
 @register.simple_tag
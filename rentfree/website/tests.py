@@ -0,0 +1,512 @@
+import datetime
+import io
+import os
+import shutil
+import tempfile
+import time
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.core.files.images import ImageFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image as PILImage
+from wagtail.core.models import Site
+from post_office.models import Email
+from wagtail.images.models import Image
+from wagtail_personalisation.models import PersonalisablePageMetadata
+from users.models import CustomUserProfile
+from website import downloads, form_mail, signed_media
+from website.utils import KeysetPaginator
+from website.models.media import (
+    CustomMedia, DailyMediaDownloads, Download, DownloadEvent, DownloadLogImport, DownloadRollup
+)
+from website.podcast_feeds import PodcastFeed
+from website.models.pages import (
+    ArticleContentIndexPage, ArticleContentPage, ArticlePageAuthor,
+    PodcastContentIndexPage, PodcastContentPage, PodcastPageAuthor
+)
+
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(
+    MEDIA_ROOT=MEDIA_ROOT,
+    DEFAULT_FILE_STORAGE='django.core.files.storage.FileSystemStorage',
+    CACHES={
+        'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+        'pages': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+    },
+    WAGTAIL_CACHE=False,
+)
+class FeedQueriesTest(TestCase):
+    """
+    The rss/ feeds of podcast and article indexes are fetched in a fixed
+    number of queries, however many episodes or articles they list, with
+    uploaded or remote media, and with or without categories.
+    """
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.author = get_user_model().objects.create(
+            email='author@example.com', first_name='Feed', last_name='Author', user_name='feedauthor'
+        )
+        self.author.groups.add(Group.objects.get_or_create(name='Authors')[0])
+        self.root = Site.objects.get(is_default_site=True).root_page
+
+    def make_image(self):
+        image_file = io.BytesIO()
+        PILImage.new('RGB', (50, 50)).save(image_file, 'PNG')
+        return Image.objects.create(title='image', file=ImageFile(image_file, name='image.png'))
+
+    def add_podcast_index(self):
+        return self.root.add_child(instance=PodcastContentIndexPage(
+            title='Podcast', slug='podcast', rss_title='Podcast', rss_description='Podcast',
+            rss_image=self.make_image(), rss_premium_image=self.make_image(), rss_main_entity=False,
+            rss_ttl='60', rss_itunes_primary_category='Arts', rss_omit_previews=False,
+            rss_itunes_explicit=False, rss_combine_private=False, rss_include_episode_number=False,
+            rss_itunes_type='episodic', rss_itunes_description='Podcast',
+        ))
+
+    def add_episode(self, index_page, number, uploaded=False):
+        episode = PodcastContentPage(
+            title='Episode {0}'.format(number), slug='episode-{0}'.format(number), caption='Episode',
+            date_display=datetime.date(2022, 1, 1) + datetime.timedelta(days=number),
+            remote_media_thumbnail=self.make_image(), episode_preview=False,
+        )
+        if uploaded:
+            # a type the page doesn't know, so the media's own is used
+            episode.uploaded_media = CustomMedia.objects.create(
+                title='Episode {0}'.format(number), file='media/episode-{0}.flac'.format(number), type='audio',
+                duration='60', file_size=1000 + number, mime_type='audio/flac',
+            )
+        else:
+            episode.remote_media = 'https://example.com/episode-{0}.mp3'.format(number)
+            episode.remote_media_type = 'audio/mpeg'
+            episode.remote_media_duration = '60'
+        episode.author = [PodcastPageAuthor(author=self.author)]
+        index_page.add_child(instance=episode)
+        episode.save_revision().publish()
+        return episode
+
+    def add_uploaded_episode(self, index_page, number):
+        return self.add_episode(index_page, number, uploaded=True)
+
+    def add_article_index(self, rss_categories=False):
+        index_page = ArticleContentIndexPage(
+            title='Articles', slug='articles', rss_title='Articles', rss_description='Articles',
+            rss_image=self.make_image(), rss_premium_image=self.make_image(), rss_main_entity=False,
+            rss_ttl='60', rss_combine_private=False, rss_categories=rss_categories, rss_copyright='Articles',
+            rss_author=self.author,
+        )
+        index_page.tags.add('Articles')
+        return self.root.add_child(instance=index_page)
+
+    def add_article(self, index_page, number):
+        article = ArticleContentPage(
+            title='Article {0}'.format(number), slug='article-{0}'.format(number), caption='Article',
+            date_display=datetime.date(2022, 1, 1) + datetime.timedelta(days=number),
+        )
+        article.tags.add('News', 'Article {0}'.format(number))
+        article.author = [ArticlePageAuthor(author=self.author)]
+        index_page.add_child(instance=article)
+        article.save_revision().publish()
+
+    def read_feed(self, response):
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content) if response.streaming else response.content
+
+    def get_feed(self, index_page):
+        return self.read_feed(self.client.get(index_page.url + 'rss/'))
+
+    def assertFeedQueriesConstant(self, index_page, add_item):
+        for number in range(2):
+            add_item(index_page, number)
+        # the first request renders the images, which later ones reuse
+        self.get_feed(index_page)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.get_feed(index_page).count(b'<item>'), 2)
+        # requests clear the query log, so the count is kept before the next
+        num_queries = len(queries)
+
+        for number in range(2, 12):
+            add_item(index_page, number)
+        self.get_feed(index_page)
+        with self.assertNumQueries(num_queries):
+            self.assertEqual(self.get_feed(index_page).count(b'<item>'), 12)
+
+    def test_podcast_feed_queries(self):
+        self.assertFeedQueriesConstant(self.add_podcast_index(), self.add_episode)
+
+    def test_uploaded_media_feed_queries(self):
+        self.assertFeedQueriesConstant(self.add_podcast_index(), self.add_uploaded_episode)
+
+    def test_uploaded_media_enclosure(self):
+        index_page = self.add_podcast_index()
+        episode = self.add_uploaded_episode(index_page, 0)
+        content = self.get_feed(index_page)
+        self.assertIn(b'length="1000" type="audio/flac"', content)
+        self.assertIn(episode.uploaded_media.url.replace('&', '&amp;').encode(), content)
+
+    def test_premium_enclosure_link(self):
+        index_page = self.add_podcast_index()
+        canonical = self.add_uploaded_episode(index_page, 0)
+        variant = self.add_uploaded_episode(index_page, 1)
+        # a variant stands in for its canonical episode in premium feeds
+        PersonalisablePageMetadata.objects.update_or_create(variant=variant, defaults={'canonical_page': canonical})
+
+        request = RequestFactory().get(index_page.url + 'premiumfeed/dWlk/token/')
+        all_private = PodcastContentPage.objects.filter(pk=variant.pk)
+        feed = PodcastFeed(request, 'http://testserver/', 'http://testserver/', None, all_private, 'token', 'dWlk')
+        content = self.read_feed(feed(request))
+        link = 'https://testserver/premium_media/dWlk/{0}/token/episode-1.flac'.format(variant.uploaded_media.pk)
+        self.assertIn('url="{0}"'.format(link).encode(), content)
+        self.assertIn(b'length="1001" type="audio/flac"', content)
+
+    def test_conditional_feed(self):
+        index_page = self.add_podcast_index()
+        self.add_episode(index_page, 0)
+        response = self.client.get(index_page.url + 'rss/')
+        not_modified = self.client.get(index_page.url + 'rss/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified['ETag'], response['ETag'])
+
+    @override_settings(
+        CACHES={
+            'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+            'pages': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'feed-tests'},
+        },
+        WAGTAIL_CACHE=True,
+    )
+    def test_conditional_cached_feed(self):
+        index_page = self.add_podcast_index()
+        self.add_episode(index_page, 0)
+        response = self.client.get(index_page.url + 'rss/')
+        self.assertEqual(response['X-Wagtail-Cache'], 'miss')
+        not_modified = self.client.get(index_page.url + 'rss/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual((not_modified.status_code, not_modified['X-Wagtail-Cache']), (304, 'hit'))
+        cached = self.client.get(index_page.url + 'rss/')
+        self.assertEqual((cached.status_code, cached['X-Wagtail-Cache']), (200, 'hit'))
+
+    def test_article_feed_queries(self):
+        self.assertFeedQueriesConstant(self.add_article_index(), self.add_article)
+
+    def test_article_feed_categories(self):
+        index_page = self.add_article_index(rss_categories=True)
+        self.assertFeedQueriesConstant(index_page, self.add_article)
+        content = self.get_feed(index_page)
+        self.assertIn(b'<category>Articles</category>', content)
+        self.assertIn(b'<category>Article 11</category>', content)
+        self.assertEqual(content.count(b'<category>News</category>'), 12)
+
+    def test_article_feed_without_categories(self):
+        index_page = self.add_article_index()
+        self.add_article(index_page, 0)
+        self.assertNotIn(b'<category>', self.get_feed(index_page))
+
+    def test_streamed_feed_matches_rendered(self):
+        index_page = self.add_podcast_index()
+        for number in range(5):
+            self.add_episode(index_page, number)
+        # episodes on the same date are listed in the same order either way
+        PodcastContentPage.objects.child_of(index_page).update(date_display=datetime.date(2022, 1, 1))
+        with override_settings(RSS_STREAM_THRESHOLD=1000):
+            rendered = self.get_feed(index_page)
+        with override_settings(RSS_STREAM_THRESHOLD=2, RSS_STREAM_CHUNK_SIZE=2):
+            streamed = self.get_feed(index_page)
+        self.assertEqual(streamed, rendered)
+
+
+@override_settings(
+    PREMIUM_MEDIA_SIGNED_URLS=True,
+    PREMIUM_MEDIA_SIGNING_KEY='signing-key',
+    PREMIUM_MEDIA_SIGNED_TTL=3600,
+    CACHES={
+        'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+        'pages': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+    },
+)
+class SignedMediaTest(TestCase):
+    """
+    Signed premium media links carry only what nginx's secure_link checks,
+    and the storage's presigned url is added when the link is downloaded.
+    """
+    feed = (
+        b'<enclosure url="https://example.com/premium_media/dWlk/5/token-1/episode.mp3" />'
+        b'<enclosure url="https://example.com/premium_media/b3RoZXI/6/token-2/other.mp3" />'
+    )
+    presigned = 'https://bucket.example.com/premium_media/episode.mp3?X-Amz-Signature=secret'
+
+    def signed_link(self, expires=None, tier=2, media_id=5):
+        expires = expires or signed_media.get_expires()
+        return signed_media.signed_url('example.com', 'dWlk', tier, media_id, 'episode.mp3', expires)
+
+    def test_sign_enclosures(self):
+        content = signed_media.sign_enclosures(self.feed, 'dWlk', 2)
+        expires = signed_media.get_expires()
+        self.assertIn(self.signed_link(expires).encode(), content)
+        self.assertNotIn(b'token-1', content)
+        # links in the feed for someone else are left alone
+        self.assertIn(b'/premium_media/b3RoZXI/6/token-2/other.mp3', content)
+
+    def test_verify(self):
+        expires = signed_media.get_expires()
+        signature = signed_media.sign(expires, 'dWlk', 2, 5)
+        self.assertTrue(signed_media.verify(signature, expires, 'dWlk', 2, 5))
+        self.assertFalse(signed_media.verify(signature, expires, 'dWlk', 3, 5))
+        self.assertFalse(signed_media.verify(signature, expires + 1, 'dWlk', 2, 5))
+        with override_settings(PREMIUM_MEDIA_SIGNING_KEY='other-key'):
+            self.assertFalse(signed_media.verify(signature, expires, 'dWlk', 2, 5))
+
+    def test_download_keeps_presigned_url_internal(self):
+        self.assertNotIn('X-Amz-Signature', self.signed_link())
+        with mock.patch.object(signed_media, 'get_storage_urls', return_value={5: self.presigned}):
+            response = self.client.get(self.signed_link().replace('https://example.com', ''))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response['X-Accel-Redirect'],
+            '/signed_download/dWlk/2/5/https/bucket.example.com/premium_media/episode.mp3?X-Amz-Signature=secret'
+        )
+
+    def test_download_of_bad_links(self):
+        link = self.signed_link().replace('https://example.com', '')
+        self.assertEqual(self.client.get(link.replace('/2/5/', '/3/5/')).status_code, 403)
+        expired = self.signed_link(expires=int(time.time()) - 60).replace('https://example.com', '')
+        self.assertEqual(self.client.get(expired).status_code, 410)
+        # signed, but for media that doesn't exist
+        self.assertEqual(self.client.get(link).status_code, 404)
+
+    def test_download_of_stored_media(self):
+        media = CustomMedia.objects.create(title='Episode', file='media/episode.mp3', type='audio')
+        response = self.client.get(self.signed_link(media_id=media.pk).replace('https://example.com', ''))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['X-Accel-Redirect'].startswith('/signed_download/dWlk/2/{0}/'.format(media.pk)))
+        self.assertTrue(response['X-Accel-Redirect'].endswith('/episode.mp3'))
+
+
+class DownloadsTest(TestCase):
+    """
+    Premium downloads are logged as events, and rollup_downloads adds them to
+    the daily totals and the subscribers' download records exactly once.
+    """
+    def setUp(self):
+        user = get_user_model().objects.create(email='subscriber@example.com', user_name='subscriber')
+        self.profile = CustomUserProfile.objects.get_or_create(user=user)[0]
+        self.media = CustomMedia.objects.create(title='Episode', file='media/episode.mp3', type='audio')
+
+    def rollup(self, *args):
+        # events written in the last few minutes are left for the next run
+        DownloadEvent.objects.update(recorded_at=timezone.now() - datetime.timedelta(minutes=10))
+        out = io.StringIO()
+        call_command('rollup_downloads', *args, stdout=out)
+        return out.getvalue()
+
+    def get_record(self):
+        return Download.objects.get(user=self.profile, media=self.media)
+
+    def test_log_download(self):
+        downloads.log_download(self.profile.pk, self.media.pk, 1)
+        downloads.log_download(self.profile.pk, self.media.pk, 1)
+        self.assertEqual(DownloadEvent.objects.filter(user=self.profile, media=self.media, tier=1).count(), 2)
+        self.assertFalse(Download.objects.exists())
+
+        self.rollup()
+        self.assertEqual(self.get_record().download_count, 2)
+        self.assertEqual(self.get_record().last, timezone.localdate())
+
+        # the existing record is added to, not replaced
+        downloads.log_download(self.profile.pk, self.media.pk, 1)
+        self.rollup()
+        self.assertEqual(Download.objects.count(), 1)
+        self.assertEqual(self.get_record().download_count, 3)
+
+    def test_record_downloads_keeps_their_dates(self):
+        logged = timezone.now() - datetime.timedelta(days=3)
+        downloads.record_downloads({(self.profile.pk, self.media.pk, 2, logged): 4})
+        event = DownloadEvent.objects.get()
+        self.assertEqual((event.count, event.created_at), (4, logged))
+        self.rollup()
+        self.assertEqual(self.get_record().last, timezone.localdate(logged))
+        # an older download doesn't move the last one back
+        downloads.log_download(self.profile.pk, self.media.pk, 2)
+        downloads.record_downloads({(self.profile.pk, self.media.pk, 2, logged - datetime.timedelta(days=1)): 1})
+        self.rollup()
+        self.assertEqual(self.get_record().download_count, 6)
+        self.assertEqual(self.get_record().last, timezone.localdate())
+
+    def test_rollup_batches(self):
+        today = timezone.now()
+        yesterday = today - datetime.timedelta(days=1)
+        downloads.record_downloads({
+            (self.profile.pk, self.media.pk, 1, yesterday): 2,
+            (self.profile.pk, self.media.pk, 2, yesterday): 3,
+        })
+        downloads.record_downloads({
+            (self.profile.pk, self.media.pk, 1, today): 5,
+            (None, self.media.pk, 1, today): 7,
+        })
+        downloads.log_download(self.profile.pk, self.media.pk, 1)
+        self.assertIn('3 batches', self.rollup('--batch', '2'))
+
+        totals = dict(
+            ((row.date, row.tier), row.downloads) for row in DailyMediaDownloads.objects.filter(media=self.media)
+        )
+        self.assertEqual(totals, {
+            (timezone.localdate(yesterday), 1): 2,
+            (timezone.localdate(yesterday), 2): 3,
+            (timezone.localdate(today), 1): 13,
+        })
+        # events of deleted subscribers only count towards the daily totals
+        self.assertEqual(self.get_record().download_count, 11)
+        self.assertEqual(DownloadRollup.objects.get().last_event_id, DownloadEvent.objects.latest('pk').pk)
+
+        # nothing new to roll up
+        self.assertIn('0 batches', self.rollup())
+        # a rebuild recounts the daily totals, not the download records
+        self.rollup('--rebuild', '--batch', '2')
+        self.assertEqual(DailyMediaDownloads.objects.get(tier=1, date=timezone.localdate(today)).downloads, 13)
+        self.assertEqual(self.get_record().download_count, 11)
+
+    def test_bad_link_is_refused_in_one_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/premium_media/c3Vic2NyaWJlckBleGFtcGxlLmNvbQ/{0}/bad-token/episode.mp3'.format(self.media.pk))
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(DownloadEvent.objects.exists())
+
+
+class ImportDownloadsTest(TestCase):
+    """
+    import_premium_downloads counts the downloads in nginx's log once, dated
+    by the minute they were logged, on the tier signed into the link.
+    """
+    def setUp(self):
+        user = get_user_model().objects.create(email='subscriber@example.com', user_name='subscriber', is_paysubscribed=3)
+        self.profile = CustomUserProfile.objects.get_or_create(user=user)[0]
+        self.media = CustomMedia.objects.create(title='Episode', file='media/episode.mp3', type='audio')
+        fd, self.logfile = tempfile.mkstemp()
+        self.addCleanup(os.remove, self.logfile)
+        lines = [
+            '2022-03-01T10:15:30+00:00 {uid} 1 {media} 200 1000 "-"',
+            '2022-03-01T10:15:50+00:00 {uid} 1 {media} 206 1000 "bytes=0-"',
+            # a player's later range request, not another download
+            '2022-03-01T10:16:10+00:00 {uid} 1 {media} 206 1000 "bytes=1000-"',
+            '2022-03-01T10:17:00+00:00 {uid} 1 {media} 403 0 "-"',
+            # logged before the tier was, counted on the subscriber's tier
+            '2022-02-28T23:59:00+00:00 {uid} {media} 200 1000 "-"',
+            '2022-03-01T10:18:00+00:00 b3RoZXJAZXhhbXBsZS5jb20 1 {media} 200 1000 "-"',
+            'not a log line',
+        ]
+        with os.fdopen(fd, 'w') as f:
+            for line in lines:
+                f.write(line.format(uid='c3Vic2NyaWJlckBleGFtcGxlLmNvbQ', media=self.media.pk) + '\n')
+
+    def import_log(self):
+        out = io.StringIO()
+        call_command('import_premium_downloads', self.logfile, stdout=out)
+        return out.getvalue()
+
+    def test_import(self):
+        self.assertIn('3 downloads counted for 1 subscribers', self.import_log())
+        events = dict(
+            ((event.tier, event.created_at), event.count)
+            for event in DownloadEvent.objects.filter(user=self.profile, media=self.media)
+        )
+        self.assertEqual(events, {
+            (1, datetime.datetime(2022, 3, 1, 10, 15, tzinfo=datetime.timezone.utc)): 2,
+            (3, datetime.datetime(2022, 2, 28, 23, 59, tzinfo=datetime.timezone.utc)): 1,
+        })
+        self.assertEqual(DownloadLogImport.objects.get().downloads, 4)
+
+    def test_import_once(self):
+        self.import_log()
+        self.assertIn('has already been imported', self.import_log())
+        self.assertEqual(DownloadEvent.objects.count(), 2)
+        self.assertEqual(DownloadLogImport.objects.count(), 1)
+
+
+class KeysetPaginatorTest(TestCase):
+    """
+    KeysetPaginator pages forwards and backwards by cursor, breaking ties by
+    id, and falls back to the first page at the edges of the list.
+    """
+    def setUp(self):
+        # listed newest first: f, e, d, c (twice), b, a
+        for title in 'abccdef':
+            CustomMedia.objects.create(title=title, file='media/{0}.mp3'.format(title), type='audio')
+        self.paginator = KeysetPaginator(CustomMedia.objects.all(), 3, '-title')
+        self.ordered = list(CustomMedia.objects.order_by('-title', '-pk'))
+
+    def fetch(self, after=None, before=None):
+        return self.paginator.fetch(after, before)
+
+    def test_pages_forwards_and_back(self):
+        first = self.fetch()
+        self.assertEqual(first, (self.ordered[:3], False, True))
+        second = self.fetch(after=self.ordered[2].pk)
+        # the tied titles are split across pages by id, neither is skipped
+        self.assertEqual(second, (self.ordered[3:6], True, True))
+        self.assertEqual(self.fetch(after=self.ordered[5].pk), (self.ordered[6:], True, False))
+        self.assertEqual(self.fetch(before=self.ordered[6].pk), (self.ordered[3:6], True, True))
+        self.assertEqual(self.fetch(before=self.ordered[3].pk), first)
+
+    def test_before_near_the_start(self):
+        # a page back from the second item would hold just the first
+        self.assertEqual(self.fetch(before=self.ordered[1].pk), (self.ordered[:3], False, True))
+        self.assertEqual(self.fetch(before=self.ordered[0].pk), (self.ordered[:3], False, True))
+
+    def test_stale_cursors(self):
+        deleted = self.ordered[2].pk
+        self.ordered[2].delete()
+        self.ordered = list(CustomMedia.objects.order_by('-title', '-pk'))
+        first = (self.ordered[:3], False, True)
+        self.assertEqual(self.fetch(after=deleted), first)
+        self.assertEqual(self.fetch(before=deleted), first)
+        self.assertEqual(self.fetch(after='not-an-id'), first)
+        # nothing after the last item
+        self.assertEqual(self.fetch(after=self.ordered[-1].pk), first)
+
+    def test_page(self):
+        page = self.paginator.page(after=self.ordered[2].pk)
+        self.assertEqual(list(page), self.ordered[3:6])
+        self.assertTrue(page.has_other_pages())
+        self.assertEqual((page.previous_cursor(), page.next_cursor()), (self.ordered[3].pk, self.ordered[5].pk))
+
+
+class FormMailTest(TestCase):
+    """
+    form_mail.queue() queues a form's emails in one query, and one by one
+    when an address doesn't validate, so only that email is lost.
+    """
+    def message(self, recipient):
+        return {
+            'sender': 'site@example.com', 'recipients': [recipient],
+            'subject': 'Submission', 'html_message': '<p>Submitted</p>',
+        }
+
+    def setUp(self):
+        # queue() closes the connection its thread used, which is the test's here
+        patcher = mock.patch.object(form_mail, 'connection')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_queue(self):
+        with self.assertNumQueries(1):
+            form_mail.queue([self.message('one@example.com'), self.message('two@example.com')])
+        self.assertEqual(
+            sorted(Email.objects.values_list('to', flat=True)), [['one@example.com'], ['two@example.com']]
+        )
+
+    def test_queue_one_by_one(self):
+        with self.assertLogs('website', 'WARNING') as logs:
+            form_mail.queue([self.message('one@example.com'), self.message('not an address'), self.message('two@example.com')])
+        self.assertEqual(
+            sorted(Email.objects.values_list('to', flat=True)), [['one@example.com'], ['two@example.com']]
+        )
+        self.assertIn('not an address', logs.output[0])
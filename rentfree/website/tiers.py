@@ -0,0 +1,76 @@
+import uuid
+from django.core.cache import cache
+from wagtail_personalisation.models import PersonalisablePageMetadata
+from website.models.rules import TierEqualOrGreater, TierEqual
+
+
+# Which segments and pages a subscriber can see only depends on their tier
+# level and whether their subscription is active, so the resolved tiers are
+# memoized per (level, status) and dropped whenever rules, segments, stripe
+# products or page variants change.
+TIERS_GENERATION_KEY = 'tiers_generation'
+
+
+def _get_generation():
+    generation = cache.get(TIERS_GENERATION_KEY)
+    if generation is None:
+        generation = uuid.uuid4().hex
+        cache.set(TIERS_GENERATION_KEY, generation, None)
+    return generation
+
+
+def invalidate_tiers(*args, **kwargs):
+    cache.set(TIERS_GENERATION_KEY, uuid.uuid4().hex, None)
+
+
+def _resolve(level, status):
+    segments = []
+    if status == 'active':
+        for rule in TierEqualOrGreater.objects.select_related('tier_level').exclude(tier_level=None):
+            try:
+                if level >= int(rule.tier_level.metadata['tier']):
+                    segments += [rule.segment_id]
+            except:
+                pass
+        for rule in TierEqual.objects.select_related('tier_level').exclude(tier_level=None):
+            try:
+                if level == int(rule.tier_level.metadata['tier']):
+                    segments += [rule.segment_id]
+            except:
+                pass
+    segments = sorted(set(segments))
+
+    canonical_ids = []
+    variant_ids = []
+    if segments:
+        for canonical_id, variant_id in PersonalisablePageMetadata.objects.filter(segment_id__in=segments).values_list('canonical_page_id', 'variant_id'):
+            canonical_ids += [canonical_id]
+            variant_ids += [variant_id]
+
+    return {
+        'segments': segments,
+        'canonical_ids': canonical_ids,
+        'variant_ids': variant_ids,
+    }
+
+
+def resolve_tiers(user):
+    """
+    Returns the tier segments a user belongs to, with the ids of the canonical
+    pages those segments replace and the ids of the variants they unlock.
+    Matches TierEqualOrGreater.test_user() and TierEqual.test_user().
+    """
+    if not user or user.is_anonymous:
+        return _resolve(0, None)
+    try:
+        status = user.stripe_subscription.status
+    except:
+        status = None
+    level = user.is_paysubscribed
+
+    key = 'tiers_{0}_{1}_{2}'.format(_get_generation(), level, status)
+    tiers = cache.get(key)
+    if tiers is None:
+        tiers = _resolve(level, status)
+        cache.set(key, tiers)
+    return tiers
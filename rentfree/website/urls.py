@@ -6,7 +6,6 @@ from search import urls as search_urls
 from users import urls as users_urls
 from allauth import urls as allauth_urls
 from wagtail.admin import urls as wagtailadmin_urls
-from wagtail.contrib.sitemaps.views import sitemap
 from wagtail.core import urls as wagtail_urls
 from wagtail.documents import urls as wagtaildocs_urls
 
@@ -14,7 +13,10 @@ from website.models.choices import page_choices
 from website.views import (
     favicon,
     robots,
-    PremiumMediaView
+    sitemap_index,
+    sitemap_section,
+    PremiumMediaView,
+    SignedMediaView
 )
 
 if 'debug_toolbar' in settings.INSTALLED_APPS and settings.DEBUG:
@@ -30,7 +32,8 @@ urlpatterns += [
 
     re_path(r'^favicon\.ico$', favicon, name='website_favicon'),
     re_path(r'^robots\.txt$', robots, name='website_robots'),
-    re_path(r'^sitemap\.xml$', sitemap, name='website_sitemap'),
+    re_path(r'^sitemap\.xml$', sitemap_index, name='website_sitemap'),
+    re_path(r'^sitemap-(?P<section>[-\w]+)\.xml$', sitemap_section, name='website_sitemap_section'),
 
     # Django admin
     path('django-admin/', admin.site.urls),
@@ -59,6 +62,7 @@ urlpatterns += [
     re_path(r'', include(users_urls)),
 
     re_path(r'^premium_media/(?P<uidb64>[-\w]*)/(?P<fileid>[-\w]*)/(?P<token>[-\w]*)/(?P<file_name>[\w.]{0,256})$', PremiumMediaView.as_view(), name='premium_media'),
+    re_path(r'^premium_signed/(?P<signature>[-\w]+)/(?P<expires>\d+)/(?P<uidb64>[-\w]*)/(?P<tier>\d+)/(?P<media_id>\d+)/(?P<file_name>[^/]*)$', SignedMediaView.as_view(), name='premium_signed'),
 
 ]
 
@@ -1,7 +1,13 @@
+import bleach
 import collections.abc
+import hashlib
 import inspect
+import lxml
+import re
+from bs4 import BeautifulSoup
 from django.core.validators import URLValidator
 from django.core.exceptions import ValidationError
+from django.db.models import Q
 from django.utils.functional import cached_property
 from django.utils.html import mark_safe
 from django.utils.inspect import method_has_no_args
@@ -17,6 +23,33 @@ def slugify_filename(instance, filename):
     return filename.format(instance, filename)
 
 
+def disallow_anchors(description):
+    soup = BeautifulSoup(description, 'lxml')
+    for link in soup.find_all('a'):
+        if 'href' in link.attrs:
+            if re.match(r'^<a\shref="\#.*?">.*?</a>$', str(link), re.IGNORECASE):
+                link.replace_with_children()
+            else:
+                pass
+        else:
+            pass
+    return soup.body.decode_contents()
+
+
+def render_feed_description(page):
+    """
+    Renders the sanitised RSS item description for an article or episode:
+    the caption followed by the page's body text, with anchor-only links removed.
+    """
+    item_bodytext = page.body.render_as_block()
+    soup = BeautifulSoup(item_bodytext, 'lxml')
+    soup_body = str(soup.select_one('.block-body_text'))
+    bodytext = bleach.clean(soup_body, strip=True, tags=['p', 'ul', 'li', 'a', 'br']).lstrip()
+    description = '<p>' + page.caption + '</p>' + bodytext
+    description = (bleach.clean(description.replace('</p>', '</p><br />'), strip=True, tags=['p', 'ul', 'li', 'a', 'br'])).lstrip()
+    return disallow_anchors(description)
+
+
 def get_protected_media_link(request, path, render_link=False):
     if render_link:
         return mark_safe(
@@ -48,20 +81,21 @@ def uri_validator(possible_uri):
         return False
 
 
-def gen_cache_prefix(self, request):
-    seg_str = None
-    try:
-        user_segs = []
-        segments = request.session.get('segments', [])
-        if len(segments):
-            for segment in segments:
-                user_segs.append(segment.get('encoded_name', ''))
-
-        seg_str = '_'.join(user_segs)
-    except Exception:
-        pass
+def gen_cache_prefix(request):
+    """
+    Returns what a cached page varies by for the visitor: a short hash of
+    the tier segments they resolve to, so subscribers on the same tiers
+    share one render. Anonymous visitors all share the empty prefix.
+    """
+    from website.tiers import resolve_tiers
 
-    return seg_str
+    user = getattr(request, 'user', None)
+    if not user or not user.is_authenticated:
+        return ''
+    segments = ','.join(str(segment) for segment in resolve_tiers(user)['segments'])
+    # The comment block only shows comments to users with a username.
+    named = 'named' if getattr(user, 'user_name', None) else 'unnamed'
+    return hashlib.md5('{0}|{1}'.format(segments, named).encode()).hexdigest()[:16]
 
 
 class LocalPaginator:
@@ -245,4 +279,104 @@ class LocalPage(collections.abc.Sequence):
         # Special case for the last page because there can be orphans.
         if self.number == self.paginator.num_pages:
             return self.paginator.count
-        return self.number * self.paginator.per_page
\ No newline at end of file
+        return self.number * self.paginator.per_page
+
+
+class KeysetPaginator:
+    """
+    Pages through a queryset ordered by one field and the primary key by
+    seeking past the edge of the page being left, instead of counting and
+    offsetting. Pages are addressed by the id of the page they come after
+    or before, so their urls stay put as newer pages are published.
+    """
+    keyset = True
+
+    def __init__(self, object_list, per_page, order_by):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.descending = order_by.startswith('-')
+        self.field = order_by.lstrip('-')
+
+    def _seek(self, pk, forward):
+        value = self.object_list.filter(pk=pk).values_list(self.field, flat=True).first()
+        if value is None:
+            return None
+        # forward in a descending list means smaller keys
+        lookup = 'lt' if forward == self.descending else 'gt'
+        return self.object_list.filter(
+            Q(**{'{0}__{1}'.format(self.field, lookup): value}) |
+            Q(**{self.field: value, 'pk__{0}'.format(lookup): pk})
+        )
+
+    def page(self, after=None, before=None):
+        """
+        Returns the page after the object with id `after`, the page before
+        the object with id `before`, or the first page. It is only fetched
+        once it is used.
+        """
+        return KeysetPage(self, after, before)
+
+    def fetch(self, after=None, before=None):
+        forward = not before
+        cursor = after if forward else before
+        queryset = None
+        if cursor:
+            try:
+                queryset = self._seek(int(cursor), forward)
+            except (TypeError, ValueError):
+                queryset = None
+        if queryset is None:
+            forward = True
+            cursor = None
+            queryset = self.object_list
+
+        prefix = '-' if forward == self.descending else ''
+        items = list(queryset.order_by(prefix + self.field, prefix + 'pk')[:self.per_page + 1])
+        more = len(items) > self.per_page
+        items = items[:self.per_page]
+
+        # a stale cursor, or one near the start of the list, gets the first
+        # page rather than an empty or short one
+        if cursor and not items or not forward and not more:
+            return self.fetch()
+        if not forward:
+            items.reverse()
+            return items, more, True
+        return items, cursor is not None, more
+
+
+class KeysetPage(collections.abc.Sequence):
+
+    def __init__(self, paginator, after=None, before=None):
+        self.paginator = paginator
+        self.after = after
+        self.before = before
+
+    @cached_property
+    def _fetched(self):
+        return self.paginator.fetch(self.after, self.before)
+
+    @property
+    def object_list(self):
+        return self._fetched[0]
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_previous(self):
+        return self._fetched[1]
+
+    def has_next(self):
+        return self._fetched[2]
+
+    def has_other_pages(self):
+        return self.has_previous() or self.has_next()
+
+    def previous_cursor(self):
+        return self.object_list[0].pk
+
+    def next_cursor(self):
+        return self.object_list[-1].pk
@@ -1,20 +1,26 @@
+import math
 import mimetypes
 import os
-from datetime import datetime
+import time
 from django import forms
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
+from django.contrib.sitemaps import views as sitemap_views
+from django.core.cache import cache
+from django.db.models import F, Subquery
 from django.http import Http404, HttpResponse, HttpResponsePermanentRedirect, HttpResponseForbidden
 from django.shortcuts import render
+from django.template.loader import render_to_string
+from django.urls import reverse
 from django.utils.http import urlsafe_base64_decode
 from django.views.generic.base import View
 from users.tokens import premium_token
 from urllib.parse import urlparse
-from users.models import CustomUserProfile
 from wagtail.contrib.forms.views import SubmissionsListView as WagtailSubmissionsListView
 from wagtail.core.models import Site
+from website import rendition_cache, signed_media
 from website.models.choices import page_choices
-from website.models.media import CustomMedia, Download
+from website.models.media import CustomMedia
 from website.models.settings import LayoutSettings
 from website.utils import attempt_protected_media_value_conversion
 
@@ -25,7 +31,7 @@ def favicon(request):
     site = Site.find_for_request(request)
     icon = LayoutSettings.for_site(site).favicon
     if icon:
-        return HttpResponsePermanentRedirect(icon.get_rendition('original').url)
+        return HttpResponsePermanentRedirect(rendition_cache.get_rendition_url(icon, 'original'))
     raise Http404()
 
 
@@ -37,6 +43,56 @@ def robots(request):
     )
 
 
+@sitemap_views.x_robots_tag
+def sitemap_index(request):
+    """
+    Lists every page of every sitemap section, dated by the latest page
+    published in the section.
+    """
+    from website import sitemaps
+    key = sitemaps.sitemap_cache_key('index', request.get_host())
+    content = cache.get(key)
+    if content is None:
+        root_url = Site.find_for_request(request).root_url
+        entries = []
+        for name, section in sitemaps.get_sections(request).items():
+            summary = section.summary()
+            location = root_url + reverse('website_sitemap_section', kwargs={'section': name})
+            for page in range(1, math.ceil(summary['count'] / section.limit) + 1):
+                entries.append({
+                    'location': location + ('?p={0}'.format(page) if page > 1 else ''),
+                    'lastmod': summary['lastmod'],
+                })
+        content = render_to_string('website/sitemap_index.xml', {'sitemaps': entries}, request)
+        cache.set(key, content)
+    return HttpResponse(content, content_type='application/xml')
+
+
+@sitemap_views.x_robots_tag
+def sitemap_section(request, section):
+    """
+    Renders one page of a sitemap section, cached until a page in the
+    section is published or unpublished.
+    """
+    from website import sitemaps
+    key = sitemaps.sitemap_cache_key(section, request.get_host(), request.GET.get('p', 1))
+    cached = cache.get(key)
+    if cached is None:
+        sections = sitemaps.get_sections(request)
+        if section not in sections:
+            raise Http404('No sitemap section named {0}'.format(section))
+        response = sitemap_views.sitemap(request, {section: sections[section]}, section=section)
+        response.render()
+        cached = (response.content, response.get('Last-Modified'))
+        cache.set(key, cached)
+
+    content, last_modified = cached
+    response = HttpResponse(content, content_type='application/xml')
+    if last_modified:
+        response['Last-Modified'] = last_modified
+    return response
+
+
 class SubmissionsListView(WagtailSubmissionsListView):
 
     def get_csv_response(self, context):
@@ -58,26 +114,51 @@ class SubmissionsListView(WagtailSubmissionsListView):
 
 class PremiumMediaView(View):
     def get(self, request, uidb64, fileid, token, file_name):
+        """
+        Hands a subscriber's download of premium media to the web server.
+        The subscriber, their subscription and profile, and the media file
+        are read in one query, and the download is logged as it is handed off.
+        """
+        from website import downloads
+        media = CustomMedia.objects.filter(pk=fileid) if fileid.isdigit() else CustomMedia.objects.none()
         try:
-            user = UserModel.objects.get(email=urlsafe_base64_decode(uidb64).decode())
+            user = UserModel.objects.select_related('stripe_subscription').annotate(
+                profile_id=F('base_userprofile__id'),
+                media_file=Subquery(media.values('file')[:1]),
+            ).get(email=urlsafe_base64_decode(uidb64).decode())
         except:
             user = None
-        try:
-            file = CustomMedia.objects.get(pk=fileid)
-        except:
-            raise Http404('No such file exists')
-        if user and premium_token.check_token(user, token) and user.stripe_subscription.status == 'active':
-            url = file.url
-            protocol = urlparse(url).scheme
-            userprofile = CustomUserProfile.objects.get(user_id=user.id)
-            userprofile.media_download.add(file)
-            download_record = Download.objects.filter(user_id=user.id).filter(media_id=fileid).first()
-            download_record.download_count += 1
-            download_record.last = datetime.now()
-            download_record.save()
-            response = HttpResponse()
-            response['X-Accel-Redirect'] = '/media_download/' + protocol + '/' + url.replace(protocol + '://', '')
-            return response
-        else:
+        # a bad link is refused before the media is looked at, so it never
+        # costs another query
+        if not (user and user.stripe_subscription and premium_token.check_token(user, token) and user.stripe_subscription.status == 'active'):
             return HttpResponseForbidden()
+        if user.media_file is None:
+            raise Http404('No such file exists')
+        url = CustomMedia._meta.get_field('file').storage.url(user.media_file)
+        protocol = urlparse(url).scheme
+        if user.profile_id:
+            downloads.log_download(user.profile_id, int(fileid), user.is_paysubscribed)
+        response = HttpResponse()
+        response['X-Accel-Redirect'] = '/media_download/' + protocol + '/' + url.replace(protocol + '://', '')
+        return response
+
 
+class SignedMediaView(View):
+    def get(self, request, signature, expires, uidb64, tier, media_id, file_name):
+        """
+        Hands a download of a signed premium media link, already checked by
+        nginx's secure_link, to the web server. The storage url is added here,
+        so its presigned query string never appears in a subscriber's feed.
+        No query is made while the window's storage urls are cached.
+        """
+        expires, tier, media_id = int(expires), int(tier), int(media_id)
+        if not signed_media.enabled() or not signed_media.verify(signature, expires, uidb64, tier, media_id):
+            return HttpResponseForbidden()
+        if expires < time.time():
+            return HttpResponse(status=410)
+        url = signed_media.get_storage_urls([media_id], expires).get(media_id)
+        if url is None:
+            raise Http404('No such file exists')
+        response = HttpResponse()
+        response['X-Accel-Redirect'] = signed_media.download_path(request.get_host(), uidb64, tier, media_id, url)
+        return response
@@ -13,7 +13,7 @@ from django import forms
 from django.http.response import HttpResponse
 from django.shortcuts import get_object_or_404
 from django_summernote.widgets import SummernoteWidget
-from django.urls import reverse
+from django.urls import resolve, reverse
 from django.utils.html import mark_safe
 from django.utils.translation import ugettext_lazy as _
 from djstripe.models.billing import Subscription, Invoice, Coupon
@@ -24,17 +24,20 @@ from website.edit_handlers import (
     CommentPermissionHelper,
     EmailLogPermissionHelper,
     DripLogPermissionHelper,
-    DownloadPermissionHelper
+    DownloadPermissionHelper,
+    DownloadReportPermissionHelper
 )
 from wagtail.admin.edit_handlers import FieldPanel, InlinePanel, MultiFieldPanel
 from wagtail.core import hooks
 from wagtail.core.models import UserPagePermissionsProxy, get_page_models
-from wagtailcache.cache import clear_cache
 from wagtail.contrib.modeladmin.options import (
     ModelAdmin, ModelAdminGroup, modeladmin_register)
 from wagtail.contrib.modeladmin.views import CreateView, InspectView
 from wagtail.images import image_operations
-from website.models.media import Download
+from website import page_cache
+from website.middleware import TIERS_META
+from website.utils import gen_cache_prefix
+from website.models.media import DailyMediaDownloads, Download
 from website.models.settings import GeneralSettings
 from website.wagtail_flexible_forms.wagtail_hooks import (
     FormAdmin as FlexibleformFormAdmin,
@@ -46,18 +49,60 @@ from drip.models import Drip, SentDrip, QuerySetRule
 from post_office.models import Log, Email, EmailTemplate
 from post_office.admin import SubjectField, CommaSeparatedEmailWidget, get_message_preview
 
-def clear_wagtailcache(*args, **kwargs):
-    clear_cache()
+# Pages are purged from wagtailcache when they are published, unpublished,
+# deleted or moved, see website/signals.py. Drafts don't change what is
+# served, so they don't purge anything.
 
-hooks.register('after_create_page', clear_wagtailcache)
-hooks.register('after_edit_page', clear_wagtailcache)
-hooks.register('after_delete_page', clear_wagtailcache)
-hooks.register('after_move_page', clear_wagtailcache)
-hooks.register('after_publish_page', clear_wagtailcache)
-hooks.register('after_unpublish_page', clear_wagtailcache)
-hooks.register('after_create_snippet', clear_wagtailcache)
-hooks.register('after_edit_snippet', clear_wagtailcache)
-hooks.register('after_delete_snippet', clear_wagtailcache)
+@hooks.register('after_edit_snippet')
+def purge_edited_snippet(request, instance):
+    page_cache.purge(page_cache.get_snippet_patterns([instance]))
+
+
+@hooks.register('before_delete_snippet')
+def find_deleted_snippets(request, instances):
+    """
+    Work out which pages show the snippets while they are still referenced,
+    and purge them once the snippets are gone.
+    """
+    if request.method == 'POST':
+        request.purge_cache_patterns = page_cache.get_snippet_patterns(instances)
+
+
+@hooks.register('after_delete_snippet')
+def purge_deleted_snippets(request, instances):
+    page_cache.purge(getattr(request, 'purge_cache_patterns', None))
+
+
+@hooks.register('is_request_cacheable')
+def cache_subscriber_pages(request, is_cacheable):
+    """
+    Let logged in visitors share cached pages with everyone on the same
+    tiers. Only wagtail pages qualify, and never for editors, who get the userbar.
+    """
+    user = getattr(request, 'user', None)
+    if is_cacheable or user is None or not user.is_authenticated:
+        return None
+    if request.method not in ('GET', 'HEAD') or getattr(request, 'is_preview', False):
+        return None
+    try:
+        if resolve(request.path_info).url_name != 'wagtail_serve':
+            return None
+    except:
+        return None
+    if user.has_perm('wagtailadmin.access_admin'):
+        return None
+    request.META[TIERS_META] = gen_cache_prefix(request)
+    return True
+
+
+@hooks.register('is_response_cacheable')
+def never_cache_not_modified(response, is_cacheable):
+    """
+    A 304 only answers one client's conditional request, so wagtail-cache
+    must never hand it out to anyone else.
+    """
+    if response.status_code == 304:
+        return False
 
 
 @hooks.register('filter_form_submissions_for_user')
@@ -331,6 +376,23 @@ class DownloadAdmin(ModelAdmin):
     ]
 
 
+class DailyMediaDownloadsAdmin(ModelAdmin):
+    model = DailyMediaDownloads
+    menu_icon = 'download'
+    menu_label = 'Download Reports'
+    list_display = ('date', 'media', 'tier', 'downloads')
+    list_filter = ('tier',)
+    search_fields = ['media__title']
+    date_hierarchy = 'date'
+    ordering = ['-date', '-downloads']
+    list_select_related = ['media']
+    permission_helper_class = DownloadReportPermissionHelper
+
+    class Meta:
+        verbose_name = 'Daily Media Download'
+        verbose_name_plural = 'Daily Media Downloads'
+
+
 class HTMLTemplateAdmin(ModelAdmin):
     model = Template
     menu_icon = 'code'
@@ -731,7 +793,7 @@ class SubscriptionGroup(ModelAdminGroup):
     menu_label = 'Subscriptions'
     menu_icon = 'tick'
     menu_order = 1000
-    items = (SubscriptionAdmin, InvoiceAdmin, ProductAdmin, CouponAdmin, DownloadAdmin)
+    items = (SubscriptionAdmin, InvoiceAdmin, ProductAdmin, CouponAdmin, DownloadAdmin, DailyMediaDownloadsAdmin)
 
 class CommentGroup(ModelAdminGroup):
     menu_label = 'Comments'